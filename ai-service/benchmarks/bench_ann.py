@@ -0,0 +1,133 @@
+# ai-service/benchmarks/bench_ann.py
+"""
+Benchmark: RAG index types against exact (flat) search.
+
+Run from ai-service/:
+
+    python benchmarks/bench_ann.py [--sizes 20000 100000] [--dim 1536] [--k 3]
+
+Vectors are synthetic: unit-normalized points drawn around many cluster
+centres, like embeddings of a vocabulary with families of near-synonyms.
+Queries are perturbed database vectors, like paraphrases of a known term.
+Reports recall@k against flat search, p50/p99 single-query latency,
+serialized index size and build time for each configuration.
+Matryoshka truncation needs real embeddings; bench_embeddings.py
+--openai --dimensions 256 512 measures it.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+from typing import Any, Dict, List, Tuple
+
+import faiss
+import numpy as np
+
+from rag.index_types import (
+    apply_search_params,
+    create_index,
+    resolve_params,
+    train_index,
+    training_size,
+)
+
+# (label, index type, parameter overrides)
+CONFIGS: List[Tuple[str, str, Dict[str, Any]]] = [
+    ("flat", "flat", {}),
+    ("flat fp16", "flat", {"storage": "fp16"}),
+    ("flat sq8", "flat", {"storage": "sq8"}),
+    ("hnsw M=32 ef=32", "hnsw", {"M": 32, "efSearch": 32}),
+    ("hnsw M=32 ef=64", "hnsw", {"M": 32, "efSearch": 64}),
+    ("hnsw M=32 ef=128", "hnsw", {"M": 32, "efSearch": 128}),
+    ("hnsw sq8 M=32 ef=64", "hnsw", {"M": 32, "efSearch": 64, "storage": "sq8"}),
+    ("ivf_flat nprobe=8", "ivf_flat", {"nprobe": 8}),
+    ("ivf_flat nprobe=32", "ivf_flat", {"nprobe": 32}),
+    ("ivf_flat sq8 nprobe=16", "ivf_flat", {"nprobe": 16, "storage": "sq8"}),
+    ("ivf_pq m=64 nprobe=16", "ivf_pq", {"pq_m": 64, "nprobe": 16}),
+    ("ivf_pq m=96 nprobe=32", "ivf_pq", {"pq_m": 96, "nprobe": 32}),
+]
+
+
+def synthetic_vectors(n: int, dim: int, n_queries: int, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((max(1, n // 50), dim)).astype(np.float32)
+    assignment = rng.integers(0, len(centres), n)
+
+    data = centres[assignment] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+
+    picks = rng.integers(0, n, n_queries)
+    queries = data[picks] + 0.02 * rng.standard_normal((n_queries, dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return data, queries
+
+
+def single_query_latencies_us(index: faiss.Index, queries: np.ndarray, k: int) -> np.ndarray:
+    """How rag_lookup uses the index: one query per search call."""
+    timings = np.empty(len(queries))
+    for i in range(len(queries)):
+        start = time.perf_counter()
+        index.search(queries[i:i + 1], k)
+        timings[i] = time.perf_counter() - start
+    return timings * 1e6
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found.tolist(), truth.tolist()))
+    return hits / (len(truth) * k)
+
+
+def run(n: int, dim: int, k: int, n_queries: int) -> None:
+    data, queries = synthetic_vectors(n, dim, n_queries)
+    print(f"\nN={n:,} dim={dim} k={k} queries={n_queries}  (raw vectors {data.nbytes / 1e6:,.0f} MB)")
+    print(f"{'index':<24}{'recall@k':>10}{'p50 us':>10}{'p99 us':>10}{'size MB':>10}{'build s':>10}")
+
+    truth = None
+    for label, index_type, overrides in CONFIGS:
+        try:
+            params = resolve_params(index_type, n, **overrides)
+            start = time.perf_counter()
+            index = create_index(index_type, dim, params)
+            sample = training_size(index_type, params)
+            if sample:
+                rows = np.random.default_rng(1).choice(n, min(n, sample), replace=False)
+                train_index(index, data[rows])
+            index.add(data)
+            apply_search_params(index, params)
+            build_seconds = time.perf_counter() - start
+        except (ValueError, RuntimeError) as e:
+            print(f"{label:<24}  skipped: {e}")
+            continue
+
+        _, found = index.search(queries, k)
+        if truth is None:
+            truth = found  # flat runs first
+
+        latencies = single_query_latencies_us(index, queries, k)
+        size_mb = faiss.serialize_index(index).nbytes / 1e6
+
+        print(
+            f"{label:<24}{recall_at_k(found, truth):>10.3f}"
+            f"{np.percentile(latencies, 50):>10.0f}{np.percentile(latencies, 99):>10.0f}"
+            f"{size_mb:>10.1f}{build_seconds:>10.1f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20_000, 100_000])
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    for n in args.sizes:
+        run(n, args.dim, args.k, args.queries)
+
+
+if __name__ == "__main__":
+    main()
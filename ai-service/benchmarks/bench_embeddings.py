@@ -0,0 +1,114 @@
+# ai-service/benchmarks/bench_embeddings.py
+"""
+Benchmark: embedding backends for RAG, recall and query latency.
+
+Run from ai-service/:
+
+    python benchmarks/bench_embeddings.py [--openai [--dimensions 256 512]] [--storage float32 sq8] [--k 3]
+
+Queries are derived from the loaded vocabulary: each term, preferred
+name and synonym, plus a one-character typo and a word-order swap of
+each. A query counts as recalled when its own concept is among the top
+k passages of a flat index built with the same backend. --openai adds
+the network backend (needs OPENAI_API_KEY and network access) as the
+reference; --dimensions adds shortened (Matryoshka) text-embedding-3
+vectors at each size. --storage repeats every backend with the index
+vectors stored as fp16 or sq8 instead of float32.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import random
+import time
+from typing import List, Tuple
+
+import numpy as np
+
+from rag.build_index import build_passages
+from rag.index_types import STORAGE_TYPES, create_index, resolve_params, train_index
+from services.knowledge_service import load_csv_tables
+from utils.embedding_backends import HashedNgramEmbeddings, OpenAIEmbeddings
+
+
+def labelled_queries(seed: int = 0) -> List[Tuple[str, str, str]]:
+    """(query, system, code) for every surface form and two noisy variants."""
+    rng = random.Random(seed)
+    fields = {
+        "snomed": ("code", ["term", "preferred"], ";"),
+        "icd10": ("code", ["term"], None),
+        "rxnorm": ("rxnorm", ["name"], ","),
+        "loinc": ("code", ["test", "component"], None),
+    }
+
+    rows, _indexes, _codes = load_csv_tables()
+    queries = []
+    for system, (code_field, name_fields, sep) in fields.items():
+        for row in rows[system]:
+            forms = [row.get(f) for f in name_fields]
+            if sep and row.get("synonyms"):
+                forms.extend(row["synonyms"].split(sep))
+
+            for form in dict.fromkeys(f.strip() for f in forms if f and f.strip()):
+                queries.append((form, system, row[code_field]))
+                if len(form) > 4:
+                    i = rng.randrange(1, len(form) - 1)
+                    queries.append((form[:i] + form[i + 1:], system, row[code_field]))
+                words = form.split()
+                if len(words) > 1:
+                    queries.append((" ".join(reversed(words)), system, row[code_field]))
+    return queries
+
+
+def evaluate(backend, k: int, storage: str = "float32") -> Tuple[float, float, float, float]:
+    passages = build_passages()
+    if hasattr(backend, "fit"):
+        backend.fit(p["text"] for p in passages)
+
+    vectors = backend.embed([p["text"] for p in passages])
+    index = create_index("flat", vectors.shape[1], resolve_params("flat", len(vectors), storage=storage))
+    train_index(index, vectors)
+    index.add(vectors)
+
+    queries = labelled_queries()
+    timings = np.empty(len(queries))
+    hits1 = hitsk = 0
+    for i, (query, system, code) in enumerate(queries):
+        start = time.perf_counter()
+        vector = backend.embed([query])
+        timings[i] = time.perf_counter() - start
+
+        _, rows = index.search(vector, k)
+        found = [(passages[r]["system"], passages[r]["code"]) for r in rows[0] if r >= 0]
+        hits1 += found[:1] == [(system, code)]
+        hitsk += (system, code) in found
+
+    timings *= 1e6
+    return hits1 / len(queries), hitsk / len(queries), np.percentile(timings, 50), np.percentile(timings, 99)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--local-dim", type=int, default=1024)
+    parser.add_argument("--openai", action="store_true", help="Also run the OpenAI backend (network)")
+    parser.add_argument("--dimensions", type=int, nargs="*", default=[], help="Shortened OpenAI sizes to compare")
+    parser.add_argument("--storage", choices=tuple(STORAGE_TYPES), nargs="+", default=["float32"])
+    args = parser.parse_args()
+
+    backends = [HashedNgramEmbeddings(args.local_dim)]
+    if args.openai:
+        backends[:0] = [OpenAIEmbeddings()] + [OpenAIEmbeddings(dimensions=d) for d in args.dimensions]
+
+    print(f"{len(build_passages())} passages, {len(labelled_queries())} queries, k={args.k}")
+    print(f"{'backend':<44}{'storage':>8}{'recall@1':>10}{f'recall@{args.k}':>10}{'p50 us':>10}{'p99 us':>10}")
+    for backend in backends:
+        for storage in args.storage:
+            recall1, recallk, p50, p99 = evaluate(backend, args.k, storage)
+            print(f"{backend.name:<44}{storage:>8}{recall1:>10.3f}{recallk:>10.3f}{p50:>10.0f}{p99:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# ai-service/benchmarks/bench_normalization.py
+"""
+Micro-benchmark: term normalization, legacy multi-pass vs current engine.
+
+Run from ai-service/:
+
+    python benchmarks/bench_normalization.py
+
+The legacy implementation is reproduced below so the comparison stays
+runnable after the old code is gone. The script also asserts that both
+produce identical output for every input.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import re
+import time
+import unicodedata
+
+from services.terminology_normalization import (
+    ROMAN_NUMERAL_MAP,
+    DOSAGE_PATTERN,
+    normalize_condition_term,
+    normalize_medication_term,
+    normalize_lab_term,
+    normalize_condition_terms,
+    _condition_key,
+    _medication_key,
+    _lab_key,
+)
+
+
+# -----------------------
+# Legacy implementation
+# -----------------------
+
+def legacy_shared(text):
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKD", text)
+    text = text.lower()
+    text = re.sub(r"\([^)]*\)", "", text)
+    text = re.sub(r"[-_/]", " ", text)
+    text = re.sub(r"[^a-z0-9\s]", "", text)
+    text = re.sub(r"\s+", " ", text).strip()
+    return text
+
+
+def legacy_condition(text):
+    if not text:
+        return ""
+    text = legacy_shared(text)
+    for roman, arabic in ROMAN_NUMERAL_MAP.items():
+        text = re.sub(rf"\b{roman}\b", arabic, text)
+    return text.strip()
+
+
+def legacy_medication(text):
+    if not text:
+        return ""
+    return DOSAGE_PATTERN.sub("", legacy_shared(text)).strip()
+
+
+def legacy_lab(text):
+    if not text:
+        return ""
+    return legacy_shared(text)
+
+
+# -----------------------
+# Workload
+# -----------------------
+
+TERMS = [
+    "Type-II diabetes (adult)",
+    "Stage III chronic kidney disease",
+    "Essential (primary) hypertension",
+    "Congestive heart failure, NYHA class iv",
+    "Metformin 500mg PO BID",
+    "Lisinopril-10 mg",
+    "Atorvastatin 40 mg nightly",
+    "HbA1c (%)",
+    "Serum glucose",
+    "LDL/HDL ratio",
+]
+
+
+def bench(fn, inputs, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for text in inputs:
+            fn(text)
+        best = min(best, time.perf_counter() - started)
+    return best / len(inputs) * 1e6
+
+
+def main():
+    # Note-like stream: a few hundred distinct terms, heavily repeated
+    distinct = [f"{term} #{i}" for i in range(30) for term in TERMS]
+    workload = distinct * 20
+
+    for legacy, current in (
+        (legacy_condition, normalize_condition_term),
+        (legacy_medication, normalize_medication_term),
+        (legacy_lab, normalize_lab_term),
+    ):
+        for text in distinct:
+            assert legacy(text) == current(text), text
+
+    print(f"{'function':<28}{'legacy us':>12}{'cold us':>12}{'warm us':>12}{'speedup':>10}")
+
+    for name, legacy, current, memo in (
+        ("normalize_condition_term", legacy_condition, normalize_condition_term, _condition_key),
+        ("normalize_medication_term", legacy_medication, normalize_medication_term, _medication_key),
+        ("normalize_lab_term", legacy_lab, normalize_lab_term, _lab_key),
+    ):
+        legacy_us = bench(legacy, workload)
+
+        # Cold: memo cleared before every pass, measures the compiled engine
+        cold_us = float("inf")
+        for _ in range(5):
+            memo.cache_clear()
+            cold_us = min(cold_us, bench(current, distinct, repeat=1))
+
+        warm_us = bench(current, workload)
+        print(f"{name:<28}{legacy_us:>12.2f}{cold_us:>12.2f}{warm_us:>12.2f}{legacy_us / warm_us:>9.1f}x")
+
+    started = time.perf_counter()
+    normalize_condition_terms(workload)
+    batch_us = (time.perf_counter() - started) / len(workload) * 1e6
+    print(f"{'normalize_condition_terms':<28}{'':>12}{'':>12}{batch_us:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
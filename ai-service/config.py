@@ -1,6 +1,6 @@
 import os
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
 
 # Load your .env variables
@@ -10,10 +10,81 @@ load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_MODEL_SUMMARY = os.getenv("OPENAI_MODEL_SUMMARY", "gpt-4o-mini")
 OPENAI_MODEL_EXTRACT = os.getenv("OPENAI_MODEL_EXTRACT", "gpt-4o-mini")
+# Ask the provider for output constrained to the response JSON Schema
+# (response_format json_schema, strict). Turn off for models without it.
+LLM_STRUCTURED_OUTPUT = os.getenv("LLM_STRUCTURED_OUTPUT", "true").lower() in ("1", "true", "yes")
+# /pipeline streams the extraction reply and starts coding conditions
+# as soon as each one has been written
+LLM_STREAM_EXTRACTION = os.getenv("LLM_STREAM_EXTRACTION", "true").lower() in ("1", "true", "yes")
+
+# Optional SQLite terminology store built by services/terminology_loaders.py.
+# When unset, lookups use the demo CSVs in data/.
+VOCAB_DB_PATH = os.getenv("VOCAB_DB_PATH")
+
+# Optional memory-mapped artifact built by services/vocabulary_artifact.py.
+# Takes precedence over VOCAB_DB_PATH; shared across workers via the page cache.
+VOCAB_ARTIFACT_PATH = os.getenv("VOCAB_ARTIFACT_PATH")
+
+# Fuzzy condition matching (between exact lookup and RAG)
+FUZZY_MAX_EDITS = int(os.getenv("FUZZY_MAX_EDITS", "2"))
+FUZZY_MIN_SIMILARITY = float(os.getenv("FUZZY_MIN_SIMILARITY", "0.85"))
+
+# Condition resolution cache (memory LRU + optional SQLite file)
+RESOLUTION_CACHE_SIZE = int(os.getenv("RESOLUTION_CACHE_SIZE", "10000"))
+RESOLUTION_CACHE_PATH = os.getenv("RESOLUTION_CACHE_PATH")
+
+# Embedding backend: "openai" (network) or "local" (hashed char n-gram
+# TF-IDF, in-process). The RAG index must be rebuilt after switching.
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai")
+OPENAI_MODEL_EMBEDDING = os.getenv("OPENAI_MODEL_EMBEDDING", "text-embedding-3-small")
+LOCAL_EMBEDDING_DIM = int(os.getenv("LOCAL_EMBEDDING_DIM", "1024"))
+# text-embedding-3 vectors can be shortened (Matryoshka); e.g. 512 cuts
+# the index to a third. 0 keeps the model's native size.
+OPENAI_EMBEDDING_DIMENSIONS = int(os.getenv("OPENAI_EMBEDDING_DIMENSIONS", "0")) or None
+
+# Hybrid RAG retrieval: BM25 over the passages fused with vector hits.
+# A lexical top hit containing every query token and scoring at least
+# RAG_LEXICAL_DECISIVE_RATIO x the runner-up skips the embedding call.
+RAG_HYBRID_SEARCH = os.getenv("RAG_HYBRID_SEARCH", "true").lower() in ("1", "true", "yes")
+RAG_LEXICAL_DECISIVE_RATIO = float(os.getenv("RAG_LEXICAL_DECISIVE_RATIO", "1.5"))
+
+# Concurrent RAG lookups arriving within this window (up to the max
+# batch) share one embedding request and one index.search. 0 disables.
+RAG_COALESCE_WINDOW_MS = float(os.getenv("RAG_COALESCE_WINDOW_MS", "5"))
+RAG_COALESCE_MAX_BATCH = int(os.getenv("RAG_COALESCE_MAX_BATCH", "64"))
+
+# Embedding cache (memory LRU + optional SQLite file) keyed by model and
+# text hash. Set the path (e.g. data/embedding_cache.sqlite) so index
+# rebuilds and HNSW compaction only embed new passages.
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH")
+
+# LLM completion cache (memory LRU + optional SQLite file) keyed by a
+# hash of model and messages. Completions contain note content, so the
+# disk tier is opt-in. TTL 0 keeps entries until evicted.
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1000"))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH")
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+
+# Client-side provider limits (utils/rate_limiter.py): requests/min,
+# estimated prompt tokens/min and calls in flight. Set them to the
+# account's limits; 0 disables a limit.
+LLM_RPM = float(os.getenv("LLM_RPM", "500"))
+LLM_TPM = float(os.getenv("LLM_TPM", "200000"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+EMBEDDING_RPM = float(os.getenv("EMBEDDING_RPM", "3000"))
+EMBEDDING_TPM = float(os.getenv("EMBEDDING_TPM", "1000000"))
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "16"))
+
+# Shared secret for the /admin routes, sent as the X-Admin-Key header.
+# When unset, the admin API is disabled.
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")
 
 # Sanity check
 if not OPENAI_API_KEY:
     raise RuntimeError("OPENAI_API_KEY is not set in .env file.")
 
-# Create OpenAI client
+# Create OpenAI clients: sync for scripts and sync callers, async for
+# the request path so waiting on the LLM doesn't hold a worker thread
 client = OpenAI(api_key=OPENAI_API_KEY)
+async_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
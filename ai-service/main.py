@@ -3,6 +3,8 @@ from routes.summarize_routes import router as summarize_router
 from routes.extract_routes import router as extract_router
 from routes.fhir_routes import router as fhir_router
 from routes.pipeline_routes import router as pipeline_router
+from routes.admin_routes import router as admin_router
+from routes.terminology_routes import router as terminology_router
 
 app = FastAPI(title="AI Clinical Notes Service")
 
@@ -14,6 +16,8 @@ app.include_router(summarize_router)
 app.include_router(extract_router)
 app.include_router(fhir_router)
 app.include_router(pipeline_router)
+app.include_router(admin_router)
+app.include_router(terminology_router)
 
 
 
@@ -0,0 +1,90 @@
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+
+
+class ReloadStatus(BaseModel):
+    status: str
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    duration_seconds: Optional[float] = None
+    error: Optional[str] = None
+    vocab_version: str
+    index_version: str
+    # Another reload is queued behind the current one
+    pending: bool = False
+
+
+class CacheStats(BaseModel):
+    hits: int
+    misses: int
+    disk_hits: int
+    hit_rate: float
+    size: int
+    max_entries: int
+    persistent: bool
+
+
+class CacheInvalidation(BaseModel):
+    removed: int
+
+
+class PriorityClassStats(BaseModel):
+    queued: int
+    granted: int
+    mean_wait_ms: float
+    max_wait_ms: float
+
+
+class RateLimiterStats(BaseModel):
+    name: str
+    requests_per_minute: float
+    tokens_per_minute: float
+    max_concurrency: int
+    in_flight: int
+    classes: Dict[str, PriorityClassStats]
+
+
+class JsonParseStats(BaseModel):
+    valid: int
+    repaired: int
+    failed: int
+    llm_repairs: int
+    local_repair_rate: float
+    # LLM repair calls per extraction reply
+    llm_repair_rate: float
+    by_caller: Dict[str, Dict[str, int]] = {}
+
+
+class ConceptUpsert(BaseModel):
+    system: str
+    code: str
+    display: str
+    synonyms: List[str] = []
+    # Passage text to embed; defaults to build_index's wording
+    text: Optional[str] = None
+
+
+class ConceptKey(BaseModel):
+    system: str
+    code: str
+
+
+class ConceptUpdateResult(BaseModel):
+    updated: int
+    reload: ReloadStatus
+
+
+class CompactionResult(BaseModel):
+    passages: int
+    removed: int
+    added: int
+    reload: ReloadStatus
+
+
+class CoalescerStats(BaseModel):
+    window_ms: float
+    max_batch: int
+    batches: int
+    items: int
+    callers: int
+    mean_batch: float
@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+from typing import List
+
+
+class Suggestion(BaseModel):
+    system: str
+    code: str
+    display: str
+    matched: str
+
+
+class SuggestResponse(BaseModel):
+    query: str
+    suggestions: List[Suggestion]
@@ -1,85 +1,425 @@
 # ai-service/rag/build_index.py
+"""
+Build the FAISS index and its metadata from the loaded vocabularies.
+
+Passages are streamed in shards. Each shard is embedded in bounded
+batches across a worker pool and checkpointed to WORK_DIR as a .npy
+file plus .jsonl metadata. A rebuild after a crash or rate-limit
+exhaustion skips every shard already on disk. The final index and
+meta.bin (rag/metadata_store.py) are written to temporary files and
+renamed into place, so a hot reload never sees a half-written index.
+
+Usage (from ai-service/):
+
+    python rag/build_index.py [--batch-size 256] [--workers 4] [--shard-size 8192] [--fresh]
+                              [--index-type hnsw --hnsw-m 32 --ef-search 64]
+                              [--index-type ivf_pq --nlist 4096 --nprobe 16 --pq-m 64]
+                              [--index-type hnsw --storage sq8]
+"""
 
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 
+import argparse
+import hashlib
+import itertools
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import faiss
 import json
-from typing import List
-from openai import OpenAI
-from utils.llm_client import client
-from services.knowledge_service import (
-    SNOMED_DATA, ICD10_DATA, RXNORM_DATA, LOINC_DATA
+import numpy as np
+from tenacity import retry, wait_exponential, stop_after_attempt
+from typing import Any, Dict, Iterator, List, Optional
+from rag.index_files import commit_files, finish_pending_commit, index_lock, stage_path
+from rag.index_types import (
+    INDEX_TYPES,
+    STORAGE_TYPES,
+    concept_id,
+    create_index,
+    info_path_for,
+    resolve_params,
+    train_index,
+    training_size,
+    write_index_info,
 )
-from utils.embeddings import embed_text
+from rag.metadata_store import MetadataWriter
+from rag.rag_search import INDEX_DIR, INDEX_PATH, META_PATH
+from services.knowledge_service import current_vocabulary
+from utils.embedding_backends import LOCAL_IDF_FILENAME
+from utils.embeddings import configured_backend, embed_text, EMBEDDING_CACHE
+from utils.rate_limiter import priority_class
 
-INDEX_PATH = "rag/index/faiss.index"
-META_PATH = "rag/index/meta.json"
+WORK_DIR = os.path.join(INDEX_DIR, "build")
 
+# Well under the embeddings endpoint's per-request input limits
+BATCH_SIZE = 256
+WORKERS = 4
+SHARD_SIZE = 8192
+
+
+# Passage wording per system. The text is what gets embedded, so every
+# writer (full builds, rag/index_updates.py) must go through passage_text().
+PASSAGE_TEMPLATES = {
+    "snomed": "SNOMED term: {term} | synonyms: {synonyms} | code: {code}",
+    "icd10": "ICD10 term: {term} | code: {code}",
+    "rxnorm": "RxNorm medication: {term} | synonyms: {synonyms} | code: {code}",
+    "loinc": "LOINC test: {term} | code: {code}",
+}
 
-def build_passages() -> List[dict]:
-    passages = []
+
+def passage_text(system: str, term: str, code: str, synonyms: Optional[str] = None) -> str:
+    """The embedded text for one concept of system."""
+    if system not in PASSAGE_TEMPLATES:
+        raise ValueError(f"Unknown system {system!r}; expected one of {tuple(PASSAGE_TEMPLATES)}")
+    return PASSAGE_TEMPLATES[system].format(term=term, code=code, synonyms=synonyms)
+
+
+def iter_passages() -> Iterator[dict]:
+    """
+    One passage per concept of the active vocabulary: the compiled
+    backend (VOCAB_ARTIFACT_PATH / VOCAB_DB_PATH) when one is configured,
+    else the demo CSVs.
+    """
+    vocabulary = current_vocabulary()
+    if vocabulary.store is not None:
+        yield from _backend_passages(vocabulary.store)
+        return
+
+    rows = vocabulary.rows
 
     # SNOMED
-    for row in SNOMED_DATA:
-        passages.append({
-            "text": f"SNOMED term: {row['term']} | synonyms: {row.get('synonyms')} | code: {row['code']}",
+    for row in rows["snomed"]:
+        yield {
+            "text": passage_text("snomed", row["term"], row["code"], row.get("synonyms")),
             "system": "snomed",
             "code": row["code"],
             "display": row["preferred"]
-        })
+        }
 
     # ICD-10
-    for row in ICD10_DATA:
-        passages.append({
-            "text": f"ICD10 term: {row['term']} | code: {row['code']}",
+    for row in rows["icd10"]:
+        yield {
+            "text": passage_text("icd10", row["term"], row["code"]),
             "system": "icd10",
             "code": row["code"],
             "display": row["term"]
-        })
+        }
 
     # RxNorm
-    for row in RXNORM_DATA:
-        passages.append({
-            "text": f"RxNorm medication: {row['name']} | synonyms: {row.get('synonyms')} | code: {row['rxnorm']}",
+    for row in rows["rxnorm"]:
+        yield {
+            "text": passage_text("rxnorm", row["name"], row["rxnorm"], row.get("synonyms")),
             "system": "rxnorm",
             "code": row["rxnorm"],
             "display": row["name"]
-        })
+        }
 
     # LOINC
-    for row in LOINC_DATA:
-        passages.append({
-            "text": f"LOINC test: {row['test']} | code: {row['code']}",
+    for row in rows["loinc"]:
+        yield {
+            "text": passage_text("loinc", row["test"], row["code"]),
             "system": "loinc",
             "code": row["code"],
             "display": row["component"]
-        })
+        }
+
+
+def _backend_passages(store) -> Iterator[dict]:
+    # Compiled backends keep each concept's display and normalized keys;
+    # the keys other than the display stand in for the CSV synonyms.
+    for system in PASSAGE_TEMPLATES:
+        for code, display, keys in store.concepts(system):
+            synonyms = ";".join(key for key in sorted(keys) if key != display.lower()) or None
+            yield {
+                "text": passage_text(system, display, code, synonyms),
+                "system": system,
+                "code": code,
+                "display": display,
+            }
+
+
+def build_passages() -> List[dict]:
+    return list(iter_passages())
+
+
+# ---------------------------------------------------------
+# Sharded, resumable embedding
+# ---------------------------------------------------------
+
+@retry(wait=wait_exponential(min=1, max=30), stop=stop_after_attempt(5), reraise=True)
+def _embed_batch(texts: List[str], backend=None) -> np.ndarray:
+    # Index builds yield to interactive traffic at the embedding limiter
+    with priority_class("bulk"):
+        return embed_text(texts, backend=backend)
+
+
+def _shard_digest(texts: List[str], backend_name: str) -> str:
+    """
+    Identifies a shard's content and vector space, so edited vocabularies
+    or a different backend don't reuse stale vectors.
+    """
+    digest = hashlib.sha1(backend_name.encode())
+    for text in texts:
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _load_manifest(work_dir: str) -> Dict[str, dict]:
+    path = os.path.join(work_dir, "manifest.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_manifest(work_dir: str, manifest: Dict[str, dict]) -> None:
+    path = os.path.join(work_dir, "manifest.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f)
+    os.replace(path + ".tmp", path)
+
+
+def _write_shard(work_dir: str, name: str, vectors: np.ndarray, passages: List[dict]) -> None:
+    """Vectors first, then metadata; each renamed into place only when complete."""
+    vec_path = os.path.join(work_dir, f"{name}.npy")
+    with open(vec_path + ".tmp", "wb") as f:
+        np.save(f, vectors)
+    os.replace(vec_path + ".tmp", vec_path)
+
+    meta_path = os.path.join(work_dir, f"{name}.jsonl")
+    with open(meta_path + ".tmp", "w") as f:
+        for passage in passages:
+            f.write(json.dumps(passage) + "\n")
+    os.replace(meta_path + ".tmp", meta_path)
+
+
+def embed_shards(
+    passages: Iterator[dict],
+    work_dir: str = WORK_DIR,
+    batch_size: int = BATCH_SIZE,
+    workers: int = WORKERS,
+    shard_size: int = SHARD_SIZE,
+    backend=None,
+) -> Dict[str, Any]:
+    """
+    Embed passages shard by shard into work_dir, skipping shards that
+    are already checkpointed with the same content. Returns the ordered
+    shard names and counts of passages embedded vs. resumed.
+    """
+    backend = backend or configured_backend()
+    os.makedirs(work_dir, exist_ok=True)
+    manifest = _load_manifest(work_dir)
+    shard_names: List[str] = []
+    stats = {"embedded": 0, "resumed": 0}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for shard_id in itertools.count():
+            shard = list(itertools.islice(passages, shard_size))
+            if not shard:
+                break
+
+            name = f"shard_{shard_id:05d}"
+            shard_names.append(name)
+            texts = [p["text"] for p in shard]
+            digest = _shard_digest(texts, backend.name)
+
+            done = manifest.get(name)
+            if done and done["digest"] == digest and os.path.exists(os.path.join(work_dir, f"{name}.jsonl")):
+                stats["resumed"] += len(shard)
+                continue
+
+            batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+            vectors = np.vstack(list(pool.map(lambda batch: _embed_batch(batch, backend), batches)))
+
+            _write_shard(work_dir, name, vectors, shard)
+            manifest[name] = {"digest": digest, "count": len(shard)}
+            _save_manifest(work_dir, manifest)
+            stats["embedded"] += len(shard)
+
+    # Shards beyond the end are left over from a larger vocabulary
+    for name in set(manifest) - set(shard_names):
+        del manifest[name]
+    _save_manifest(work_dir, manifest)
+
+    stats["shards"] = shard_names
+    return stats
+
+
+# ---------------------------------------------------------
+# Assemble
+# ---------------------------------------------------------
+
+def _training_sample(shard_paths: List[str], n_total: int, size: int) -> np.ndarray:
+    """Uniform sample across shards, read through mmap so shards aren't loaded whole."""
+    rng = np.random.default_rng(0)
+    fraction = min(1.0, size / n_total)
+    parts = []
+    for path in shard_paths:
+        vectors = np.load(path, mmap_mode="r")
+        keep = rng.random(len(vectors)) < fraction
+        parts.append(np.asarray(vectors[keep]))
+    return np.vstack(parts)
+
+
+def assemble_index(
+    shard_names: List[str],
+    work_dir: str = WORK_DIR,
+    index_path: str = INDEX_PATH,
+    meta_path: str = META_PATH,
+    index_type: str = "flat",
+    index_params: Optional[Dict[str, Any]] = None,
+    backend=None,
+    holding_lock: bool = False,
+) -> int:
+    """
+    Add shard vectors to the index one shard at a time and stream the
+    metadata into the columnar meta.bin. IVF and sq8 indexes are first
+    trained on a sample drawn from all shards. Vectors are keyed by
+    stable concept id, also stored in the metadata, so index_updates can
+    replace or retire them later. Returns the number of passages.
+
+    The new files replace the old ones together (rag/index_files.py).
+    Pass holding_lock=True when the caller already holds index_lock.
+    """
+    backend = backend or configured_backend()
+    shard_paths = [os.path.join(work_dir, f"{name}.npy") for name in shard_names]
+    shapes = [np.load(path, mmap_mode="r").shape for path in shard_paths]
+    if not shapes:
+        raise RuntimeError("No passages to index; are the vocabulary files present?")
+
+    n_total, dim = sum(shape[0] for shape in shapes), shapes[0][1]
+    params = resolve_params(index_type, n_total, **(index_params or {}))
+    index = faiss.IndexIDMap2(create_index(index_type, dim, params))
+
+    sample_size = training_size(index_type, params)
+    if sample_size:
+        train_index(index, _training_sample(shard_paths, n_total, sample_size))
+
+    meta = MetadataWriter(stage_path(meta_path))
+    for name, path in zip(shard_names, shard_paths):
+        with open(os.path.join(work_dir, f"{name}.jsonl")) as f:
+            rows = [json.loads(line) for line in f]
+        for row in rows:
+            row["id"] = concept_id(row["system"], row["code"])
+
+        index.add_with_ids(np.load(path), np.array([row["id"] for row in rows], dtype=np.int64))
+        meta.extend(rows)
+
+    meta.close()
+
+    # Stage every file, then swap them in together
+    index_dir = os.path.dirname(index_path)
+    targets = {index_path: stage_path(index_path), meta_path: stage_path(meta_path)}
+    faiss.write_index(index, targets[index_path])
+    if hasattr(backend, "save"):
+        idf_path = os.path.join(index_dir, LOCAL_IDF_FILENAME)
+        targets[idf_path] = stage_path(idf_path)
+        backend.save(targets[idf_path])
+    info_path = info_path_for(index_path)
+    targets[info_path] = stage_path(info_path)
+    write_index_info(index_path, {
+        "type": index_type,
+        "params": params,
+        "dim": dim,
+        "ntotal": meta.n_rows,
+        "metric": "l2",
+        "ids": "concept",
+        "embedding_model": backend.name,
+    }, targets[info_path])
+
+    if holding_lock:
+        commit_files(index_dir, targets)
+    else:
+        with index_lock(index_dir):
+            finish_pending_commit(index_dir)
+            commit_files(index_dir, targets)
+    return meta.n_rows
+
+
+def build_index(
+    batch_size: int = BATCH_SIZE,
+    workers: int = WORKERS,
+    shard_size: int = SHARD_SIZE,
+    work_dir: str = WORK_DIR,
+    fresh: bool = False,
+    keep_shards: bool = False,
+    index_type: str = "flat",
+    index_params: Optional[Dict[str, Any]] = None,
+) -> Dict[str, float]:
+    if fresh and os.path.isdir(work_dir):
+        shutil.rmtree(work_dir)
 
-    return passages
+    started = time.perf_counter()
 
+    backend = configured_backend()
+    if hasattr(backend, "fit"):
+        # Local backend: IDF over this vocabulary, saved next to the index
+        backend.fit(p["text"] for p in iter_passages())
 
-def build_index():
-    passages = build_passages()
-    texts = [p["text"] for p in passages]
+    stats = embed_shards(iter_passages(), work_dir, batch_size, workers, shard_size, backend)
+    total = assemble_index(
+        stats["shards"], work_dir,
+        index_type=index_type, index_params=index_params, backend=backend,
+    )
+    elapsed = time.perf_counter() - started
 
-    # Embed
-    vectors = embed_text(texts)  # (N, 1536)
+    if not keep_shards:
+        shutil.rmtree(work_dir)
 
-    dim = vectors.shape[1]
-    index = faiss.IndexFlatL2(dim)
-    index.add(vectors)
+    passage_rate = total / elapsed if elapsed else 0.0
+    embed_rate = stats["embedded"] / elapsed if elapsed else 0.0
+    cached = EMBEDDING_CACHE.stats()["hits"]
+    print(
+        f"Built {index_type} FAISS index ({backend.name}) with {total} entries in {elapsed:.1f}s "
+        f"({passage_rate:,.0f} passages/sec; {stats['embedded']} embedded at "
+        f"{embed_rate:,.0f}/sec, {stats['resumed']} resumed from checkpoints, "
+        f"{cached} embeddings reused from cache)."
+    )
+    return {"passages": total, "seconds": elapsed, **{k: stats[k] for k in ("embedded", "resumed")}}
 
-    # Save
-    faiss.write_index(index, INDEX_PATH)
 
-    with open(META_PATH, "w") as f:
-        json.dump(passages, f, indent=2)
+def parse_args(argv: Optional[list] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build the FAISS index from the vocabularies.")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Passages per embeddings request")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Concurrent embeddings requests")
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE, help="Passages per checkpointed shard")
+    parser.add_argument("--work-dir", default=WORK_DIR, help="Checkpoint directory")
+    parser.add_argument("--fresh", action="store_true", help="Ignore existing checkpoints")
+    parser.add_argument("--keep-shards", action="store_true", help="Keep checkpoints after a successful build")
 
-    print(f"Built FAISS index with {len(passages)} entries.")
+    ann = parser.add_argument_group("index type (see rag/index_types.py)")
+    ann.add_argument("--index-type", choices=INDEX_TYPES, default="flat")
+    ann.add_argument("--hnsw-m", type=int, dest="M", help="HNSW links per node (default 32)")
+    ann.add_argument("--ef-construction", type=int, dest="efConstruction", help="HNSW build beam (default 200)")
+    ann.add_argument("--ef-search", type=int, dest="efSearch", help="HNSW search beam (default 64)")
+    ann.add_argument("--nlist", type=int, help="IVF clusters (default ~4*sqrt(N))")
+    ann.add_argument("--nprobe", type=int, help="IVF clusters searched per query (default 16)")
+    ann.add_argument("--pq-m", type=int, dest="pq_m", help="PQ sub-quantizers; must divide dim (default 64)")
+    ann.add_argument("--pq-nbits", type=int, dest="pq_nbits", help="Bits per PQ code (default 8)")
+    ann.add_argument(
+        "--storage", choices=tuple(STORAGE_TYPES),
+        help="Vector encoding for flat, hnsw and ivf_flat (default float32)",
+    )
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
-    build_index()
+    args = parse_args(sys.argv[1:])
+    build_index(
+        batch_size=args.batch_size,
+        workers=args.workers,
+        shard_size=args.shard_size,
+        work_dir=args.work_dir,
+        fresh=args.fresh,
+        keep_shards=args.keep_shards,
+        index_type=args.index_type,
+        index_params={
+            name: getattr(args, name)
+            for name in ("M", "efConstruction", "efSearch", "nlist", "nprobe", "pq_m", "pq_nbits", "storage")
+        },
+    )
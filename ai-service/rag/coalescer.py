@@ -0,0 +1,139 @@
+# ai-service/rag/coalescer.py
+"""
+Micro-batching for concurrent RAG lookups.
+
+Under load, many /pipeline requests each look up one or two condition
+terms. On its own, each one costs an embedding request and an
+index.search. BatchCoalescer gathers the calls that arrive within a
+short window (up to max_batch items), makes one call for all of them
+and hands every caller back its own slice.
+
+There is no background thread. The first caller for a key becomes the
+batch leader: it waits out the window, or less if the batch fills, then
+runs the batch on its own thread. Callers that join meanwhile block on a
+future. Items go in chunks of at most max_batch, and no chunk waits
+longer than the window plus one batched call. A leader with no other
+caller in flight for its key runs at once, so an idle service adds no
+latency.
+"""
+
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+
+
+class _Batch:
+    def __init__(self):
+        self.items: List[Any] = []
+        # (future, start, count) per caller, slicing the batched result
+        self.waiters: List[Tuple[Future, int, int]] = []
+        self.full = threading.Event()
+
+
+class BatchCoalescer:
+    """
+    Coalesce concurrent fn(*key, items) calls that share a key into a
+    single call. fn must return one result per item, in order.
+    """
+
+    def __init__(
+        self,
+        fn: Callable[..., List[Any]],
+        window_ms: float = 5.0,
+        max_batch: int = 64,
+    ):
+        self.fn = fn
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+
+        self._open: Dict[Hashable, _Batch] = {}
+        # Callers inside submit() per key, whether queued or running
+        self._active: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+
+        self.batches = 0
+        self.items = 0
+        self.callers = 0
+
+    def submit(self, key: Tuple, items: List[Any]) -> List[Any]:
+        if not items:
+            return []
+
+        with self._lock:
+            self._active[key] = self._active.get(key, 0) + 1
+        try:
+            # No batch exceeds max_batch, so larger submissions go in chunks
+            results = []
+            for start in range(0, len(items), self.max_batch):
+                results.extend(self._submit_chunk(key, items[start:start + self.max_batch]))
+            return results
+        finally:
+            with self._lock:
+                self._active[key] -= 1
+                if not self._active[key]:
+                    del self._active[key]
+
+    def _submit_chunk(self, key: Tuple, items: List[Any]) -> List[Any]:
+        future: Future = Future()
+        with self._lock:
+            batch = self._open.get(key)
+            if batch is not None and len(batch.items) + len(items) > self.max_batch:
+                # No room: send the open batch now and start another
+                self._close(key, batch)
+                batch = None
+
+            leader = batch is None
+            if leader:
+                batch = self._open[key] = _Batch()
+
+            start = len(batch.items)
+            batch.items.extend(items)
+            batch.waiters.append((future, start, len(items)))
+
+            if len(batch.items) >= self.max_batch:
+                self._close(key, batch)
+
+            # Nobody else could join: waiting would only add latency
+            alone = self._active[key] == 1
+
+        if leader:
+            if not alone:
+                batch.full.wait(self.window)
+            with self._lock:
+                if self._open.get(key) is batch:
+                    del self._open[key]
+            self._run(key, batch)
+
+        return future.result()
+
+    def _close(self, key: Tuple, batch: _Batch) -> None:
+        # Later callers start a new batch; the leader stops waiting
+        del self._open[key]
+        batch.full.set()
+
+    def _run(self, key: Tuple, batch: _Batch) -> None:
+        try:
+            results = self.fn(*key, batch.items)
+        except Exception as e:
+            for future, _start, _count in batch.waiters:
+                future.set_exception(e)
+            return
+
+        with self._lock:
+            self.batches += 1
+            self.items += len(batch.items)
+            self.callers += len(batch.waiters)
+
+        for future, start, count in batch.waiters:
+            future.set_result(results[start:start + count])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "window_ms": self.window * 1000.0,
+                "max_batch": self.max_batch,
+                "batches": self.batches,
+                "items": self.items,
+                "callers": self.callers,
+                "mean_batch": round(self.items / self.batches, 2) if self.batches else 0.0,
+            }
@@ -0,0 +1,122 @@
+# ai-service/rag/delta_log.py
+"""
+Append-only log of concept updates since the RAG index was built.
+
+    delta.jsonl   one JSON record per line
+                  {"op": "upsert", "id", "system", "code", "display", "text", "vector": n}
+                  {"op": "retire", "id", "system", "code"}
+    delta.f32     upserted vectors as raw float32, appended in order;
+                  "vector" is the row in this file
+
+The base index and meta.bin are never rewritten by an update. Vectors
+are flushed before the records that point at them, so a crash leaves at
+most an unreferenced vector or a torn last line, and both are ignored on
+replay. Replay is idempotent and the last record for an id wins.
+index_updates.compact() folds the log into the base files and removes it.
+"""
+
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+DELTA_LOG = "delta.jsonl"
+DELTA_VECTORS = "delta.f32"
+
+ROW_FIELDS = ("id", "system", "code", "display", "text")
+
+
+def delta_paths(index_dir: str) -> Tuple[str, str]:
+    return os.path.join(index_dir, DELTA_LOG), os.path.join(index_dir, DELTA_VECTORS)
+
+
+class DeltaState:
+    """
+    The replayed log: live upserted rows (metadata dicts with ids), their
+    vectors, and every id touched, whose base versions are superseded.
+    """
+
+    def __init__(self, rows: List[Dict[str, Any]], vectors: np.ndarray, touched: np.ndarray):
+        self.rows = rows
+        self.vectors = vectors
+        self.touched = touched
+
+    def __bool__(self) -> bool:
+        return bool(self.rows) or bool(len(self.touched))
+
+
+def read_delta(index_dir: str, dim: int) -> DeltaState:
+    log_path, vectors_path = delta_paths(index_dir)
+    if not os.path.exists(log_path):
+        return DeltaState([], np.empty((0, dim), dtype=np.float32), np.empty(0, dtype=np.int64))
+
+    stored = np.empty((0, dim), dtype=np.float32)
+    if os.path.exists(vectors_path):
+        raw = np.fromfile(vectors_path, dtype=np.float32)
+        stored = raw[:len(raw) - len(raw) % dim].reshape(-1, dim)
+
+    live: Dict[int, Dict[str, Any]] = {}
+    touched = set()
+    with open(log_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                break  # torn final line
+
+            if record["op"] == "upsert" and record["vector"] >= len(stored):
+                break
+
+            touched.add(record["id"])
+            # Re-inserting keeps rows in order of their latest update
+            live.pop(record["id"], None)
+            if record["op"] == "upsert":
+                live[record["id"]] = record
+
+    rows = [{name: record[name] for name in ROW_FIELDS} for record in live.values()]
+    vectors = stored[[record["vector"] for record in live.values()]].reshape(-1, dim)
+    return DeltaState(rows, vectors, np.array(sorted(touched), dtype=np.int64))
+
+
+def append_delta(
+    index_dir: str,
+    upserts: Optional[List[Dict[str, Any]]] = None,
+    vectors: Optional[np.ndarray] = None,
+    retires: Optional[List[Dict[str, Any]]] = None,
+) -> None:
+    """Append upserted rows (with their vectors) and retirements to the log."""
+    log_path, vectors_path = delta_paths(index_dir)
+    records: List[Dict[str, Any]] = []
+
+    if upserts:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        row_bytes = vectors.shape[1] * 4
+        with open(vectors_path, "ab") as f:
+            # Drop a partial vector left by a crash mid-write
+            size = f.tell()
+            if size % row_bytes:
+                f.truncate(size - size % row_bytes)
+                f.seek(0, os.SEEK_END)
+            start = f.tell() // row_bytes
+            f.write(vectors.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+        for i, row in enumerate(upserts):
+            records.append({"op": "upsert", **{name: row[name] for name in ROW_FIELDS}, "vector": start + i})
+
+    for row in retires or []:
+        records.append({"op": "retire", "id": row["id"], "system": row["system"], "code": row["code"]})
+
+    with open(log_path, "a") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def clear_delta(index_dir: str) -> None:
+    for path in delta_paths(index_dir):
+        if os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,110 @@
+# ai-service/rag/index_files.py
+"""
+Consistent replacement of the RAG index files.
+
+An index is several files that must match: faiss.index, meta.bin,
+index_info.json (and local_idf.npy for the local backend). Writers
+stage every new file under stage_path(), then commit_files() records
+the planned renames in commit.json before performing them. If the
+process dies part-way, the next reader or writer finds commit.json and
+finishes the renames (finish_pending_commit), so the files never stay
+mixed between two builds.
+
+index_lock() serializes writers across processes (the server's admin
+routes and the rag/index_updates.py CLI) and keeps readers from
+opening the files while a commit is under way.
+"""
+
+import json
+import os
+from contextlib import contextmanager
+from typing import Dict
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+LOCK_FILE = ".index.lock"
+COMMIT_FILE = "commit.json"
+
+
+def stage_path(path: str) -> str:
+    """Where a writer puts the next version of path until commit."""
+    return path + ".new"
+
+
+@contextmanager
+def index_lock(index_dir: str, shared: bool = False):
+    """
+    Inter-process lock on index_dir. Readers take it shared, writers
+    exclusive. Not reentrant: never nest it for the same directory.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    with open(os.path.join(index_dir, LOCK_FILE), "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        else:
+            # msvcrt has no shared mode, and LK_LOCK gives up after ~10s
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def commit_files(index_dir: str, targets: Dict[str, str]) -> None:
+    """
+    Move each staged file onto its target path ({target: staged}).
+    Call with index_lock held.
+    """
+    for staged in targets.values():
+        with open(staged, "rb+") as f:
+            os.fsync(f.fileno())
+
+    marker = os.path.join(index_dir, COMMIT_FILE)
+    with open(marker + ".tmp", "w") as f:
+        json.dump(targets, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(marker + ".tmp", marker)
+
+    _apply(marker)
+
+
+def finish_pending_commit(index_dir: str) -> bool:
+    """
+    Complete a commit interrupted by a crash. Call with index_lock held;
+    True if there was one.
+    """
+    marker = os.path.join(index_dir, COMMIT_FILE)
+    if not os.path.exists(marker):
+        return False
+    _apply(marker)
+    return True
+
+
+def commit_pending(index_dir: str) -> bool:
+    """Whether a commit is recorded but not finished (cheap, lock-free)."""
+    return os.path.exists(os.path.join(index_dir, COMMIT_FILE))
+
+
+def _apply(marker: str) -> None:
+    with open(marker) as f:
+        targets = json.load(f)
+    # Renames already done before a crash have no staged file left
+    for target, staged in targets.items():
+        if os.path.exists(staged):
+            os.replace(staged, target)
+    os.remove(marker)
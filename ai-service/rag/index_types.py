@@ -0,0 +1,222 @@
+# ai-service/rag/index_types.py
+"""
+FAISS index types for the RAG terminology index.
+
+    flat      exact brute force; fine up to tens of thousands of passages
+    hnsw      graph index, no training; M (links per node), efConstruction, efSearch
+    ivf_flat  inverted lists of full vectors; nlist (clusters), nprobe
+    ivf_pq    inverted lists of PQ codes; nlist, nprobe, pq_m (sub-quantizers), pq_nbits
+
+flat, hnsw and ivf_flat also take `storage`, how each vector is kept:
+
+    float32   as embedded (6 KB per 1536-d vector)
+    fp16      half precision (3 KB); recall is practically unchanged
+    sq8       one byte per dimension (1.5 KB), scaled per dimension
+              from a training sample
+
+Every type is wrapped in an IndexIDMap2 keyed by stable concept ids
+(concept_id), so single concepts can be added or retired later without
+renumbering anything (rag/index_updates.py).
+
+build_index records the type and parameters in index_info.json next to
+the index; rag_search reads it back to apply the search-time parameters
+(efSearch, nprobe), which FAISS does not persist reliably.
+"""
+
+import hashlib
+import json
+import math
+import os
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+
+# Scalar quantizer per storage; None keeps full float32 vectors
+STORAGE_TYPES: Dict[str, Optional[int]] = {
+    "float32": None,
+    "fp16": faiss.ScalarQuantizer.QT_fp16,
+    "sq8": faiss.ScalarQuantizer.QT_8bit,
+}
+
+DEFAULT_PARAMS: Dict[str, Dict[str, Any]] = {
+    "flat": {"storage": "float32"},
+    "hnsw": {"M": 32, "efConstruction": 200, "efSearch": 64, "storage": "float32"},
+    "ivf_flat": {"nlist": None, "nprobe": 16, "storage": "float32"},
+    "ivf_pq": {"nlist": None, "nprobe": 16, "pq_m": 64, "pq_nbits": 8},
+}
+
+# Search-time knobs, set through faiss.ParameterSpace after loading
+SEARCH_PARAMS = ("efSearch", "nprobe")
+
+# FAISS warns below ~39 training points per centroid
+MIN_POINTS_PER_CENTROID = 39
+
+# Enough vectors to estimate each dimension's range for sq8
+SQ_TRAINING_SIZE = 65536
+
+
+def resolve_params(index_type: str, n_vectors: int, **overrides: Any) -> Dict[str, Any]:
+    """
+    Defaults for index_type, overridden by any non-None values. nlist
+    defaults to ~4·sqrt(N) and is capped so every centroid can be trained.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}; expected one of {INDEX_TYPES}")
+
+    params = dict(DEFAULT_PARAMS[index_type])
+    params.update({k: v for k, v in overrides.items() if k in params and v is not None})
+
+    if params.get("storage", "float32") not in STORAGE_TYPES:
+        raise ValueError(f"Unknown storage {params['storage']!r}; expected one of {tuple(STORAGE_TYPES)}")
+
+    if "nlist" in params:
+        nlist = params["nlist"] or int(4 * math.sqrt(n_vectors))
+        params["nlist"] = max(1, min(nlist, n_vectors // MIN_POINTS_PER_CENTROID))
+        params["nprobe"] = min(params["nprobe"], params["nlist"])
+
+    return params
+
+
+def create_index(index_type: str, dim: int, params: Dict[str, Any]) -> faiss.Index:
+    """An empty (possibly untrained) L2 index of the given type."""
+    sq = STORAGE_TYPES[params.get("storage", "float32")]
+
+    if index_type == "flat":
+        if sq is None:
+            return faiss.IndexFlatL2(dim)
+        return faiss.IndexScalarQuantizer(dim, sq, faiss.METRIC_L2)
+
+    if index_type == "hnsw":
+        if sq is None:
+            index = faiss.IndexHNSWFlat(dim, params["M"])
+        else:
+            index = faiss.IndexHNSWSQ(dim, sq, params["M"])
+        index.hnsw.efConstruction = params["efConstruction"]
+        return index
+
+    quantizer = faiss.IndexFlatL2(dim)
+    if index_type == "ivf_flat":
+        if sq is None:
+            return faiss.IndexIVFFlat(quantizer, dim, params["nlist"])
+        return faiss.IndexIVFScalarQuantizer(quantizer, dim, params["nlist"], sq, faiss.METRIC_L2)
+
+    if dim % params["pq_m"]:
+        raise ValueError(f"pq_m={params['pq_m']} must divide the embedding dimension {dim}")
+    return faiss.IndexIVFPQ(quantizer, dim, params["nlist"], params["pq_m"], params["pq_nbits"])
+
+
+def training_size(index_type: str, params: Dict[str, Any]) -> int:
+    """How many vectors to sample for train(); 0 if the type needs none."""
+    size = 0
+    if index_type == "ivf_flat":
+        size = 256 * params["nlist"]
+    if index_type == "ivf_pq":
+        size = max(256 * params["nlist"], 256 * (1 << params["pq_nbits"]))
+    if params.get("storage") == "sq8":
+        size = max(size, SQ_TRAINING_SIZE)
+    return size
+
+
+def train_index(index: faiss.Index, sample: np.ndarray) -> None:
+    if not index.is_trained:
+        index.train(np.ascontiguousarray(sample, dtype=np.float32))
+
+
+def read_index(path: str) -> faiss.Index:
+    """
+    Map the index read-only instead of copying it into the heap: the
+    vectors stay in the page cache, shared by every worker, and opening
+    is near-instant. Falls back to a normal read where unsupported.
+    """
+    flags = getattr(faiss, "IO_FLAG_MMAP_IFC", 0) | faiss.IO_FLAG_READ_ONLY
+    try:
+        return faiss.read_index(path, flags)
+    except RuntimeError:
+        return faiss.read_index(path)
+
+
+def apply_search_params(index: faiss.Index, params: Dict[str, Any]) -> None:
+    space = faiss.ParameterSpace()
+    for name in SEARCH_PARAMS:
+        if params.get(name) is not None:
+            space.set_index_parameter(index, name, params[name])
+
+
+def search_parameters(
+    index_type: str,
+    params: Dict[str, Any],
+    selector: faiss.IDSelector,
+) -> faiss.SearchParameters:
+    """
+    Per-call parameters restricting a search to selector's ids. They
+    replace the index's own efSearch/nprobe for that call, so the
+    recorded values are passed along.
+    """
+    if index_type == "hnsw":
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=params.get("efSearch", 16))
+    if index_type in ("ivf_flat", "ivf_pq"):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=params.get("nprobe", 1))
+    return faiss.SearchParameters(sel=selector)
+
+
+# ---------------------------------------------------------
+# Stable concept ids
+# ---------------------------------------------------------
+
+# High byte: terminology; low 56 bits: hash of the code. Ids survive
+# rebuilds and reordering, and each system is one contiguous id range.
+SYSTEM_ID_BITS = 56
+SYSTEM_IDS = {"snomed": 1, "icd10": 2, "rxnorm": 3, "loinc": 4}
+
+
+def concept_id(system: str, code: str) -> int:
+    if system not in SYSTEM_IDS:
+        raise ValueError(f"Unknown system {system!r}; expected one of {tuple(SYSTEM_IDS)}")
+    digest = hashlib.blake2b(str(code).encode("utf-8"), digest_size=SYSTEM_ID_BITS // 8).digest()
+    return (SYSTEM_IDS[system] << SYSTEM_ID_BITS) | int.from_bytes(digest, "big")
+
+
+def system_selector(systems: Iterable[str]) -> Tuple[faiss.IDSelector, list]:
+    """
+    Selector for the id ranges of systems, plus the objects it references
+    (SWIG selectors don't own their children; keep the list alive).
+    """
+    keep: list = []
+    selector = None
+    for system in sorted(systems, key=SYSTEM_IDS.get):
+        low = SYSTEM_IDS[system] << SYSTEM_ID_BITS
+        ranged = faiss.IDSelectorRange(low, low + (1 << SYSTEM_ID_BITS))
+        keep.append(ranged)
+        if selector is not None:
+            keep.append(selector)
+            ranged = faiss.IDSelectorOr(selector, ranged)
+        selector = ranged
+    return selector, keep
+
+
+# ---------------------------------------------------------
+# index_info.json
+# ---------------------------------------------------------
+
+def info_path_for(index_path: str) -> str:
+    return os.path.join(os.path.dirname(index_path), "index_info.json")
+
+
+def write_index_info(index_path: str, info: Dict[str, Any], path: Optional[str] = None) -> None:
+    """Write index_info.json for index_path, or to path (a staged copy)."""
+    path = path or info_path_for(index_path)
+    with open(path + ".tmp", "w") as f:
+        json.dump(info, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def read_index_info(index_path: str) -> Optional[Dict[str, Any]]:
+    """None for indexes built before index_info.json existed (always flat)."""
+    path = info_path_for(index_path)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
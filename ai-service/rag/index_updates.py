@@ -0,0 +1,215 @@
+# ai-service/rag/index_updates.py
+"""
+Add, update and retire single concepts in the RAG index without a rebuild.
+
+Usage (from ai-service/):
+
+    python rag/index_updates.py upsert --system snomed --code 123 --display "..." [--synonyms "a;b"]
+    python rag/index_updates.py retire --system snomed --code 123
+    python rag/index_updates.py compact
+
+An update embeds only the passages it changes. It appends them to the
+update log (rag/delta_log.py) and leaves the base index and meta.bin
+untouched. Running services pick updates up on POST /admin/reload; the
+/admin/rag/concepts routes reload for you.
+
+compact() folds the log into new base files. Retired and superseded
+vectors are deleted in place where the index type supports it (flat,
+IVF). HNSW cannot delete, so it is rebuilt from the live passages; with
+EMBEDDING_CACHE_PATH set, the embedding cache makes that a local operation.
+
+Every write holds the index directory's file lock (rag/index_files.py),
+so the CLI and a running server never interleave updates, and compact()
+swaps all base files in together.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import shutil
+from typing import Any, Dict, List, Optional
+
+import faiss
+import numpy as np
+
+from rag.build_index import PASSAGE_TEMPLATES, assemble_index, embed_shards, passage_text
+from rag.delta_log import append_delta, clear_delta, read_delta
+from rag.index_files import commit_files, finish_pending_commit, index_lock, stage_path
+from rag.index_types import concept_id, info_path_for, read_index_info, write_index_info
+from rag.metadata_store import MetadataWriter, open_metadata
+from rag.rag_search import INDEX_PATH, META_PATH
+from utils.embeddings import configured_backend, embed_text
+
+SYNONYM_SEPARATORS = {"snomed": ";", "rxnorm": ","}
+
+
+def concept_passage(
+    system: str,
+    code: str,
+    display: str,
+    synonyms: Optional[List[str]] = None,
+    text: Optional[str] = None,
+) -> Dict[str, Any]:
+    """An index row for one concept; text defaults to build_index's wording."""
+    if text is None:
+        separator = SYNONYM_SEPARATORS.get(system, ";")
+        text = passage_text(system, display, code, separator.join(synonyms or []) or None)
+    elif system not in PASSAGE_TEMPLATES:
+        raise ValueError(f"Unknown system {system!r}; expected one of {tuple(PASSAGE_TEMPLATES)}")
+    return {"id": concept_id(system, code), "system": system, "code": code, "display": display, "text": text}
+
+
+def _index_info(index_path: str) -> Dict[str, Any]:
+    info = read_index_info(index_path)
+    if not info or info.get("ids") != "concept":
+        raise RuntimeError(
+            f"{index_path} is not keyed by concept id; rebuild it with rag/build_index.py once to enable updates"
+        )
+    return info
+
+
+def _backend(index_path: str, info: Dict[str, Any]):
+    backend = configured_backend(os.path.dirname(index_path))
+    if info.get("embedding_model") and info["embedding_model"] != backend.name:
+        raise RuntimeError(
+            f"{index_path} was built with {info['embedding_model']!r} embeddings but "
+            f"EMBEDDING_BACKEND gives {backend.name!r}; rebuild it with rag/build_index.py"
+        )
+    return backend
+
+
+def upsert_concepts(concepts: List[Dict[str, Any]], index_path: str = INDEX_PATH) -> int:
+    """
+    Add concepts, or replace the passage of concepts already indexed
+    (same system and code). Only these passages are embedded.
+    """
+    if not concepts:
+        return 0
+
+    info = _index_info(index_path)
+    rows = [concept_passage(**concept) for concept in concepts]
+    vectors = embed_text([row["text"] for row in rows], backend=_backend(index_path, info))
+
+    index_dir = os.path.dirname(index_path)
+    with index_lock(index_dir):
+        append_delta(index_dir, upserts=rows, vectors=vectors)
+    return len(rows)
+
+
+def retire_concepts(concepts: List[Dict[str, str]], index_path: str = INDEX_PATH) -> int:
+    """Remove concepts (by system and code) from search results."""
+    if not concepts:
+        return 0
+
+    _index_info(index_path)
+    retires = [
+        {"id": concept_id(c["system"], c["code"]), "system": c["system"], "code": c["code"]}
+        for c in concepts
+    ]
+    index_dir = os.path.dirname(index_path)
+    with index_lock(index_dir):
+        append_delta(index_dir, retires=retires)
+    return len(retires)
+
+
+def compact(index_path: str = INDEX_PATH, meta_path: str = META_PATH) -> Dict[str, int]:
+    """
+    Fold the update log into a new index and meta.bin, staged beside
+    the old ones and committed together, then remove the log.
+    """
+    index_dir = os.path.dirname(index_path)
+    with index_lock(index_dir):
+        finish_pending_commit(index_dir)
+        info = _index_info(index_path)
+        delta = read_delta(index_dir, info["dim"])
+        if not delta:
+            return {"passages": info["ntotal"], "removed": 0, "added": 0}
+
+        base = open_metadata(meta_path)
+        live = ~np.isin(base.array("id"), delta.touched)
+        live_rows = [base[row] for row in np.flatnonzero(live)] + delta.rows
+        stats = {"passages": len(live_rows), "removed": int((~live).sum()), "added": len(delta.rows)}
+
+        index = faiss.read_index(index_path)  # writable, in memory
+        try:
+            if stats["removed"]:
+                index.remove_ids(faiss.IDSelectorBatch(delta.touched))
+        except RuntimeError:
+            # No in-place deletion (HNSW): rebuild from the live passages
+            _rebuild(live_rows, index_path, meta_path, info)
+            clear_delta(index_dir)
+            return stats
+
+        if delta.rows:
+            index.add_with_ids(delta.vectors, np.array([row["id"] for row in delta.rows], dtype=np.int64))
+
+        info_path = info_path_for(index_path)
+        targets = {path: stage_path(path) for path in (index_path, meta_path, info_path)}
+        faiss.write_index(index, targets[index_path])
+        meta = MetadataWriter(targets[meta_path])
+        meta.extend(live_rows)
+        meta.close()
+        write_index_info(index_path, {**info, "ntotal": meta.n_rows}, targets[info_path])
+        commit_files(index_dir, targets)
+
+        # A crash before this only replays updates already folded in
+        clear_delta(index_dir)
+        return stats
+
+
+def _rebuild(rows: List[Dict[str, Any]], index_path: str, meta_path: str, info: Dict[str, Any]) -> None:
+    backend = _backend(index_path, info)
+    work_dir = os.path.join(os.path.dirname(index_path), "compact")
+    passages = ({k: v for k, v in row.items() if k != "id"} for row in rows)
+    try:
+        stats = embed_shards(passages, work_dir, backend=backend)
+        assemble_index(
+            stats["shards"], work_dir, index_path, meta_path,
+            info["type"], info["params"], backend=backend, holding_lock=True,
+        )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+# ---------------------------------------------------------
+# CLI
+# ---------------------------------------------------------
+
+def parse_args(argv: Optional[list] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Update single concepts in the RAG index.")
+    parser.add_argument("--index-path", default=INDEX_PATH)
+    parser.add_argument("--meta-path", default=META_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    upsert = commands.add_parser("upsert", help="Add or replace a concept")
+    upsert.add_argument("--system", required=True, choices=tuple(PASSAGE_TEMPLATES))
+    upsert.add_argument("--code", required=True)
+    upsert.add_argument("--display", required=True)
+    upsert.add_argument("--synonyms", help="Separated by ';'")
+    upsert.add_argument("--text", help="Passage text (default: build_index's wording)")
+
+    retire = commands.add_parser("retire", help="Remove a concept from search")
+    retire.add_argument("--system", required=True, choices=tuple(PASSAGE_TEMPLATES))
+    retire.add_argument("--code", required=True)
+
+    commands.add_parser("compact", help="Fold the update log into the index files")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+    if args.command == "upsert":
+        synonyms = [s.strip() for s in args.synonyms.split(";")] if args.synonyms else None
+        upsert_concepts([{
+            "system": args.system, "code": args.code, "display": args.display,
+            "synonyms": synonyms, "text": args.text,
+        }], args.index_path)
+        print(f"Upserted {args.system} {args.code}; POST /admin/reload to serve it.")
+    elif args.command == "retire":
+        retire_concepts([{"system": args.system, "code": args.code}], args.index_path)
+        print(f"Retired {args.system} {args.code}; POST /admin/reload to apply.")
+    else:
+        stats = compact(args.index_path, args.meta_path)
+        print(f"Compacted: {stats['passages']} passages ({stats['removed']} removed, {stats['added']} added).")
@@ -0,0 +1,123 @@
+# ai-service/rag/lexical_index.py
+"""
+BM25 retriever over the RAG passages, fused with vector hits.
+
+Abbreviations and codes ("HTN", "T2DM", "E11.9") appear verbatim in the
+passages but embed poorly. An inverted index finds them exactly, and
+when its top hit is unambiguous rag_search skips the embedding call.
+Otherwise both rankings are merged with reciprocal rank fusion.
+"""
+
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Reciprocal rank fusion constant (Cormack et al.); damps the head of
+# each ranking so neither retriever dominates
+RRF_K = 60
+
+# (row, bm25 score, number of distinct query tokens the passage contains)
+LexicalHit = Tuple[int, float, int]
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class LexicalIndex:
+    """Okapi BM25 over an inverted index of NumPy posting arrays."""
+
+    def __init__(self, texts: Iterable[str], k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        lengths: List[int] = []
+        for row, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths.append(sum(counts.values()))
+            for token, tf in counts.items():
+                postings.setdefault(token, []).append((row, tf))
+
+        self.n_rows = len(lengths)
+        doc_lengths = np.array(lengths, dtype=np.float32)
+        average = float(doc_lengths.mean()) if self.n_rows else 1.0
+        # Per-passage length normalization, precomputed once
+        self._norm = k1 * (1 - b + b * doc_lengths / max(average, 1.0))
+
+        self._postings: Dict[str, Tuple[np.ndarray, np.ndarray, float]] = {}
+        for token, entries in postings.items():
+            rows, tfs = zip(*entries)
+            df = len(rows)
+            idf = math.log(1 + (self.n_rows - df + 0.5) / (df + 0.5))
+            self._postings[token] = (
+                np.array(rows, dtype=np.int64),
+                np.array(tfs, dtype=np.float32),
+                idf,
+            )
+
+    def search(
+        self,
+        query: str,
+        k: int,
+        allowed: Optional[np.ndarray] = None,
+    ) -> Tuple[List[LexicalHit], int]:
+        """
+        Top-k passages for query, optionally restricted to rows where the
+        boolean mask `allowed` is set. Also returns the number of distinct
+        query tokens, for is_decisive().
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        rows_parts, score_parts = [], []
+        for token in tokens:
+            posting = self._postings.get(token)
+            if posting is None:
+                continue
+            rows, tfs, idf = posting
+            rows_parts.append(rows)
+            score_parts.append(idf * tfs * (self.k1 + 1) / (tfs + self._norm[rows]))
+
+        if not rows_parts:
+            return [], len(tokens)
+
+        rows = np.concatenate(rows_parts)
+        unique_rows, inverse = np.unique(rows, return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+        matched = np.bincount(inverse)
+
+        if allowed is not None:
+            keep = allowed[unique_rows]
+            unique_rows, scores, matched = unique_rows[keep], scores[keep], matched[keep]
+
+        top = np.argsort(-scores, kind="stable")[:k]
+        hits = [(int(unique_rows[i]), float(scores[i]), int(matched[i])) for i in top]
+        return hits, len(tokens)
+
+
+def is_decisive(hits: Sequence[LexicalHit], n_tokens: int, ratio: float) -> bool:
+    """
+    The lexical answer is trusted alone when the top passage contains
+    every query token and outscores the runner-up by `ratio`.
+    """
+    if not hits or n_tokens == 0:
+        return False
+
+    _row, top_score, matched = hits[0]
+    if matched < n_tokens:
+        return False
+
+    return len(hits) == 1 or top_score >= ratio * hits[1][1]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int) -> List[Tuple[int, float]]:
+    """Merge row rankings (best first) into the top k (row, fused score)."""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking):
+            fused[row] = fused.get(row, 0.0) + 1.0 / (RRF_K + rank + 1)
+
+    return sorted(fused.items(), key=lambda item: -item[1])[:k]
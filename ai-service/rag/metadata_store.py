@@ -0,0 +1,299 @@
+# ai-service/rag/metadata_store.py
+"""
+Compact, memory-mapped row metadata for the RAG index.
+
+One row per FAISS vector (id, system, code, display, text), stored
+column-wise so a search result is decoded by row number without parsing
+the rest of the file:
+
+    header    magic, row count, directory offset and length
+    sections  8-byte aligned NumPy arrays / UTF-8 blobs
+    directory JSON: {name: {"kind", section: [offset, size], ...}}
+
+Column kinds:
+
+    category  uint8 codes + label list (system: 4 labels for any N rows)
+    str       uint64 end offsets + UTF-8 blob
+    int       int64 values (id: the stable concept id FAISS returns);
+              omitted when the rows carry none
+
+meta.json files written by older builds are still readable through
+open_metadata(), fully parsed as before.
+"""
+
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+MAGIC = b"RAGMETA1"
+HEADER = struct.Struct("<8sQQQ")  # magic, n_rows, directory offset, directory length
+
+INT_COLUMNS = ("id",)
+CATEGORY_COLUMNS = ("system",)
+STRING_COLUMNS = ("code", "display", "text")
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+# =========================================================
+# Write
+# =========================================================
+
+class MetadataWriter:
+    """
+    Streams rows to disk: string bytes are spooled to temp files and
+    only per-row offsets stay in memory, so writing N rows never holds
+    the whole metadata at once.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.n_rows = 0
+        self._ints: Dict[str, List[int]] = {name: [] for name in INT_COLUMNS}
+        self._labels: Dict[str, Dict[str, int]] = {name: {} for name in CATEGORY_COLUMNS}
+        self._codes: Dict[str, List[int]] = {name: [] for name in CATEGORY_COLUMNS}
+        self._blobs = {name: tempfile.TemporaryFile() for name in STRING_COLUMNS}
+        self._ends: Dict[str, List[int]] = {name: [] for name in STRING_COLUMNS}
+
+    def append(self, row: Dict[str, Any]) -> None:
+        for name in INT_COLUMNS:
+            if row.get(name) is not None:
+                self._ints[name].append(int(row[name]))
+
+        for name in CATEGORY_COLUMNS:
+            labels = self._labels[name]
+            value = row[name]
+            if value not in labels:
+                if len(labels) == 255:
+                    raise ValueError(f"Too many distinct values for category column {name!r}")
+                labels[value] = len(labels)
+            self._codes[name].append(labels[value])
+
+        for name in STRING_COLUMNS:
+            blob = self._blobs[name]
+            blob.write(str(row.get(name) or "").encode("utf-8"))
+            self._ends[name].append(blob.tell())
+
+        self.n_rows += 1
+
+    def extend(self, rows: Iterable[Dict[str, Any]]) -> None:
+        for row in rows:
+            self.append(row)
+
+    def close(self) -> None:
+        """Write the file (via a temp name, then rename) and release spool files."""
+        columns: Dict[str, Dict[str, Any]] = {}
+        sections: List[tuple] = []  # (column, section, source)
+
+        for name in INT_COLUMNS:
+            values = self._ints[name]
+            if values and len(values) != self.n_rows:
+                raise ValueError(f"Column {name!r} must be set on every row or none")
+            if values:
+                columns[name] = {"kind": "int"}
+                sections.append((name, "values", np.array(values, dtype="<i8")))
+
+        for name in CATEGORY_COLUMNS:
+            labels = sorted(self._labels[name], key=self._labels[name].get)
+            columns[name] = {"kind": "category", "labels": labels}
+            sections.append((name, "codes", np.array(self._codes[name], dtype=np.uint8)))
+
+        for name in STRING_COLUMNS:
+            columns[name] = {"kind": "str"}
+            sections.append((name, "ends", np.array(self._ends[name], dtype="<u8")))
+            sections.append((name, "data", self._blobs[name]))
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(b"\0" * HEADER.size)
+            for name, section, source in sections:
+                offset = _align(f.tell())
+                f.write(b"\0" * (offset - f.tell()))
+                if isinstance(source, np.ndarray):
+                    f.write(source.tobytes())
+                else:
+                    source.seek(0)
+                    shutil.copyfileobj(source, f)
+                columns[name][section] = [offset, f.tell() - offset]
+
+            directory = json.dumps(columns).encode("utf-8")
+            directory_offset = f.tell()
+            f.write(directory)
+
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, self.n_rows, directory_offset, len(directory)))
+        os.replace(tmp_path, self.path)
+
+        for blob in self._blobs.values():
+            blob.close()
+
+
+def write_metadata(path: str, rows: Iterable[Dict[str, Any]]) -> int:
+    writer = MetadataWriter(path)
+    writer.extend(rows)
+    writer.close()
+    return writer.n_rows
+
+
+# =========================================================
+# Read
+# =========================================================
+
+class MetadataStore:
+    """
+    Read-only view over a metadata file. Opening it reads the header
+    only; rows are decoded on access from the shared mapping.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.n_rows, directory_offset, directory_len = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Not a RAG metadata file: {path}")
+
+        self.path = path
+        self.columns: Dict[str, Dict[str, Any]] = json.loads(
+            self._mm[directory_offset:directory_offset + directory_len]
+        )
+
+        self._ints: Dict[str, np.ndarray] = {}
+        self._categories: Dict[str, np.ndarray] = {}
+        self._ends: Dict[str, np.ndarray] = {}
+        for name, column in self.columns.items():
+            if column["kind"] == "int":
+                offset, size = column["values"]
+                self._ints[name] = np.frombuffer(self._mm, "<i8", size // 8, offset)
+            elif column["kind"] == "category":
+                offset, size = column["codes"]
+                self._categories[name] = np.frombuffer(self._mm, np.uint8, size, offset)
+            else:
+                offset, size = column["ends"]
+                self._ends[name] = np.frombuffer(self._mm, "<u8", size // 8, offset)
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    def _string(self, name: str, row: int) -> str:
+        ends = self._ends[name]
+        start = int(ends[row - 1]) if row else 0
+        data_offset = self.columns[name]["data"][0]
+        return self._mm[data_offset + start:data_offset + int(ends[row])].decode("utf-8")
+
+    def value(self, name: str, row: int) -> Any:
+        if name in self._ints:
+            return int(self._ints[name][row])
+        if name in self._categories:
+            return self.columns[name]["labels"][self._categories[name][row]]
+        return self._string(name, row)
+
+    def array(self, name: str) -> Optional[np.ndarray]:
+        """An int column as a (mapped) array, or None if the file has none."""
+        return self._ints.get(name)
+
+    def __getitem__(self, row: int) -> Dict[str, Any]:
+        if not -self.n_rows <= row < self.n_rows:
+            raise IndexError(row)
+        row %= self.n_rows
+        return {name: self.value(name, row) for name in self.columns}
+
+    def __iter__(self):
+        for row in range(self.n_rows):
+            yield self[row]
+
+    def category_rows(self, name: str) -> Dict[str, np.ndarray]:
+        """Row ids per label of a category column, without decoding any strings."""
+        codes = self._categories[name]
+        return {
+            label: np.flatnonzero(codes == i).astype(np.int64)
+            for i, label in enumerate(self.columns[name]["labels"])
+            if (codes == i).any()
+        }
+
+
+class _JsonMetadata(list):
+    """A legacy meta.json, parsed whole, with the same value()/category_rows() API."""
+
+    def value(self, name: str, row: int) -> Any:
+        return self[row][name]
+
+    def array(self, name: str) -> Optional[np.ndarray]:
+        if not self or any(name not in item for item in self):
+            return None
+        return np.array([item[name] for item in self], dtype=np.int64)
+
+    def category_rows(self, name: str) -> Dict[str, np.ndarray]:
+        values = np.array([item[name] for item in self])
+        return {
+            label: np.flatnonzero(values == label).astype(np.int64)
+            for label in dict.fromkeys(values.tolist())
+        }
+
+
+class LayeredMetadata:
+    """
+    Base metadata plus rows appended since it was written (the index
+    update log), numbered after the base rows. Same read API.
+    """
+
+    def __init__(self, base: Union[MetadataStore, _JsonMetadata], rows: List[Dict[str, Any]]):
+        self.base = base
+        self.rows = rows
+        self.n_base = len(base)
+
+    def __len__(self) -> int:
+        return self.n_base + len(self.rows)
+
+    def value(self, name: str, row: int) -> Any:
+        if row < self.n_base:
+            return self.base.value(name, row)
+        return self.rows[row - self.n_base][name]
+
+    def __getitem__(self, row: int) -> Dict[str, Any]:
+        if not -len(self) <= row < len(self):
+            raise IndexError(row)
+        row %= len(self)
+        if row < self.n_base:
+            return self.base[row]
+        return dict(self.rows[row - self.n_base])
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+    def array(self, name: str) -> Optional[np.ndarray]:
+        base = self.base.array(name)
+        if base is None:
+            return None
+        return np.concatenate([base, np.array([r[name] for r in self.rows], dtype=np.int64)])
+
+    def category_rows(self, name: str) -> Dict[str, np.ndarray]:
+        rows = self.base.category_rows(name)
+        appended: Dict[str, List[int]] = {}
+        for i, item in enumerate(self.rows):
+            appended.setdefault(item[name], []).append(self.n_base + i)
+        for label, extra in appended.items():
+            rows[label] = np.concatenate([rows.get(label, np.empty(0, dtype=np.int64)), extra]).astype(np.int64)
+        return rows
+
+
+Metadata = Union[MetadataStore, _JsonMetadata, LayeredMetadata]
+
+
+def open_metadata(path: str) -> Metadata:
+    with open(path, "rb") as f:
+        magic = f.read(len(MAGIC))
+    if magic == MAGIC:
+        return MetadataStore(path)
+
+    with open(path) as f:
+        return _JsonMetadata(json.load(f))
@@ -1,26 +1,453 @@
 import faiss
-import json
-from utils.embeddings import embed_text
-
-INDEX_PATH = "rag/index/faiss.index"
-META_PATH = "rag/index/meta.json"
-
-index = faiss.read_index(INDEX_PATH)
-metadata = json.load(open(META_PATH))
-
-
-def rag_lookup(query: str, k: int = 3):
-    vec = embed_text([query])
-    scores, idxs = index.search(vec, k)
-
-    results = []
-    for score, idx in zip(scores[0], idxs[0]):
-        item = metadata[idx]
-        results.append({
-            "system": item["system"],
-            "code": item["code"],
-            "display": item["display"],
-            "score": float(score)
-        })
-    
-    return results
+import numpy as np
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+from rag.delta_log import delta_paths, read_delta
+from rag.index_files import commit_pending, finish_pending_commit, index_lock
+from rag.index_types import (
+    apply_search_params,
+    info_path_for,
+    read_index,
+    read_index_info,
+    search_parameters,
+    system_selector,
+)
+from config import (
+    RAG_COALESCE_MAX_BATCH,
+    RAG_COALESCE_WINDOW_MS,
+    RAG_HYBRID_SEARCH,
+    RAG_LEXICAL_DECISIVE_RATIO,
+)
+from rag.coalescer import BatchCoalescer
+from rag.lexical_index import LexicalIndex, is_decisive, reciprocal_rank_fusion
+from rag.metadata_store import LayeredMetadata, Metadata, open_metadata
+from services.knowledge_service import SYSTEM_URLS
+from utils.embeddings import configured_backend, embed_text
+
+# Candidates taken from each retriever before fusion, per result wanted
+CANDIDATES_PER_RESULT = 4
+
+# Relative to this file, not the working directory
+INDEX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "index")
+INDEX_PATH = os.path.join(INDEX_DIR, "faiss.index")
+META_PATH = os.path.join(INDEX_DIR, "meta.bin")
+
+
+class RagIndex:
+    """
+    A FAISS index and its row metadata, loaded together and swapped
+    together so a search never pairs one build's vectors with another's
+    metadata.
+
+    Construction only stats the files. The index is memory-mapped and
+    the metadata opened on first search (or load()), so processes that
+    never reach RAG, such as tests that mock it, never pay for it, and
+    workers share one page-cache copy of the vectors.
+
+    Indexes keyed by concept id (build_index since ids were introduced)
+    also replay the update log (rag/delta_log.py): updated and added
+    concepts are searched in a small in-memory index next to the base
+    one, and their superseded or retired base versions are filtered out.
+    Metadata rows for the log follow the base rows.
+    """
+
+    def __init__(self, index_path: str = INDEX_PATH, meta_path: str = META_PATH):
+        self.index_path = index_path
+        self.meta_path = meta_path
+        self._read_info()
+        # Queries must be embedded into the space the index was built in
+        self.embedder = configured_backend(os.path.dirname(index_path))
+
+        self._index: Optional[faiss.Index] = None
+        self._metadata: Optional[Metadata] = None
+        self._system_rows: Dict[str, np.ndarray] = {}
+        self._lexical: Optional[LexicalIndex] = None
+        self._load_lock = threading.Lock()
+
+        # Concept id -> row lookups, the update log's index, and the ids
+        # whose base rows it supersedes (with the matching row mask)
+        self._sorted_ids = np.empty(0, dtype=np.int64)
+        self._id_rows = np.empty(0, dtype=np.int64)
+        self._delta_index: Optional[faiss.Index] = None
+        self._delta_rows: Dict[int, int] = {}
+        self._tombstones = np.empty(0, dtype=np.int64)
+        self._live: Optional[np.ndarray] = None
+
+        # Per system set: (search params, objects they reference) and lexical masks
+        self._search_params: Dict[Any, Any] = {}
+        self._search_params_lock = threading.Lock()
+
+    def _read_info(self) -> None:
+        index_dir = os.path.dirname(self.index_path)
+        # Index type and search-time parameters recorded by build_index
+        self.info = read_index_info(self.index_path) or {"type": "flat", "params": {}}
+        self.version = self._fingerprint(
+            self.index_path, self.meta_path, info_path_for(self.index_path), delta_paths(index_dir)[0]
+        )
+        # Labels are concept ids (else row numbers, for older builds)
+        self.has_ids = self.info.get("ids") == "concept"
+
+    def load(self) -> "RagIndex":
+        """
+        Open the index and metadata now rather than on first search.
+        With RAG_HYBRID_SEARCH the BM25 index is built here too, so a
+        reloaded index is ready before it is swapped in.
+        """
+        if self._index is None:
+            with self._load_lock:
+                if self._index is None:
+                    self._open()
+                    if RAG_HYBRID_SEARCH:
+                        self._lexical = self._build_lexical(self._metadata)
+        return self
+
+    def _open(self) -> None:
+        index_dir = os.path.dirname(self.index_path)
+        if commit_pending(index_dir):
+            # A writer died mid-commit; finish it before reading
+            with index_lock(index_dir):
+                finish_pending_commit(index_dir)
+
+        # No commit or update can land while the files are opened
+        with index_lock(index_dir, shared=True):
+            # They may have been replaced since construction (a replaced
+            # local IDF is caught by the embedding check below)
+            self._read_info()
+            built_with = self.info.get("embedding_model")
+            if built_with and built_with != self.embedder.name:
+                raise RuntimeError(
+                    f"{self.index_path} was built with {built_with!r} embeddings but "
+                    f"EMBEDDING_BACKEND gives {self.embedder.name!r}; rebuild it with rag/build_index.py"
+                )
+
+            index = read_index(self.index_path)
+            apply_search_params(index, self.info["params"])
+
+            metadata = open_metadata(self.meta_path)
+            if self.has_ids:
+                metadata = self._replay_updates(index, metadata)
+            self._metadata = metadata
+
+            # Row ids per terminology, for filtered search
+            self._system_rows = {
+                system: rows if self._live is None else rows[self._live[rows]]
+                for system, rows in metadata.category_rows("system").items()
+            }
+            self._index = index
+
+    def _replay_updates(self, index: faiss.Index, base: Metadata) -> LayeredMetadata:
+        ids = base.array("id")
+        self._id_rows = np.argsort(ids, kind="stable")
+        self._sorted_ids = ids[self._id_rows]
+
+        delta = read_delta(os.path.dirname(self.index_path), index.d)
+        metadata = LayeredMetadata(base, delta.rows)
+        self._tombstones = delta.touched
+
+        if len(delta.touched):
+            self._live = np.ones(len(metadata), dtype=bool)
+            self._live[:len(base)] = ~np.isin(ids, delta.touched)
+
+        if delta.rows:
+            delta_ids = np.array([row["id"] for row in delta.rows], dtype=np.int64)
+            self._delta_index = faiss.IndexIDMap2(faiss.IndexFlatL2(index.d))
+            self._delta_index.add_with_ids(delta.vectors, delta_ids)
+            self._delta_rows = {int(i): len(base) + n for n, i in enumerate(delta_ids)}
+
+        return metadata
+
+    @property
+    def index(self) -> faiss.Index:
+        return self.load()._index
+
+    @property
+    def metadata(self) -> Metadata:
+        return self.load()._metadata
+
+    @property
+    def system_rows(self) -> Dict[str, np.ndarray]:
+        return self.load()._system_rows
+
+    def lexical(self) -> LexicalIndex:
+        """BM25 index over the passage texts (built by load(), else on first use)."""
+        if self._lexical is None:
+            metadata = self.metadata
+            with self._load_lock:
+                if self._lexical is None:
+                    self._lexical = self._build_lexical(metadata)
+        return self._lexical
+
+    @staticmethod
+    def _build_lexical(metadata: Metadata) -> LexicalIndex:
+        return LexicalIndex(metadata.value("text", row) for row in range(len(metadata)))
+
+    def _wanted(self, systems: Optional[Iterable[str]]) -> Optional[FrozenSet[str]]:
+        """The requested systems present in the index, or None for "everything"."""
+        wanted = frozenset(systems or ()) & frozenset(self.system_rows)
+        if not systems or wanted == frozenset(self.system_rows):
+            return None
+        return wanted
+
+    def _rows(self, wanted: FrozenSet[str]) -> np.ndarray:
+        return np.sort(np.concatenate(
+            [self.system_rows[s] for s in wanted] or [np.empty(0, dtype=np.int64)]
+        ))
+
+    def row_mask(self, systems: Optional[Iterable[str]]) -> Optional[np.ndarray]:
+        """Boolean mask over live rows for the lexical retriever; None for no filter."""
+        wanted = self._wanted(systems)
+        if wanted is None and self._live is None:
+            return None
+
+        key = ("mask", wanted)
+        mask = self._search_params.get(key)
+        if mask is None:
+            if wanted is None:
+                mask = self._live
+            else:
+                mask = np.zeros(len(self.metadata), dtype=bool)
+                mask[self._rows(wanted)] = True
+            with self._search_params_lock:
+                self._search_params[key] = mask
+        return mask
+
+    def search_params(self, systems: Optional[Iterable[str]]) -> Optional[faiss.SearchParameters]:
+        """
+        Search parameters for the base index that only visit the given
+        systems and skip concepts superseded by the update log, or None to
+        search everything. Concept ids carry their system in the high
+        bits, so a system is one cheap range check per candidate. Row-
+        numbered indexes use a row range, as build_index writes each
+        system contiguously, or else a row set.
+
+        The selector is cached, but every call gets its own parameters
+        object: IndexIDMap2.search swaps params.sel while it runs, so a
+        shared object races between threads.
+        """
+        wanted = self._wanted(systems)
+        if wanted is None and not len(self._tombstones):
+            return None
+
+        selector = self._selector(wanted, self._base_selector)
+        return search_parameters(self.info["type"], self.info["params"], selector)
+
+    def _selector(self, key, build) -> faiss.IDSelector:
+        """The immutable selector for key, built once by build()."""
+        cached = self._search_params.get(key)
+        if cached is None:
+            # SWIG selectors don't own their children; keep them alive
+            cached = build(key)
+            with self._search_params_lock:
+                cached = self._search_params.setdefault(key, cached)
+        return cached[0]
+
+    def _base_selector(self, wanted: Optional[FrozenSet[str]]) -> Tuple[faiss.IDSelector, list]:
+        if self.has_ids:
+            return self._id_selector(wanted)
+
+        rows = self._rows(wanted)
+        if len(rows) and rows[-1] - rows[0] + 1 == len(rows):
+            selector = faiss.IDSelectorRange(int(rows[0]), int(rows[-1]) + 1)
+        else:
+            selector = faiss.IDSelectorBatch(rows)
+        return selector, [rows]
+
+    def _id_selector(self, wanted: Optional[FrozenSet[str]]) -> Tuple[faiss.IDSelector, list]:
+        selector, keep = system_selector(wanted) if wanted else (None, [])
+        if len(self._tombstones):
+            batch = faiss.IDSelectorBatch(self._tombstones)
+            live = faiss.IDSelectorNot(batch)
+            keep += [batch, live]
+            if selector is not None:
+                keep.append(selector)
+                live = faiss.IDSelectorAnd(selector, live)
+            selector = live
+        return selector, keep
+
+    def _delta_params(self, systems: Optional[Iterable[str]]) -> Optional[faiss.SearchParameters]:
+        wanted = self._wanted(systems)
+        if wanted is None:
+            return None
+
+        selector = self._selector(("delta", wanted), lambda key: system_selector(key[1]))
+        return faiss.SearchParameters(sel=selector)
+
+    def _base_rows(self, labels: np.ndarray) -> np.ndarray:
+        """Concept ids from the base index -> first row with that id; -1 stays -1."""
+        if not len(self._sorted_ids):
+            return np.full(labels.shape, -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self._sorted_ids, labels), len(self._sorted_ids) - 1)
+        found = (labels >= 0) & (self._sorted_ids[pos] == labels)
+        return np.where(found, self._id_rows[pos], -1)
+
+    def search_vectors(self, vecs: np.ndarray, depth: int, systems: Optional[Iterable[str]]) -> List[List[int]]:
+        """Rows of the depth nearest live passages per query vector, best first."""
+        params = self.search_params(systems)
+        if params is None:
+            distances, labels = self.index.search(vecs, depth)
+        else:
+            distances, labels = self.index.search(vecs, depth, params=params)
+
+        if not self.has_ids:
+            # -1 pads when fewer than depth vectors are searchable
+            return [[int(row) for row in row_labels if row >= 0] for row_labels in labels]
+
+        rows = self._base_rows(labels)
+        if self._delta_index is not None:
+            delta_params = self._delta_params(systems)
+            if delta_params is None:
+                delta_distances, delta_labels = self._delta_index.search(vecs, depth)
+            else:
+                delta_distances, delta_labels = self._delta_index.search(vecs, depth, params=delta_params)
+
+            delta_rows = np.vectorize(lambda i: self._delta_rows.get(int(i), -1), otypes=[np.int64])(delta_labels)
+            distances = np.hstack([distances, delta_distances])
+            rows = np.hstack([rows, delta_rows])
+            order = np.argsort(distances, axis=1, kind="stable")[:, :depth]
+            rows = np.take_along_axis(rows, order, axis=1)
+
+        # A concept with several passages maps them all to its first row
+        return [list(dict.fromkeys(int(row) for row in row_list if row >= 0)) for row_list in rows]
+
+    @staticmethod
+    def _fingerprint(*paths: str) -> str:
+        parts = []
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            stat = os.stat(path)
+            parts.append(f"{stat.st_size}:{stat.st_mtime_ns}")
+        return "-".join(parts)
+
+
+# ---------------------------------------------------------
+# Current index (swapped atomically on reload)
+# ---------------------------------------------------------
+
+_CURRENT = RagIndex()
+_SWAP_LOCK = threading.Lock()
+_PINNED: ContextVar[Optional[RagIndex]] = ContextVar("pinned_rag_index", default=None)
+
+
+def current_index() -> RagIndex:
+    """The index pinned for this request, else the live one."""
+    return _PINNED.get() or _CURRENT
+
+
+def swap_index(rag_index: RagIndex) -> RagIndex:
+    """Make rag_index live for new requests; returns the previous one."""
+    global _CURRENT
+    with _SWAP_LOCK:
+        previous, _CURRENT = _CURRENT, rag_index
+    return previous
+
+
+@contextmanager
+def pinned_index(rag_index: Optional[RagIndex] = None):
+    """Search one index for the duration of the block, even across a swap."""
+    token = _PINNED.set(rag_index or current_index())
+    try:
+        yield _PINNED.get()
+    finally:
+        _PINNED.reset(token)
+
+
+def index_version() -> str:
+    """Changes whenever a different index/metadata pair is loaded."""
+    return current_index().version
+
+
+def _as_result(rag_index: RagIndex, row: int, rrf_score: float) -> dict:
+    item = rag_index.metadata[row]
+    return {
+        # Metadata stores short names ("snomed"); codings carry URLs
+        "system": SYSTEM_URLS.get(item["system"], item["system"]),
+        "code": item["code"],
+        "display": item["display"],
+        # Rank-based, higher is better; not a vector distance
+        "rrf_score": rrf_score,
+    }
+
+
+def _vector_rankings(
+    rag_index: RagIndex,
+    depth: int,
+    systems: Optional[Tuple[str, ...]],
+    queries: List[str],
+) -> List[List[int]]:
+    """Rows nearest each query: one embedding request, one index.search."""
+    vecs = embed_text(queries, backend=rag_index.embedder)
+    return rag_index.search_vectors(vecs, depth, systems)
+
+
+# Concurrent requests' vector searches merge into one batch
+COALESCER = BatchCoalescer(_vector_rankings, RAG_COALESCE_WINDOW_MS, RAG_COALESCE_MAX_BATCH)
+
+
+def rag_lookup_batch(
+    queries: List[str],
+    k: int = 3,
+    systems: Optional[List[str]] = None,
+) -> List[List[dict]]:
+    """
+    Look up many queries with at most one embedding request and one
+    index.search over the query matrix. Results are returned in query
+    order, best first. Each carries "rrf_score", the reciprocal-rank-
+    fusion score of its ranks (higher is better, at most 2 / 61); it is
+    not an embedding distance.
+
+    With RAG_HYBRID_SEARCH, each query first goes to the BM25 index.
+    Queries whose lexical top hit is decisive (e.g. "HTN") are answered
+    from the BM25 ranking alone and never embedded; the rest fuse both
+    rankings. A decisive answer holds only passages that share a token
+    with the query, so it can have fewer than k results: "HTN" appears
+    in one passage and returns one result at k=3.
+
+    The vector step goes through COALESCER, so concurrent callers
+    searching the same index with the same k and systems share one
+    embedding request and one index.search.
+
+    systems (short names, e.g. ["snomed", "icd10"]) restricts the
+    search to those terminologies, so all k slots go to usable hits.
+    """
+    if not queries:
+        return []
+
+    rag_index = current_index()
+    depth = k * CANDIDATES_PER_RESULT if RAG_HYBRID_SEARCH else k
+
+    rankings: List[List[List[int]]] = [[] for _ in queries]
+    pending = list(range(len(queries)))
+
+    if RAG_HYBRID_SEARCH:
+        lexical = rag_index.lexical()
+        mask = rag_index.row_mask(systems)
+        pending = []
+        for i, query in enumerate(queries):
+            hits, n_tokens = lexical.search(query, depth, mask)
+            rankings[i].append([row for row, _score, _matched in hits])
+            if not is_decisive(hits, n_tokens, RAG_LEXICAL_DECISIVE_RATIO):
+                pending.append(i)
+
+    if pending:
+        key = (rag_index, depth, tuple(sorted(systems)) if systems else None)
+        pending_queries = [queries[i] for i in pending]
+        if COALESCER.window > 0:
+            vector_rows = COALESCER.submit(key, pending_queries)
+        else:
+            vector_rows = _vector_rankings(*key, pending_queries)
+
+        for i, rows in zip(pending, vector_rows):
+            rankings[i].append(rows)
+
+    return [
+        [_as_result(rag_index, row, score) for row, score in reciprocal_rank_fusion(ranking, k)]
+        for ranking in rankings
+    ]
+
+
+def rag_lookup(query: str, k: int = 3, systems: Optional[List[str]] = None):
+    return rag_lookup_batch([query], k, systems)[0]
@@ -0,0 +1,183 @@
+import secrets
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+
+from config import ADMIN_API_KEY
+from models.admin_models import (
+    ReloadStatus,
+    CacheInvalidation,
+    CacheStats,
+    CoalescerStats,
+    CompactionResult,
+    ConceptKey,
+    ConceptUpdateResult,
+    ConceptUpsert,
+    JsonParseStats,
+    RateLimiterStats,
+)
+from rag.index_updates import compact, retire_concepts, upsert_concepts
+from rag.rag_search import COALESCER
+from services.reload_service import start_reload, reload_status
+from services.terminology_service import RESOLUTION_CACHE
+from utils.embedding_backends import EMBEDDING_LIMITER
+from utils.embeddings import EMBEDDING_CACHE
+from utils.llm_client import JSON_STATS, LLM_CACHE, LLM_LIMITER
+
+
+
+def require_admin_key(x_admin_key: Optional[str] = Header(None)) -> None:
+    """Every admin route needs X-Admin-Key to match ADMIN_API_KEY."""
+    if not ADMIN_API_KEY:
+        raise HTTPException(status_code=503, detail="Admin API is disabled; set ADMIN_API_KEY to enable it.")
+    if not x_admin_key or not secrets.compare_digest(x_admin_key, ADMIN_API_KEY):
+        raise HTTPException(status_code=401, detail="Invalid or missing X-Admin-Key header.")
+
+
+router = APIRouter(prefix="/admin", tags=["Admin"], dependencies=[Depends(require_admin_key)])
+
+
+@router.post(
+    "/reload",
+    response_model=ReloadStatus,
+    status_code=202,
+    summary="Reload vocabularies and RAG index"
+)
+def reload_route():
+    """
+    Re-read the configured vocabulary and FAISS index files in the
+    background, then swap them in atomically. Requests in flight finish
+    on the old snapshot.
+    """
+    return start_reload()
+
+
+@router.get(
+    "/reload",
+    response_model=ReloadStatus,
+    summary="Status of the last reload"
+)
+def reload_status_route():
+    return reload_status()
+
+
+@router.get(
+    "/cache",
+    response_model=CacheStats,
+    summary="Terminology resolution cache statistics"
+)
+def cache_stats_route():
+    return RESOLUTION_CACHE.stats()
+
+
+@router.get(
+    "/cache/embeddings",
+    response_model=CacheStats,
+    summary="Embedding cache statistics"
+)
+def embedding_cache_stats_route():
+    return EMBEDDING_CACHE.stats()
+
+
+@router.get(
+    "/cache/llm",
+    response_model=CacheStats,
+    summary="LLM completion cache statistics"
+)
+def llm_cache_stats_route():
+    return LLM_CACHE.stats()
+
+
+@router.delete(
+    "/cache/llm",
+    response_model=CacheInvalidation,
+    summary="Invalidate cached LLM completions"
+)
+def llm_cache_invalidate_route(model: Optional[str] = None):
+    """
+    Drop cached completions, or only those of one model. Use after a
+    prompt change that should not wait for the TTL.
+    """
+    return {"removed": LLM_CACHE.invalidate(model)}
+
+
+@router.get(
+    "/llm/json",
+    response_model=JsonParseStats,
+    summary="LLM JSON parse and repair statistics"
+)
+def json_parse_stats_route():
+    """
+    How many LLM replies parsed as returned, needed local repair or
+    failed, and how often extraction fell back to an LLM repair call.
+    """
+    return JSON_STATS.stats()
+
+
+@router.get(
+    "/rate-limits",
+    response_model=List[RateLimiterStats],
+    summary="Provider rate limiter queues and wait times"
+)
+def rate_limits_route():
+    """
+    Per limiter (chat, embeddings): configured limits, calls in flight,
+    and per priority class the queue depth, admissions and wait times.
+    """
+    return [LLM_LIMITER.stats(), EMBEDDING_LIMITER.stats()]
+
+
+@router.post(
+    "/rag/concepts",
+    response_model=ConceptUpdateResult,
+    summary="Add or replace concepts in the RAG index"
+)
+def upsert_concepts_route(concepts: List[ConceptUpsert]):
+    """
+    Embed just these passages, append them to the index update log and
+    reload. Existing (system, code) concepts are replaced.
+    """
+    try:
+        updated = upsert_concepts([c.model_dump() for c in concepts])
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"updated": updated, "reload": start_reload()}
+
+
+@router.post(
+    "/rag/concepts/retire",
+    response_model=ConceptUpdateResult,
+    summary="Retire concepts from the RAG index"
+)
+def retire_concepts_route(concepts: List[ConceptKey]):
+    try:
+        updated = retire_concepts([c.model_dump() for c in concepts])
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"updated": updated, "reload": start_reload()}
+
+
+@router.post(
+    "/rag/compact",
+    response_model=CompactionResult,
+    summary="Fold the RAG update log into the index files"
+)
+def compact_route():
+    try:
+        stats = compact()
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {**stats, "reload": start_reload()}
+
+
+@router.get(
+    "/rag/coalescer",
+    response_model=CoalescerStats,
+    summary="RAG query micro-batching statistics"
+)
+def coalescer_stats_route():
+    return COALESCER.stats()
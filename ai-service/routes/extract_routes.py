@@ -1,8 +1,11 @@
 # ai-service/routes/extract_routes.py
 
-from fastapi import APIRouter
+from typing import Optional
+
+from fastapi import APIRouter, Header
 from models.extract_models import ExtractRequest, ExtractResponse
-from services.extractor_service import extract_entities
+from services.extractor_service import extract_entities_async
+from utils.llm_cache import honor_cache_control
 
 router = APIRouter(tags=["Extraction"])
 
@@ -11,10 +14,11 @@ router = APIRouter(tags=["Extraction"])
     response_model=ExtractResponse,
     summary="Extract structured entities from clinical text"
 )
-def extract_route(request: ExtractRequest):
+async def extract_route(request: ExtractRequest, cache_control: Optional[str] = Header(None)):
     """
     Extract patient info, problems, medications, vitals, labs,
     imaging, social/family history, assessment, and plan
     from raw clinical text.
     """
-    return extract_entities(request.text)
+    with honor_cache_control(cache_control):
+        return await extract_entities_async(request.text)
@@ -1,7 +1,10 @@
-from fastapi import APIRouter
+from typing import Optional
+
+from fastapi import APIRouter, Header
 
 from models.pipeline_models import PipelineRequest, PipelineResponse
-from services.pipeline_service import run_pipeline
+from services.pipeline_service import run_pipeline_async
+from utils.llm_cache import honor_cache_control
 
 router = APIRouter(tags=["Pipeline"])
 
@@ -10,11 +13,12 @@ router = APIRouter(tags=["Pipeline"])
     response_model=PipelineResponse,
     summary="Run full clinical pipeline"
 )
-def pipeline_route(request: PipelineRequest):
+async def pipeline_route(request: PipelineRequest, cache_control: Optional[str] = Header(None)):
     """
     Run the full clinical pipeline:
     - Generate a summary
     - Extract structured entities
     - Convert entities into a FHIR Bundle
     """
-    return run_pipeline(request)
\ No newline at end of file
+    with honor_cache_control(cache_control):
+        return await run_pipeline_async(request)
\ No newline at end of file
@@ -1,6 +1,9 @@
-from fastapi import APIRouter
+from typing import Optional
+
+from fastapi import APIRouter, Header
 from models.note_models import NoteRequest, NoteResponse
-from services.summarizer_service import summarize
+from services.summarizer_service import summarize_async
+from utils.llm_cache import honor_cache_control
 
 
 router = APIRouter(tags=["Summarization"])
@@ -10,8 +13,9 @@ router = APIRouter(tags=["Summarization"])
     response_model=NoteResponse,
     summary="Summarize clinical text"
 )
-def analyze_text(request: NoteRequest):
+async def analyze_text(request: NoteRequest, cache_control: Optional[str] = Header(None)):
     """
     Generate a clinical summary from unstructured clinical text.
     """
-    return summarize(request.text)   
\ No newline at end of file
+    with honor_cache_control(cache_control):
+        return await summarize_async(request.text)   
\ No newline at end of file
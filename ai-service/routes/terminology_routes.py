@@ -0,0 +1,25 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Query
+
+from models.terminology_models import SuggestResponse
+from services.knowledge_service import suggest_terms
+
+router = APIRouter(prefix="/terminology", tags=["Terminology"])
+
+
+@router.get(
+    "/suggest",
+    response_model=SuggestResponse,
+    summary="Autocomplete concepts by prefix"
+)
+def suggest_route(
+    q: str = Query(..., min_length=1, description="What the user has typed so far"),
+    k: int = Query(10, ge=1, le=50, description="Maximum suggestions"),
+    systems: Optional[List[str]] = Query(None, description="snomed, icd10, rxnorm, loinc (default: all)"),
+):
+    """
+    Type-ahead coding: concepts whose term or a synonym has a word
+    starting with q. Whole-term matches first, then shorter terms.
+    """
+    return {"query": q, "suggestions": suggest_terms(q, k, systems)}
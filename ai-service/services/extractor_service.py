@@ -1,12 +1,24 @@
 # ai-service/services/extractor_service.py
 
 import json
-from typing import Dict, Any
+from contextlib import aclosing
+from typing import Any, Callable, Dict, Iterable
 
 from fastapi import HTTPException
-
-from utils.llm_client import call_llm, safe_json
-from config import OPENAI_MODEL_EXTRACT
+from openai import APIError, APITimeoutError, RateLimitError
+
+from models.extract_models import ExtractResponse
+from utils.llm_client import (
+    JSON_STATS,
+    call_llm,
+    call_llm_async,
+    parses_as_object,
+    safe_json,
+    stream_llm_async,
+)
+from utils.streaming_json import StreamingArrayParser
+from utils.structured_output import json_schema_format
+from config import LLM_STRUCTURED_OUTPUT, OPENAI_MODEL_EXTRACT
 
 EXTRACT_SYSTEM_PROMPT = """
 You are a clinical information extraction model.
@@ -120,12 +132,18 @@ Rules:
 - Do NOT return any explanation. Return ONLY JSON.
 """
 
+# Schema-constrained decoding: replies always parse, so the repair
+# call below only runs with LLM_STRUCTURED_OUTPUT off (or a provider
+# that ignores it) and output local repair could not fix.
+EXTRACT_RESPONSE_FORMAT = (
+    json_schema_format("clinical_extraction", ExtractResponse) if LLM_STRUCTURED_OUTPUT else None
+)
 
-def _call_extraction_llm(text: str) -> str:
-    """
-    Single extraction request.
-    Uses call_llm() which includes tenacity retries.
-    """
+# Arrays whose elements extract_entities_streaming reports early
+STREAMED_FIELDS = ("conditions", "medications", "labs")
+
+
+def _extraction_messages(text: str):
     user_prompt = f"""
 Clinical note:
 
@@ -133,13 +151,37 @@ Clinical note:
 
 Return ONLY JSON that matches the required schema.
 """
+    return [
+        {"role": "system", "content": EXTRACT_SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+def _repair_messages(bad_output: str):
+    repair_prompt = f"""
+The following content is invalid JSON:
+
+{bad_output}
+
+Fix it so it becomes valid JSON matching the required extraction schema.
+Return ONLY the corrected JSON.
+"""
+    return [
+        {"role": "system", "content": EXTRACT_SYSTEM_PROMPT},
+        {"role": "user", "content": repair_prompt},
+    ]
 
+
+def _call_extraction_llm(text: str) -> str:
+    """
+    Single extraction request.
+    Uses call_llm() which includes tenacity retries.
+    """
     raw = call_llm(
-        messages=[
-            {"role": "system", "content": EXTRACT_SYSTEM_PROMPT},
-            {"role": "user", "content": user_prompt},
-        ],
+        messages=_extraction_messages(text),
         model=OPENAI_MODEL_EXTRACT,
+        response_format=EXTRACT_RESPONSE_FORMAT,
+        accept=parses_as_object,
     )
 
     if raw is None:
@@ -153,25 +195,15 @@ Return ONLY JSON that matches the required schema.
 
 def _call_repair_llm(bad_output: str) -> str:
     """
-    Use LLM to fix invalid JSON.
+    Use LLM to fix invalid JSON that repair_json() could not.
     Also uses call_llm() for retry/backoff.
     """
-
-    repair_prompt = f"""
-The following content is invalid JSON:
-
-{bad_output}
-
-Fix it so it becomes valid JSON matching the required extraction schema.
-Return ONLY the corrected JSON.
-"""
-
+    JSON_STATS.record("llm_repairs", "extraction")
     raw = call_llm(
-        messages=[
-            {"role": "system", "content": EXTRACT_SYSTEM_PROMPT},
-            {"role": "user", "content": repair_prompt},
-        ],
+        messages=_repair_messages(bad_output),
         model=OPENAI_MODEL_EXTRACT,
+        response_format=EXTRACT_RESPONSE_FORMAT,
+        accept=parses_as_object,
     )
 
     if raw is None:
@@ -184,7 +216,8 @@ def extract_entities(text: str) -> Dict[str, Any]:
     """
     Robust extraction with:
     - Tenacity API retry layer (via call_llm)
-    - LLM JSON repair layer if initial attempt fails
+    - Schema-constrained output and local JSON repair (via safe_json)
+    - LLM JSON repair layer if both fail
     """
 
     last_raw = None
@@ -202,11 +235,82 @@ def extract_entities(text: str) -> Dict[str, Any]:
 
         last_raw = raw
 
-        loaded = safe_json(raw)
+        loaded = safe_json(raw, "extraction" if attempt == 0 else "extraction_repair")
         if isinstance(loaded, dict):
             parsed_data = loaded
             break
 
+    return _with_defaults(parsed_data, last_raw)
+
+
+async def extract_entities_async(text: str) -> Dict[str, Any]:
+    """
+    extract_entities() on the async LLM client: same two attempts
+    (extraction, then JSON repair) and the same defaults.
+    """
+    raw = await call_llm_async(
+        _extraction_messages(text), OPENAI_MODEL_EXTRACT,
+        response_format=EXTRACT_RESPONSE_FORMAT, accept=parses_as_object,
+    )
+    return await _parsed_or_repaired(raw)
+
+
+async def extract_entities_streaming(
+    text: str,
+    on_item: Callable[[str, Any], None],
+    fields: Iterable[str] = STREAMED_FIELDS,
+) -> Dict[str, Any]:
+    """
+    extract_entities_async() with the reply streamed. Each element of
+    the given top-level arrays is passed to on_item(field, element) as
+    soon as it is complete, while the model is still writing the rest.
+    The return value is the same as extract_entities_async's.
+
+    If the stream breaks partway, extraction starts over unstreamed;
+    elements already reported may then be reported again.
+    """
+    parser = StreamingArrayParser(fields)
+    parts = []
+    stream = stream_llm_async(
+        _extraction_messages(text), OPENAI_MODEL_EXTRACT,
+        response_format=EXTRACT_RESPONSE_FORMAT, accept=parses_as_object,
+    )
+    try:
+        # The stream holds an LLM_LIMITER slot: close it even if on_item raises
+        async with aclosing(stream):
+            async for chunk in stream:
+                parts.append(chunk)
+                for field, item in parser.feed(chunk):
+                    on_item(field, item)
+    except (RateLimitError, APITimeoutError, APIError):
+        return await extract_entities_async(text)
+
+    return await _parsed_or_repaired("".join(parts) or None)
+
+
+async def _parsed_or_repaired(raw) -> Dict[str, Any]:
+    if raw is None:
+        raise HTTPException(status_code=500, detail="Extraction LLM failed after retries.")
+
+    raw = raw.strip()
+    loaded = safe_json(raw, "extraction")
+
+    if not isinstance(loaded, dict):
+        JSON_STATS.record("llm_repairs", "extraction")
+        raw = await call_llm_async(
+            _repair_messages(raw), OPENAI_MODEL_EXTRACT,
+            response_format=EXTRACT_RESPONSE_FORMAT, accept=parses_as_object,
+        )
+        if raw is None:
+            raise HTTPException(status_code=500, detail="Repair LLM failed after retries.")
+
+        raw = raw.strip()
+        loaded = safe_json(raw, "extraction_repair")
+
+    return _with_defaults(loaded if isinstance(loaded, dict) else None, raw)
+
+
+def _with_defaults(parsed_data, last_raw) -> Dict[str, Any]:
     if parsed_data is None:
         raise HTTPException(
             status_code=500,
@@ -3,10 +3,11 @@ import logging
 from typing import Dict, Any, List
 
 from models.extract_models import ExtractResponse
+from services.reload_service import pinned_snapshots
 from services.terminology_service import (
-    resolve_condition,
-    resolve_medication,
-    resolve_lab,
+    resolve_conditions,
+    resolve_medications,
+    resolve_labs,
 )
 
 logger = logging.getLogger(__name__)
@@ -28,6 +29,15 @@ def make_id() -> str:
 
 
 def generate_fhir_resource(entities: ExtractResponse) -> Dict[str, Any]:
+    """
+    Build a FHIR Bundle; every code in it comes from one vocabulary/index
+    snapshot, even if a reload swaps them mid-request.
+    """
+    with pinned_snapshots():
+        return _build_bundle(entities)
+
+
+def _build_bundle(entities: ExtractResponse) -> Dict[str, Any]:
     """
     Build a FHIR Bundle from extracted clinical entities.
 
@@ -36,6 +46,9 @@ def generate_fhir_resource(entities: ExtractResponse) -> Dict[str, Any]:
     - Medications → RxNorm (deterministic)
     - Labs → LOINC (deterministic)
 
+    Each category is resolved in one batch call, so a note with many
+    unresolved conditions still pays a single RAG round trip.
+
     Upstream models remain text-only.
     """
 
@@ -77,9 +90,9 @@ def generate_fhir_resource(entities: ExtractResponse) -> Dict[str, Any]:
     # ---------------------------------------------------------
     # Conditions
     # ---------------------------------------------------------
-    for condition_text in entities.conditions:
-        concept = resolve_condition(condition_text)
+    concepts = resolve_conditions(entities.conditions)
 
+    for concept in concepts:
         condition_resource = {
             "resourceType": "Condition",
             "id": make_id(),
@@ -154,9 +167,9 @@ def generate_fhir_resource(entities: ExtractResponse) -> Dict[str, Any]:
     # ---------------------------------------------------------
     # Labs → Observations (LOINC)
     # ---------------------------------------------------------
-    for lab in entities.labs:
-        lab_code = resolve_lab(lab.test)
+    lab_codes = resolve_labs([lab.test for lab in entities.labs])
 
+    for lab, lab_code in zip(entities.labs, lab_codes):
         lab_obs: Dict[str, Any] = {
             "resourceType": "Observation",
             "id": make_id(),
@@ -187,9 +200,9 @@ def generate_fhir_resource(entities: ExtractResponse) -> Dict[str, Any]:
     # ---------------------------------------------------------
     # Medications → MedicationStatement (RxNorm)
     # ---------------------------------------------------------
-    for med in entities.medications:
-        med_code = resolve_medication(med.name)
+    med_codes = resolve_medications([med.name for med in entities.medications])
 
+    for med, med_code in zip(entities.medications, med_codes):
         med_res: Dict[str, Any] = {
             "resourceType": "MedicationStatement",
             "id": make_id(),
@@ -0,0 +1,179 @@
+# ai-service/services/fuzzy_matcher.py
+
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DIGITS_PATTERN = re.compile(r"\d+")
+
+# Words shorter than this absorb at most one edit: two edits already
+# turn "hypothyroidism" into "hyperthyroidism"
+LONG_WORD = 16
+
+# Prefixes that flip a clinical term's meaning. A key whose word starts
+# with one of a pair never matches a query word starting with the other,
+# however few edits apart they are.
+CONTRASTIVE_PREFIXES = [
+    ("hyper", "hypo"),
+    ("brady", "tachy"),
+    ("micro", "macro"),
+    ("intra", "extra"),
+    ("inter", "intra"),
+    ("pre", "post"),
+    ("ante", "post"),
+]
+
+
+# ---------------------------------------------------------
+# Bounded edit distance
+# ---------------------------------------------------------
+
+def bounded_edit_distance(a: str, b: str, max_edits: int) -> Optional[int]:
+    """
+    Optimal string alignment distance (Levenshtein + adjacent
+    transpositions), or None as soon as it must exceed max_edits.
+    """
+    if abs(len(a) - len(b)) > max_edits:
+        return None
+
+    prev_prev: List[int] = []
+    prev = list(range(len(b) + 1))
+
+    for i in range(1, len(a) + 1):
+        row = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            row[j] = min(prev[j] + 1, row[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                row[j] = min(row[j], prev_prev[j - 2] + 1)
+
+        if min(row) > max_edits:
+            return None
+        prev_prev, prev = prev, row
+
+    return prev[-1] if prev[-1] <= max_edits else None
+
+
+def contrastive(a: str, b: str) -> bool:
+    """Whether words a and b start with opposite prefixes (hyper-/hypo-)."""
+    return any(
+        (a.startswith(x) and b.startswith(y)) or (a.startswith(y) and b.startswith(x))
+        for x, y in CONTRASTIVE_PREFIXES
+    )
+
+
+def trigrams(text: str) -> List[str]:
+    padded = f" {text} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+# ---------------------------------------------------------
+# Trigram inverted index
+# ---------------------------------------------------------
+
+class TrigramMatcher:
+    """
+    Typo-tolerant matcher over already-normalized vocabulary keys.
+
+    A string within d edits of the query shares at least
+    len(trigrams(query)) - 4d trigrams with it (a transposition changes
+    up to four), so the inverted index
+    narrows the vocabulary to a handful of candidates and only those
+    are checked with the bounded edit distance.
+    """
+
+    def __init__(
+        self,
+        keys: Iterable[str],
+        max_edits: int = 2,
+        min_similarity: float = 0.85,
+    ):
+        self.max_edits = max_edits
+        self.min_similarity = min_similarity
+        self.keys: List[str] = []
+        self.postings: Dict[str, List[int]] = {}
+
+        for key in keys:
+            key_id = len(self.keys)
+            self.keys.append(key)
+            for gram in set(trigrams(key)):
+                self.postings.setdefault(gram, []).append(key_id)
+
+    def _edit_budget(self, length: int) -> int:
+        # Short strings can't absorb typos without becoming other words
+        if length <= 4:
+            return 0
+        if length <= 10:
+            return min(1, self.max_edits)
+        return self.max_edits
+
+    def match(self, query: str) -> Optional[Tuple[str, int, float]]:
+        """
+        Return (key, edits, similarity) for the closest key, or None.
+
+        Only misspellings match. Candidates must keep the same numbers as
+        the query: "type 1" vs "type 2" or "stage 3" vs "stage 4" are one
+        edit apart but are different diseases. Each word shorter than
+        LONG_WORD takes at most one of the edits, and no word may swap a
+        contrastive prefix (see _words_match).
+        """
+        budget = self._edit_budget(len(query))
+        if not query or budget == 0:
+            return None
+
+        query_grams = set(trigrams(query))
+        min_shared = max(1, len(query_grams) - 4 * budget)
+
+        # Prefix filter: a key sharing >= min_shared grams must appear in
+        # at least one of the (n - min_shared + 1) rarest query grams, so
+        # the long posting lists of common grams are never walked.
+        by_rarity = sorted(query_grams, key=lambda g: len(self.postings.get(g, ())))
+        candidates = set()
+        for gram in by_rarity[:len(query_grams) - min_shared + 1]:
+            candidates.update(self.postings.get(gram, ()))
+
+        query_digits = DIGITS_PATTERN.findall(query)
+        best: Optional[Tuple[int, float, int]] = None
+
+        for key_id in candidates:
+            key = self.keys[key_id]
+            if abs(len(key) - len(query)) > budget:
+                continue
+            if len(query_grams.intersection(trigrams(key))) < min_shared:
+                continue
+            if DIGITS_PATTERN.findall(key) != query_digits:
+                continue
+
+            edits = bounded_edit_distance(query, key, budget)
+            if edits is None or not self._words_match(query, key, edits):
+                continue
+
+            similarity = 1 - edits / max(len(query), len(key))
+            if similarity < self.min_similarity:
+                continue
+
+            # Fewest edits, then highest similarity, then earliest key
+            rank = (edits, -similarity, key_id)
+            if best is None or rank < best:
+                best = rank
+
+        if best is None:
+            return None
+
+        edits, neg_similarity, key_id = best
+        return self.keys[key_id], edits, -neg_similarity
+
+    def _words_match(self, query: str, key: str, edits: int) -> bool:
+        query_words, key_words = query.split(), key.split()
+        if len(query_words) != len(key_words):
+            # A split or merged word: the space is the only edit allowed
+            return edits <= 1
+
+        for query_word, key_word in zip(query_words, key_words):
+            if query_word == key_word:
+                continue
+            if contrastive(query_word, key_word):
+                return False
+            word_budget = self.max_edits if max(len(query_word), len(key_word)) >= LONG_WORD else 1
+            if bounded_edit_distance(query_word, key_word, word_budget) is None:
+                return False
+        return True
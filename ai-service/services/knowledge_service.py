@@ -1,22 +1,51 @@
 import csv
+import hashlib
 import os
-from typing import Dict, Optional, List
-
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, Iterator, Optional, List, Tuple, Union
+
+from config import (
+    VOCAB_DB_PATH,
+    VOCAB_ARTIFACT_PATH,
+    FUZZY_MAX_EDITS,
+    FUZZY_MIN_SIMILARITY,
+)
+from services.fuzzy_matcher import TrigramMatcher
+from services.prefix_index import PrefixIndex, match_rank
 from services.terminology_normalization import (
     normalize_condition_term,
     normalize_medication_term,
     normalize_lab_term,
 )
+from services.vocabulary_artifact import VocabularyArtifact
+from services.vocabulary_store import VocabularyStore
 
 BASE_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
 
+SNOMED_SYSTEM = "http://snomed.info/sct"
+ICD10_SYSTEM = "http://hl7.org/fhir/sid/icd-10-cm"
+RXNORM_SYSTEM = "http://www.nlm.nih.gov/research/umls/rxnorm"
+LOINC_SYSTEM = "http://loinc.org"
+
+SYSTEM_URLS = {
+    "snomed": SNOMED_SYSTEM,
+    "icd10": ICD10_SYSTEM,
+    "rxnorm": RXNORM_SYSTEM,
+    "loinc": LOINC_SYSTEM,
+}
+URL_SYSTEMS = {url: system for system, url in SYSTEM_URLS.items()}
+
+Backend = Union[VocabularyArtifact, VocabularyStore]
+
 
 # ---------------------------------------------------------
 # Load CSV into memory (simple & fast for demo)
 # ---------------------------------------------------------
 
-def load_csv(filename: str) -> List[Dict[str, str]]:
-    path = os.path.join(BASE_DIR, filename)
+def load_csv(filename: str, data_dir: str = BASE_DIR) -> List[Dict[str, str]]:
+    path = os.path.join(data_dir, filename)
     if not os.path.exists(path):
         return []
 
@@ -26,13 +55,292 @@ def load_csv(filename: str) -> List[Dict[str, str]]:
 
 
 # ---------------------------------------------------------
-# Load datasets at startup
+# Build normalized-key indexes
 # ---------------------------------------------------------
 
-SNOMED_DATA = load_csv("snomed.csv")
-ICD10_DATA = load_csv("icd10.csv")
-RXNORM_DATA = load_csv("rxnorm.csv")
-LOINC_DATA = load_csv("loinc.csv")
+def build_lookup_index(
+    rows: List[Dict[str, str]],
+    key_fields: List[str],
+    normalizer: Callable[[Optional[str]], str],
+    make_coding: Callable[[Dict[str, str]], Dict[str, str]],
+    synonyms_sep: Optional[str] = None,
+) -> Dict[str, Dict[str, str]]:
+    """
+    Map every normalized surface form of a row to its coding.
+
+    Rows are visited in file order and the first row to claim a key keeps
+    it, so lookups return the same match a top-to-bottom scan would.
+    """
+    index: Dict[str, Dict[str, str]] = {}
+
+    for row in rows:
+        coding = make_coding(row)
+
+        surface_forms = [row.get(field) for field in key_fields]
+        synonyms = row.get("synonyms")
+        if synonyms_sep and synonyms:
+            surface_forms.extend(synonyms.split(synonyms_sep))
+
+        for form in surface_forms:
+            key = normalizer(form)
+            if key:
+                index.setdefault(key, coding)
+
+    return index
+
+
+def build_code_index(index: Dict[str, Dict[str, str]]) -> Dict[str, Dict[str, str]]:
+    """
+    Reverse a key index into code → coding. Keys are visited in file
+    order, so a code maps to the coding of its first row.
+    """
+    codes: Dict[str, Dict[str, str]] = {}
+    for coding in index.values():
+        codes.setdefault(coding["code"], coding)
+    return codes
+
+
+def load_csv_tables(data_dir: str = BASE_DIR) -> Tuple[
+    Dict[str, List[Dict[str, str]]],
+    Dict[str, Dict[str, Dict[str, str]]],
+    Dict[str, Dict[str, Dict[str, str]]],
+]:
+    """The demo CSV rows with their key and code indexes."""
+    rows: Dict[str, List[Dict[str, str]]] = {
+        "snomed": load_csv("snomed.csv", data_dir),
+        "icd10": load_csv("icd10.csv", data_dir),
+        "rxnorm": load_csv("rxnorm.csv", data_dir),
+        "loinc": load_csv("loinc.csv", data_dir),
+    }
+
+    indexes: Dict[str, Dict[str, Dict[str, str]]] = {
+        "snomed": build_lookup_index(
+            rows["snomed"],
+            key_fields=["term", "preferred"],
+            normalizer=normalize_condition_term,
+            make_coding=lambda row: {
+                "system": SNOMED_SYSTEM,
+                "code": row["code"],
+                "display": row["preferred"],
+            },
+            synonyms_sep=";",
+        ),
+        "icd10": build_lookup_index(
+            rows["icd10"],
+            key_fields=["term"],
+            normalizer=normalize_condition_term,
+            make_coding=lambda row: {
+                "system": ICD10_SYSTEM,
+                "code": row["code"],
+                "display": row["term"],
+            },
+        ),
+        "rxnorm": build_lookup_index(
+            rows["rxnorm"],
+            key_fields=["name"],
+            normalizer=normalize_medication_term,
+            make_coding=lambda row: {
+                "system": RXNORM_SYSTEM,
+                "code": row["rxnorm"],
+                "display": row["name"],
+            },
+            synonyms_sep=",",
+        ),
+        "loinc": build_lookup_index(
+            rows["loinc"],
+            key_fields=["test"],
+            normalizer=normalize_lab_term,
+            make_coding=lambda row: {
+                "system": LOINC_SYSTEM,
+                "code": row["code"],
+                "display": row["component"],
+            },
+        ),
+    }
+
+    code_indexes: Dict[str, Dict[str, Dict[str, str]]] = {
+        system: build_code_index(index) for system, index in indexes.items()
+    }
+    return rows, indexes, code_indexes
+
+
+def _open_backend(artifact_path: Optional[str], db_path: Optional[str]) -> Optional[Backend]:
+    """
+    Optional release-scale backend:
+      1. mmap artifact (vocabulary_artifact.py) — shared by all workers
+      2. SQLite store (terminology_loaders.py)
+      3. otherwise the CSV indexes
+    """
+    if artifact_path:
+        return VocabularyArtifact(artifact_path)
+    if db_path:
+        return VocabularyStore(db_path)
+    return None
+
+
+# =========================================================
+# Vocabulary snapshot
+# =========================================================
+
+class VocabularySnapshot:
+    """
+    Everything a lookup needs, built once and never mutated afterwards.
+
+    Reloading builds a new snapshot next to the live one and swaps a
+    single reference, so a request that pinned the old snapshot keeps
+    reading it until it finishes.
+    """
+
+    def __init__(self, store: Optional[Backend] = None, data_dir: str = BASE_DIR):
+        self.store = store
+
+        if store is None:
+            self.rows, self.indexes, self.code_indexes = load_csv_tables(data_dir)
+        else:
+            # The backend answers every probe; skip parsing and indexing the CSVs
+            self.rows = {system: [] for system in SYSTEM_URLS}
+            self.indexes = {system: {} for system in SYSTEM_URLS}
+            self.code_indexes = {system: {} for system in SYSTEM_URLS}
+
+        self.version = self._fingerprint(data_dir)
+        self._matchers: Dict[str, TrigramMatcher] = {}
+        self._matchers_lock = threading.Lock()
+        self._prefix_index: Optional[PrefixIndex] = None
+
+    def _fingerprint(self, data_dir: str) -> str:
+        """
+        Identify the loaded vocabulary. Compiled backends are stat-ed (they
+        can be gigabytes); the demo CSVs are small enough to hash outright.
+        """
+        digest = hashlib.sha1()
+
+        if self.store is not None:
+            stat = os.stat(self.store.path)
+            digest.update(f"{self.store.path}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+        else:
+            for filename in ("snomed.csv", "icd10.csv", "rxnorm.csv", "loinc.csv"):
+                path = os.path.join(data_dir, filename)
+                if os.path.exists(path):
+                    with open(path, "rb") as f:
+                        digest.update(f.read())
+
+        return digest.hexdigest()[:16]
+
+    def probe(self, system: str, system_url: str, key: str) -> Optional[Dict[str, str]]:
+        """
+        Single keyed probe against the backend if configured, else the CSV index.
+        Always returns a fresh dict so callers can't mutate the index.
+        """
+        if self.store is not None:
+            hit = self.store.lookup(system, key)
+            if not hit:
+                return None
+            code, display = hit
+            return {"system": system_url, "code": code, "display": display}
+
+        coding = self.indexes[system].get(key)
+        return dict(coding) if coding else None
+
+    def concept(self, system: str, system_url: str, code: str) -> Optional[Dict[str, str]]:
+        """
+        Reverse probe: the concept a (system, code) pair names, or None if
+        the code isn't in the vocabulary. Fresh dict, like probe().
+        """
+        if self.store is not None:
+            hit = self.store.concept(system, code)
+            if not hit:
+                return None
+            code, display = hit
+            return {"system": system_url, "code": code, "display": display}
+
+        coding = self.code_indexes[system].get(code)
+        return dict(coding) if coding else None
+
+    def keys(self, system: str) -> Iterator[str]:
+        """Every normalized key of a vocabulary, from whichever backend is active."""
+        if self.store is not None:
+            return self.store.keys(system)
+        return iter(self.indexes[system])
+
+    def matcher(self, system: str) -> TrigramMatcher:
+        """Build a system's trigram index on first use."""
+        matcher = self._matchers.get(system)
+        if matcher is None:
+            with self._matchers_lock:
+                matcher = self._matchers.get(system)
+                if matcher is None:
+                    matcher = TrigramMatcher(
+                        self.keys(system),
+                        max_edits=FUZZY_MAX_EDITS,
+                        min_similarity=FUZZY_MIN_SIMILARITY,
+                    )
+                    self._matchers[system] = matcher
+        return matcher
+
+    def prefix_index(self) -> PrefixIndex:
+        """Build the autocomplete index over all four vocabularies on first use."""
+        if self._prefix_index is None:
+            with self._matchers_lock:
+                if self._prefix_index is None:
+                    self._prefix_index = PrefixIndex(
+                        {system: self.keys(system) for system in SYSTEM_URLS}
+                    )
+        return self._prefix_index
+
+    def warm(self) -> "VocabularySnapshot":
+        """Build lazy structures up front so the first request after a swap is fast."""
+        for system in ("snomed", "icd10"):
+            self.matcher(system)
+        self.prefix_index()
+        return self
+
+
+def load_vocabulary(
+    artifact_path: Optional[str] = VOCAB_ARTIFACT_PATH,
+    db_path: Optional[str] = VOCAB_DB_PATH,
+) -> VocabularySnapshot:
+    return VocabularySnapshot(_open_backend(artifact_path, db_path))
+
+
+# ---------------------------------------------------------
+# Current snapshot (swapped atomically on reload)
+# ---------------------------------------------------------
+
+_CURRENT = load_vocabulary()
+_SWAP_LOCK = threading.Lock()
+_PINNED: ContextVar[Optional[VocabularySnapshot]] = ContextVar("pinned_vocabulary", default=None)
+
+
+def current_vocabulary() -> VocabularySnapshot:
+    """The snapshot pinned for this request, else the live one."""
+    return _PINNED.get() or _CURRENT
+
+
+def swap_vocabulary(snapshot: VocabularySnapshot) -> VocabularySnapshot:
+    """Make snapshot live for new requests; returns the previous one."""
+    global _CURRENT
+    with _SWAP_LOCK:
+        previous, _CURRENT = _CURRENT, snapshot
+    return previous
+
+
+@contextmanager
+def pinned_vocabulary(snapshot: Optional[VocabularySnapshot] = None):
+    """Read one snapshot for the duration of the block, even across a swap."""
+    token = _PINNED.set(snapshot or current_vocabulary())
+    try:
+        yield _PINNED.get()
+    finally:
+        _PINNED.reset(token)
+
+
+def vocabulary_version() -> str:
+    """Changes whenever different vocabulary content is loaded."""
+    return current_vocabulary().version
+
+
+def vocabulary_keys(system: str) -> Iterator[str]:
+    return current_vocabulary().keys(system)
 
 
 # =========================================================
@@ -52,37 +360,8 @@ def lookup_snomed(term: Optional[str]) -> Optional[Dict[str, str]]:
     if not term:
         return None
 
-    normalized_input = normalize_condition_term(term)
-
-    for row in SNOMED_DATA:
-        # 1. Match primary term
-        if normalize_condition_term(row["term"]) == normalized_input:
-            return {
-                "system": "http://snomed.info/sct",
-                "code": row["code"],
-                "display": row["preferred"],
-            }
-
-        # 2. Match preferred term
-        if normalize_condition_term(row["preferred"]) == normalized_input:
-            return {
-                "system": "http://snomed.info/sct",
-                "code": row["code"],
-                "display": row["preferred"],
-            }
-
-        # 3. Match synonyms
-        synonyms = row.get("synonyms")
-        if synonyms:
-            for s in synonyms.split(";"):
-                if normalize_condition_term(s) == normalized_input:
-                    return {
-                        "system": "http://snomed.info/sct",
-                        "code": row["code"],
-                        "display": row["preferred"],
-                    }
-
-    return None
+    # Term, preferred name and synonyms are all keys of the index
+    return current_vocabulary().probe("snomed", SNOMED_SYSTEM, normalize_condition_term(term))
 
 
 # =========================================================
@@ -99,17 +378,7 @@ def lookup_icd10(term: Optional[str]) -> Optional[Dict[str, str]]:
     if not term:
         return None
 
-    normalized_input = normalize_condition_term(term)
-
-    for row in ICD10_DATA:
-        if normalize_condition_term(row["term"]) == normalized_input:
-            return {
-                "system": "http://hl7.org/fhir/sid/icd-10-cm",
-                "code": row["code"],
-                "display": row["term"],
-            }
-
-    return None
+    return current_vocabulary().probe("icd10", ICD10_SYSTEM, normalize_condition_term(term))
 
 
 # =========================================================
@@ -127,29 +396,7 @@ def lookup_rxnorm(name: Optional[str]) -> Optional[Dict[str, str]]:
     if not name:
         return None
 
-    normalized_input = normalize_medication_term(name)
-
-    for row in RXNORM_DATA:
-        # Match primary name
-        if normalize_medication_term(row["name"]) == normalized_input:
-            return {
-                "system": "http://www.nlm.nih.gov/research/umls/rxnorm",
-                "code": row["rxnorm"],
-                "display": row["name"],
-            }
-
-        # Match synonyms
-        synonyms = row.get("synonyms")
-        if synonyms:
-            for s in synonyms.split(","):
-                if normalize_medication_term(s) == normalized_input:
-                    return {
-                        "system": "http://www.nlm.nih.gov/research/umls/rxnorm",
-                        "code": row["rxnorm"],
-                        "display": row["name"],
-                    }
-
-    return None
+    return current_vocabulary().probe("rxnorm", RXNORM_SYSTEM, normalize_medication_term(name))
 
 
 # =========================================================
@@ -167,14 +414,123 @@ def lookup_loinc(test: Optional[str]) -> Optional[Dict[str, str]]:
     if not test:
         return None
 
-    normalized_input = normalize_lab_term(test)
+    return current_vocabulary().probe("loinc", LOINC_SYSTEM, normalize_lab_term(test))
 
-    for row in LOINC_DATA:
-        if normalize_lab_term(row["test"]) == normalized_input:
-            return {
-                "system": "http://loinc.org",
-                "code": row["code"],
-                "display": row["component"],
-            }
 
-    return None
+# =========================================================
+# CODE LOOKUP (verification)
+# =========================================================
+
+def lookup_code(system_url: Optional[str], code: Optional[str]) -> Optional[Dict[str, str]]:
+    """
+    Authoritative concept for a coding, by system URL and code.
+
+    Used to verify codes that came from somewhere other than a
+    deterministic lookup (RAG, LLM output).
+    """
+    system = URL_SYSTEMS.get(system_url or "")
+    if not system or not code:
+        return None
+
+    return current_vocabulary().concept(system, system_url, code)
+
+
+# =========================================================
+# FUZZY LOOKUP (conditions, typo tolerance)
+# =========================================================
+
+def _fuzzy_lookup(system: str, system_url: str, term: Optional[str]) -> Optional[Dict[str, str]]:
+    if not term:
+        return None
+
+    vocab = current_vocabulary()
+    match = vocab.matcher(system).match(normalize_condition_term(term))
+    if not match:
+        return None
+
+    key, _edits, _similarity = match
+    return vocab.probe(system, system_url, key)
+
+
+def fuzzy_lookup_snomed(term: Optional[str]) -> Optional[Dict[str, str]]:
+    """
+    Typo-tolerant SNOMED lookup: "typ 2 diabtes" → 44054006.
+    Bounded edit distance, never crosses numbers (type 1 ≠ type 2).
+    """
+    return _fuzzy_lookup("snomed", SNOMED_SYSTEM, term)
+
+
+def fuzzy_lookup_icd10(term: Optional[str]) -> Optional[Dict[str, str]]:
+    """
+    Typo-tolerant ICD-10 lookup (same rules as fuzzy_lookup_snomed).
+    """
+    return _fuzzy_lookup("icd10", ICD10_SYSTEM, term)
+
+
+# =========================================================
+# PREFIX SEARCH (autocomplete)
+# =========================================================
+
+PREFIX_NORMALIZERS: Dict[str, Callable[[Optional[str]], str]] = {
+    "snomed": normalize_condition_term,
+    "icd10": normalize_condition_term,
+    "rxnorm": normalize_medication_term,
+    "loinc": normalize_lab_term,
+}
+
+
+def suggest_terms(
+    prefix: Optional[str],
+    k: int = 10,
+    systems: Optional[Iterable[str]] = None,
+) -> List[Dict[str, str]]:
+    """
+    Top-k concepts whose terms or synonyms have a word starting with prefix.
+
+    The prefix is normalized the way each vocabulary's keys were, so
+    "Type II diab" reaches "type 2 diabetes" in SNOMED/ICD-10. A concept
+    reachable through several keys is returned once, at its best rank.
+    """
+    if not prefix:
+        return []
+
+    wanted = set(systems or SYSTEM_URLS) & set(SYSTEM_URLS)
+    vocab = current_vocabulary()
+    index = vocab.prefix_index()
+
+    # Each vocabulary's keys were built with its own normalizer
+    variants: Dict[str, set] = {}
+    for system in wanted:
+        key = PREFIX_NORMALIZERS[system](prefix)
+        if key:
+            variants.setdefault(key, set()).add(system)
+
+    # Synonyms of one concept can fill the first k keys; fetch deeper
+    # until k distinct concepts are found or the matches run out
+    fetch = k
+    while True:
+        matches = []
+        exhausted = True
+        for variant, variant_systems in variants.items():
+            found = index.search(variant, variant_systems, limit=fetch)
+            exhausted = exhausted and len(found) < fetch
+            for system, key in found:
+                matches.append((match_rank(key, variant), system, key))
+
+        suggestions: List[Dict[str, str]] = []
+        seen = set()
+        for _rank, system, key in sorted(matches):
+            coding = vocab.probe(system, SYSTEM_URLS[system], key)
+            if not coding or (system, coding["code"]) in seen:
+                continue
+            seen.add((system, coding["code"]))
+            coding["matched"] = key
+            suggestions.append(coding)
+            if len(suggestions) == k:
+                break
+
+        if len(suggestions) == k or exhausted:
+            break
+        fetch *= 4
+
+    return suggestions
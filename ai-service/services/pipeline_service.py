@@ -1,9 +1,13 @@
 # ai-service/services/pipeline_service.py
 
-from services.summarizer_service import summarize
-from services.extractor_service import extract_entities
+import asyncio
+
+from config import LLM_STREAM_EXTRACTION
+from services.summarizer_service import summarize, summarize_async
+from services.extractor_service import extract_entities, extract_entities_async, extract_entities_streaming
 from services.schema_normalization import normalize_entities
 from services.fhir_service import generate_fhir_resource
+from services.terminology_service import resolve_conditions
 from services.validation_service import validate_entities
 
 from models.extract_models import ExtractResponse
@@ -36,28 +40,120 @@ def run_pipeline(payload: PipelineRequest) -> PipelineResponse:
     raw_entities = extract_entities(text)
 
     # --------------------------------
-    # 3. Schema normalization
+    # 3-5. Normalize, validate, convert
     # --------------------------------
-    clean_entities = normalize_entities(raw_entities)
+    entities_model = _validated_entities(raw_entities)
 
     # --------------------------------
-    # 4. Validation (text-only, pre-FHIR)
+    # 6. Generate FHIR Bundle
     # --------------------------------
-    validate_entities(clean_entities)
+    fhir_bundle = generate_fhir_resource(entities_model)
+
+    return PipelineResponse(
+        summary=summary_data["summary"],
+        entities=entities_model,
+        fhir=FhirBundleResponse(**fhir_bundle),
+    )
+
+
+async def run_pipeline_async(payload: PipelineRequest) -> PipelineResponse:
+    """
+    run_pipeline for async routes. Summarization and extraction don't
+    depend on each other, so both LLM calls are in flight at once and
+    no thread waits on either. FHIR generation (vocabulary lookups, a
+    possible RAG embedding call) runs on a worker thread.
+
+    With LLM_STREAM_EXTRACTION, conditions are resolved while the model
+    is still writing (see _ConditionPrefetcher), so by the last token
+    the bundle step mostly finds its codings in RESOLUTION_CACHE.
+    """
+
+    text = payload.text
+
+    # --------------------------------
+    # 1-2. Summarization + extraction, concurrently
+    # --------------------------------
+    prefetcher = _ConditionPrefetcher()
+    if LLM_STREAM_EXTRACTION:
+        def on_item(_field, condition):
+            prefetcher.add(condition)
+
+        extraction = extract_entities_streaming(text, on_item, fields=("conditions",))
+    else:
+        extraction = extract_entities_async(text)
+
+    summary = asyncio.ensure_future(summarize_async(text))
+    entities = asyncio.ensure_future(extraction)
+    try:
+        summary_data, raw_entities = await asyncio.gather(summary, entities)
+    except BaseException:
+        # Nothing will use the other call or the warm-up now
+        for task in (summary, entities, *prefetcher.tasks):
+            task.cancel()
+        await asyncio.gather(summary, entities, *prefetcher.tasks, return_exceptions=True)
+        raise
+
+    # Warm-up only: a failed prefetch is retried by the bundle step
+    await asyncio.gather(*prefetcher.tasks, return_exceptions=True)
 
     # --------------------------------
-    # 5. Convert dict → ExtractResponse
+    # 3-5. Normalize, validate, convert
     # --------------------------------
-    entities_model = ExtractResponse(**clean_entities)
+    entities_model = _validated_entities(raw_entities)
 
     # --------------------------------
     # 6. Generate FHIR Bundle
     # --------------------------------
-    fhir_bundle = generate_fhir_resource(entities_model)
-    fhir_response = FhirBundleResponse(**fhir_bundle)
+    fhir_bundle = await asyncio.to_thread(generate_fhir_resource, entities_model)
 
     return PipelineResponse(
         summary=summary_data["summary"],
         entities=entities_model,
-        fhir=fhir_response,
+        fhir=FhirBundleResponse(**fhir_bundle),
     )
+
+
+class _ConditionPrefetcher:
+    """
+    Resolves streamed conditions ahead of the bundle, one batch at a
+    time. The first condition starts a batch at once; those written
+    while it resolves wait and go together in the next one, so a note
+    costs a few resolve_conditions calls (and RAG round-trips) rather
+    than one per condition.
+
+    Conditions are the only entities worth it: their codings are cached
+    and may need RAG, while RxNorm/LOINC lookups are in-memory.
+    """
+
+    def __init__(self):
+        self._pending = []
+        self.tasks = []
+
+    def add(self, condition) -> None:
+        self._pending.append(condition)
+        # Runs on the event loop, so a draining task either sees this
+        # condition or has already finished
+        if not self.tasks or self.tasks[-1].done():
+            self.tasks.append(asyncio.create_task(self._drain()))
+
+    async def _drain(self) -> None:
+        while self._pending:
+            batch, self._pending = self._pending, []
+            await asyncio.to_thread(_prefetch_conditions, batch)
+
+
+def _prefetch_conditions(conditions) -> None:
+    terms = normalize_entities({"conditions": conditions})["conditions"]
+    if terms:
+        resolve_conditions(terms)
+
+
+def _validated_entities(raw_entities) -> ExtractResponse:
+    # Schema normalization
+    clean_entities = normalize_entities(raw_entities)
+
+    # Validation (text-only, pre-FHIR)
+    validate_entities(clean_entities)
+
+    # Convert dict → ExtractResponse
+    return ExtractResponse(**clean_entities)
@@ -0,0 +1,162 @@
+# ai-service/services/prefix_index.py
+
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import threading
+
+import numpy as np
+
+# Sorts after any character a normalized key can contain, so
+# bisect(prefix + PREFIX_END) lands just past the last match
+PREFIX_END = "\U0010ffff"
+
+# Mid-key matches rank behind every whole-key match
+MID_KEY_PENALTY = 1 << 16
+
+# Ranges wider than this (one- or two-letter prefixes) are ranked once
+# and memoized; there are only a few hundred such prefixes
+LARGE_RANGE = 8192
+
+# The memo is also keyed on the caller's systems and limit, so it is an
+# LRU rather than one entry per prefix
+LARGE_RESULTS_MAX = 1024
+
+
+def match_rank(key: str, prefix: str) -> Tuple[int, int, str]:
+    """
+    Whole-key matches rank before mid-key ones, then shorter (closer)
+    completions, then alphabetical.
+    """
+    return (0 if key.startswith(prefix) else 1, len(key), key)
+
+
+class _SuffixView:
+    """
+    Word-start suffixes in sorted order, materialized on access so
+    bisect can search them without storing every suffix string.
+    """
+
+    def __init__(self, keys: List[str], key_ids: List[int], offsets: List[int]):
+        self.keys = keys
+        self.key_ids = key_ids
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.key_ids)
+
+    def __getitem__(self, i: int) -> str:
+        return self.keys[self.key_ids[i]][self.offsets[i]:]
+
+
+class PrefixIndex:
+    """
+    Sorted-array prefix index over normalized vocabulary keys.
+
+    Every key is indexed from each word start, so "diab" finds
+    "type 2 diabetes" as well as "diabetes mellitus type 2". A query is
+    two bisects for the matching range, then a vectorized top-k over
+    precomputed scores, so short prefixes matching a large slice of
+    SNOMED cost a few array operations rather than a Python loop.
+    """
+
+    def __init__(self, keys_by_system: Dict[str, Iterable[str]]):
+        self.keys: List[str] = []
+        self.system_names: List[str] = list(keys_by_system)
+        key_systems: List[int] = []
+
+        suffixes: List[Tuple[str, int, int]] = []
+        for system_id, keys in enumerate(keys_by_system.values()):
+            for key in keys:
+                key_id = len(self.keys)
+                self.keys.append(key)
+                key_systems.append(system_id)
+
+                suffixes.append((key, key_id, 0))
+                for offset, char in enumerate(key):
+                    if char == " " and offset + 1 < len(key):
+                        suffixes.append((key[offset + 1:], key_id, offset + 1))
+
+        suffixes.sort()
+        key_ids = [s[1] for s in suffixes]
+        offsets = [s[2] for s in suffixes]
+        del suffixes
+
+        self.view = _SuffixView(self.keys, key_ids, offsets)
+
+        # Per-suffix arrays, aligned with the sorted order
+        ids = np.array(key_ids, dtype=np.int32)
+        key_lengths = np.array([len(k) for k in self.keys], dtype=np.int32)
+        self.suffix_keys = ids
+        self.suffix_systems = np.array(key_systems, dtype=np.int8)[ids]
+        self.scores = (
+            np.minimum(key_lengths[ids], MID_KEY_PENALTY - 1)
+            + (np.array(offsets, dtype=np.int32) > 0) * MID_KEY_PENALTY
+        )
+        self.key_systems = key_systems
+
+        self._large_results: "OrderedDict[tuple, List[Tuple[str, str]]]" = OrderedDict()
+        self._large_lock = threading.Lock()
+
+    def search(
+        self,
+        prefix: str,
+        systems: Optional[Set[str]] = None,
+        limit: int = 10,
+    ) -> List[Tuple[str, str]]:
+        """
+        Return up to `limit` (system, key) pairs whose key has a word
+        starting with `prefix`, best first (see match_rank).
+        """
+        if not prefix or limit <= 0:
+            return []
+
+        start = bisect_left(self.view, prefix)
+        end = bisect_left(self.view, prefix + PREFIX_END, start)
+        if start == end:
+            return []
+
+        if end - start <= LARGE_RANGE:
+            return self._top(start, end, prefix, systems, limit)
+
+        memo_key = (prefix, frozenset(systems or ()), limit)
+        with self._large_lock:
+            results = self._large_results.get(memo_key)
+            if results is not None:
+                self._large_results.move_to_end(memo_key)
+                return results
+
+        results = self._top(start, end, prefix, systems, limit)
+        with self._large_lock:
+            self._large_results[memo_key] = results
+            while len(self._large_results) > LARGE_RESULTS_MAX:
+                self._large_results.popitem(last=False)
+        return results
+
+    def _top(
+        self,
+        start: int,
+        end: int,
+        prefix: str,
+        systems: Optional[Set[str]],
+        limit: int,
+    ) -> List[Tuple[str, str]]:
+        scores = self.scores[start:end]
+        key_ids = self.suffix_keys[start:end]
+        if systems:
+            allowed = np.array([name in systems for name in self.system_names])
+            in_systems = allowed[self.suffix_systems[start:end]]
+            scores, key_ids = scores[in_systems], key_ids[in_systems]
+
+        # A key can match through several of its words; over-fetch so
+        # duplicates don't leave the result short
+        fetch = 4 * limit
+        if fetch < len(scores):
+            key_ids = key_ids[np.argpartition(scores, fetch - 1)[:fetch]]
+
+        ranked = sorted(
+            dict.fromkeys(key_ids.tolist()),
+            key=lambda key_id: match_rank(self.keys[key_id], prefix),
+        )[:limit]
+        return [(self.system_names[self.key_systems[key_id]], self.keys[key_id]) for key_id in ranked]
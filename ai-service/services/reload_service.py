@@ -0,0 +1,159 @@
+# ai-service/services/reload_service.py
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from config import VOCAB_ARTIFACT_PATH, VOCAB_DB_PATH
+from services.knowledge_service import (
+    current_vocabulary,
+    load_vocabulary,
+    pinned_vocabulary,
+    swap_vocabulary,
+    vocabulary_version,
+)
+from rag.rag_search import (
+    INDEX_PATH,
+    META_PATH,
+    RagIndex,
+    current_index,
+    index_version,
+    pinned_index,
+    swap_index,
+)
+
+logger = logging.getLogger(__name__)
+
+# Held only for the pointer swap and for pinning, never while building
+_SWAP_LOCK = threading.Lock()
+# Serializes reloads so two builds never race to swap
+_RELOAD_LOCK = threading.Lock()
+# Guards _STATUS, written by the reload thread and read by requests
+_STATUS_LOCK = threading.Lock()
+
+# start_reload() requests: set on every call, cleared by the reload
+# worker right before each reload it runs. A request that arrives while
+# a reload is already past reading its files gets a follow-up reload.
+_PENDING_LOCK = threading.Lock()
+_pending = False
+_worker_running = False
+
+_STATUS: Dict[str, Any] = {
+    "status": "idle",
+    "started_at": None,
+    "finished_at": None,
+    "duration_seconds": None,
+    "error": None,
+    # Live versions, tracked here because the *_version() helpers
+    # answer for the caller's pinned snapshot
+    "vocab_version": vocabulary_version(),
+    "index_version": index_version(),
+}
+
+
+def reload_status() -> Dict[str, Any]:
+    with _PENDING_LOCK:
+        pending = _pending
+    with _STATUS_LOCK:
+        return {**_STATUS, "pending": pending}
+
+
+def _set_status(**fields: Any) -> None:
+    with _STATUS_LOCK:
+        _STATUS.update(fields)
+
+
+def reload_snapshots(
+    vocab_artifact_path: Optional[str] = None,
+    vocab_db_path: Optional[str] = None,
+    index_path: Optional[str] = None,
+    meta_path: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Build a fresh vocabulary + RAG index off to the side, then swap both in.
+
+    Requests keep running on the old snapshots while the new ones load;
+    requests already in flight finish on whatever they pinned. Missing
+    paths default to the configured ones, so a plain reload re-reads
+    files that were replaced on disk. Paths are for trusted callers
+    (scripts, tests); the HTTP route only reloads the configured files.
+    """
+    with _RELOAD_LOCK:
+        _set_status(status="running", started_at=time.time(), finished_at=None, error=None)
+        started = time.perf_counter()
+
+        try:
+            vocab = load_vocabulary(
+                artifact_path=vocab_artifact_path or VOCAB_ARTIFACT_PATH,
+                db_path=vocab_db_path or VOCAB_DB_PATH,
+            ).warm()
+            rag_index = RagIndex(index_path or INDEX_PATH, meta_path or META_PATH).load()
+
+            with _SWAP_LOCK:
+                swap_vocabulary(vocab)
+                swap_index(rag_index)
+
+            _set_status(
+                status="ok",
+                vocab_version=vocab.version,
+                index_version=rag_index.version,
+            )
+            logger.info("Reloaded vocabulary %s and index %s", vocab.version, rag_index.version)
+
+        except Exception as e:
+            # The old snapshots stay live; a failed reload changes nothing
+            _set_status(status="failed", error=str(e))
+            logger.exception("Terminology reload failed")
+
+        finally:
+            _set_status(
+                finished_at=time.time(),
+                duration_seconds=round(time.perf_counter() - started, 3),
+            )
+
+    return reload_status()
+
+
+def start_reload() -> Dict[str, Any]:
+    """
+    Reload on a background thread. If a reload is already running, a
+    follow-up reload runs after it, so changes written to disk before
+    this call (e.g. concept updates) are always picked up.
+    """
+    global _pending, _worker_running
+    with _PENDING_LOCK:
+        _pending = True
+        start_worker = not _worker_running
+        _worker_running = True
+
+    if start_worker:
+        threading.Thread(target=_reload_worker, daemon=True).start()
+
+    # Report "running" even if the thread hasn't taken the lock yet
+    return {**reload_status(), "status": "running"}
+
+
+def _reload_worker() -> None:
+    global _pending, _worker_running
+    while True:
+        with _PENDING_LOCK:
+            if not _pending:
+                _worker_running = False
+                return
+            _pending = False
+        reload_snapshots()
+
+
+@contextmanager
+def pinned_snapshots():
+    """
+    Pin the live vocabulary and RAG index together for one request.
+    """
+    with _SWAP_LOCK:
+        vocab = current_vocabulary()
+        rag_index = current_index()
+
+    with pinned_vocabulary(vocab), pinned_index(rag_index):
+        yield
@@ -0,0 +1,67 @@
+# ai-service/services/resolution_cache.py
+
+import json
+from typing import Any
+
+from utils.tiered_cache import TieredCache
+
+# Returned by get() when nothing is cached. None is a valid cached value
+# (a term that is genuinely uncoded), so it can't double as "miss".
+MISS = object()
+
+
+class ResolutionCache(TieredCache):
+    """
+    Process-wide cache of terminology resolutions.
+
+    Entries are keyed on (kind, normalized term, version). The version
+    string changes whenever the vocabulary or RAG index changes, so a
+    reload never serves stale codings; old entries just age out.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS resolutions (
+            kind    TEXT NOT NULL,
+            key     TEXT NOT NULL,
+            version TEXT NOT NULL,
+            value   TEXT NOT NULL,
+            PRIMARY KEY (kind, key, version)
+        ) WITHOUT ROWID;
+    """
+
+    def get(self, kind: str, key: str, version: str) -> Any:
+        cache_key = (kind, key, version)
+
+        with self._lock:
+            if cache_key in self._entries:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return self._entries[cache_key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value FROM resolutions WHERE kind = ? AND key = ? AND version = ?",
+                    cache_key,
+                ).fetchone()
+                if row is not None:
+                    value = json.loads(row[0])
+                    self._remember(cache_key, value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return value
+
+            self.misses += 1
+            return MISS
+
+    def put(self, kind: str, key: str, version: str, value: Any) -> None:
+        cache_key = (kind, key, version)
+
+        with self._lock:
+            self._remember(cache_key, value)
+
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO resolutions VALUES (?, ?, ?, ?)",
+                    (*cache_key, json.dumps(value)),
+                )
+                self._db.commit()
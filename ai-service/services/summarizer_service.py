@@ -3,8 +3,10 @@
 import json
 from typing import Dict, Any
 
-from config import OPENAI_MODEL_SUMMARY
-from utils.llm_client import call_llm, safe_json
+from config import LLM_STRUCTURED_OUTPUT, OPENAI_MODEL_SUMMARY
+from models.note_models import NoteResponse
+from utils.llm_client import call_llm, call_llm_async, parses_as_object, safe_json
+from utils.structured_output import json_schema_format
 
 SUMMARY_SYSTEM_PROMPT = """
 You are a clinical documentation assistant.
@@ -53,24 +55,47 @@ If a list has no items, return [].
 Do NOT include explanations or additional fields.
 """
 
+SUMMARY_RESPONSE_FORMAT = (
+    json_schema_format("clinical_summary", NoteResponse) if LLM_STRUCTURED_OUTPUT else None
+)
 
-def summarize(text: str) -> Dict[str, Any]:
-    """
-    Use an LLM to summarize clinical text into NoteResponse-shaped data.
-    """
 
-    messages = [
+def _summary_messages(text: str):
+    return [
         {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
         {"role": "user", "content": f"Clinical note:\n{text}\nReturn ONLY the required JSON."}
     ]
 
+
+def summarize(text: str) -> Dict[str, Any]:
+    """
+    Use an LLM to summarize clinical text into NoteResponse-shaped data.
+    """
+
     # Use our safe client wrapper with retry + error handling
-    raw = call_llm(messages, OPENAI_MODEL_SUMMARY)
+    raw = call_llm(
+        _summary_messages(text), OPENAI_MODEL_SUMMARY,
+        response_format=SUMMARY_RESPONSE_FORMAT, accept=parses_as_object,
+    )
+    return _parse_summary(raw)
+
+
+async def summarize_async(text: str) -> Dict[str, Any]:
+    """
+    summarize() on the async LLM client.
+    """
+    raw = await call_llm_async(
+        _summary_messages(text), OPENAI_MODEL_SUMMARY,
+        response_format=SUMMARY_RESPONSE_FORMAT, accept=parses_as_object,
+    )
+    return _parse_summary(raw)
+
 
+def _parse_summary(raw: str) -> Dict[str, Any]:
     if raw is None:
         raise ValueError("Summarization LLM failed after retries.")
 
-    data = safe_json(raw)
+    data = safe_json(raw, "summary")
     if data is None:
         raise ValueError(f"Invalid JSON returned by summarization LLM: {raw}")
 
@@ -0,0 +1,335 @@
+# ai-service/services/terminology_loaders.py
+"""
+Streaming loaders for the official terminology release formats.
+
+Each loader reads its release file line by line, keeps only active
+content, normalizes every surface form with the same functions the
+lookups use, and writes it into a VocabularyStore. Nothing is held in
+memory beyond one write batch.
+
+Usage (from ai-service/):
+
+    python -m services.terminology_loaders --out data/vocab.sqlite \\
+        --snomed-concepts  sct2_Concept_Snapshot_INT_<date>.txt \\
+        --snomed-descriptions sct2_Description_Snapshot-en_INT_<date>.txt \\
+        --icd10cm-order icd10cm_order_<year>.txt \\
+        --rxnconso RXNCONSO.RRF \\
+        --loinc Loinc.csv
+
+Set VOCAB_DB_PATH to the output file to make knowledge_service use it.
+"""
+
+import argparse
+import csv
+import re
+import resource
+import sys
+import time
+from typing import Callable, Dict, Iterator, Optional
+
+from services.terminology_normalization import (
+    normalize_condition_term,
+    normalize_medication_term,
+    normalize_lab_term,
+)
+from services.vocabulary_store import VocabularyWriter
+
+# ---------------------------------------------------------
+# Release constants
+# ---------------------------------------------------------
+
+SNOMED_FSN_TYPE = "900000000000003001"
+SNOMED_SYNONYM_TYPE = "900000000000013009"
+SEMANTIC_TAG_PATTERN = re.compile(r"\s*\([^)]*\)\s*$")
+
+# RxNorm term types that name a concept, best display first.
+# Anything else from the RXNORM source (SY, TMSY, PSN) is a synonym.
+RXNORM_NAME_TTYS = {
+    "IN": 0,
+    "PIN": 1,
+    "MIN": 2,
+    "BN": 3,
+    "SCD": 4,
+    "SBD": 4,
+    "GPCK": 5,
+    "BPCK": 5,
+    "SCDC": 6,
+    "SBDC": 6,
+    "SCDF": 7,
+    "SBDF": 7,
+}
+RXNORM_SYNONYM_TTYS = {"SY", "TMSY", "PSN"}
+RXNORM_SYNONYM_RANK = 9
+
+Stats = Dict[str, float]
+
+
+def _iter_lines(path: str) -> Iterator[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            yield line.rstrip("\r\n")
+
+
+def _iter_tsv(path: str) -> Iterator[list]:
+    lines = _iter_lines(path)
+    next(lines, None)  # header
+    for line in lines:
+        yield line.split("\t")
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (Linux reports KB)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# =========================================================
+# SNOMED CT (RF2 Snapshot)
+# =========================================================
+
+def load_snomed_rf2(
+    writer: VocabularyWriter,
+    concepts_path: str,
+    descriptions_path: str,
+) -> Stats:
+    """
+    Load active SNOMED concepts and their active descriptions.
+
+    Active concept ids and descriptions are staged in temporary SQLite
+    tables and joined there, so the ~350k concepts / 1M+ descriptions
+    never need to fit in Python memory at once.
+
+    - FSN (semantic tag stripped) is the display and rank-0 key
+    - Synonyms are rank-1 keys
+    """
+    started = time.perf_counter()
+    conn = writer.conn
+    conn.executescript("""
+        CREATE TEMP TABLE snomed_active (id TEXT PRIMARY KEY) WITHOUT ROWID;
+        CREATE TEMP TABLE snomed_desc (concept_id TEXT, type_id TEXT, term TEXT);
+    """)
+
+    read = 0
+    batch = []
+    for cols in _iter_tsv(concepts_path):
+        read += 1
+        if cols[2] == "1":
+            batch.append((cols[0],))
+        if len(batch) >= 10_000:
+            conn.executemany("INSERT OR IGNORE INTO snomed_active VALUES (?)", batch)
+            batch = []
+    conn.executemany("INSERT OR IGNORE INTO snomed_active VALUES (?)", batch)
+
+    batch = []
+    for cols in _iter_tsv(descriptions_path):
+        read += 1
+        # id, effectiveTime, active, moduleId, conceptId, languageCode, typeId, term, ...
+        if cols[2] != "1" or cols[6] not in (SNOMED_FSN_TYPE, SNOMED_SYNONYM_TYPE):
+            continue
+        batch.append((cols[4], cols[6], cols[7]))
+        if len(batch) >= 10_000:
+            conn.executemany("INSERT INTO snomed_desc VALUES (?, ?, ?)", batch)
+            batch = []
+    conn.executemany("INSERT INTO snomed_desc VALUES (?, ?, ?)", batch)
+
+    kept = 0
+    rows = conn.execute("""
+        SELECT d.concept_id, d.type_id, d.term
+        FROM snomed_desc d
+        JOIN snomed_active a ON a.id = d.concept_id
+    """)
+
+    for concept_id, type_id, term in rows:
+        kept += 1
+        if type_id == SNOMED_FSN_TYPE:
+            writer.add_concept("snomed", concept_id, SEMANTIC_TAG_PATTERN.sub("", term))
+            writer.add_term("snomed", normalize_condition_term(term), 0, concept_id)
+        else:
+            writer.add_term("snomed", normalize_condition_term(term), 1, concept_id)
+
+    writer.flush()
+    conn.executescript("DROP TABLE snomed_active; DROP TABLE snomed_desc;")
+    return {"read": read, "kept": kept, "seconds": time.perf_counter() - started}
+
+
+# =========================================================
+# ICD-10-CM (CMS order file)
+# =========================================================
+
+def _format_icd10_code(raw: str) -> str:
+    """CMS files ship codes undotted: E119 → E11.9"""
+    return raw if len(raw) <= 3 else f"{raw[:3]}.{raw[3:]}"
+
+
+def load_icd10cm_order(writer: VocabularyWriter, order_path: str) -> Stats:
+    """
+    Load icd10cm_order_<year>.txt (fixed width).
+
+    Columns: order(0-5) code(6-13) billable flag(14) short(16-76) long(77-)
+    Every code in the release is current, so there is no active filter.
+    """
+    started = time.perf_counter()
+    read = kept = 0
+
+    for line in _iter_lines(order_path):
+        read += 1
+        if len(line) < 17:
+            continue
+
+        code = _format_icd10_code(line[6:13].strip())
+        short_desc = line[16:76].strip()
+        long_desc = line[77:].strip() or short_desc
+
+        writer.add_concept("icd10", code, long_desc)
+        writer.add_term("icd10", normalize_condition_term(long_desc), 0, code)
+        writer.add_term("icd10", normalize_condition_term(short_desc), 1, code)
+        kept += 1
+
+    writer.flush()
+    return {"read": read, "kept": kept, "seconds": time.perf_counter() - started}
+
+
+# =========================================================
+# RxNorm (RXNCONSO.RRF)
+# =========================================================
+
+def load_rxnorm_rrf(writer: VocabularyWriter, rxnconso_path: str) -> Stats:
+    """
+    Load RxNorm-sourced, English, unsuppressed atoms from RXNCONSO.RRF.
+
+    Name-type atoms (IN, BN, SCD, ...) define the concept display;
+    SY/TMSY/PSN atoms only add lookup keys.
+    """
+    started = time.perf_counter()
+    read = kept = 0
+
+    for line in _iter_lines(rxnconso_path):
+        read += 1
+        # RXCUI|LAT|TS|LUI|STT|SUI|ISPREF|RXAUI|SAUI|SCUI|SDUI|SAB|TTY|CODE|STR|SRL|SUPPRESS|CVF|
+        cols = line.split("|")
+        if len(cols) < 17 or cols[11] != "RXNORM" or cols[1] != "ENG" or cols[16] != "N":
+            continue
+
+        rxcui, tty, name = cols[0], cols[12], cols[14]
+
+        if tty in RXNORM_NAME_TTYS:
+            writer.add_concept("rxnorm", rxcui, name)
+            rank = RXNORM_NAME_TTYS[tty]
+        elif tty in RXNORM_SYNONYM_TTYS:
+            rank = RXNORM_SYNONYM_RANK
+        else:
+            continue
+
+        writer.add_term("rxnorm", normalize_medication_term(name), rank, rxcui)
+        kept += 1
+
+    writer.flush()
+    return {"read": read, "kept": kept, "seconds": time.perf_counter() - started}
+
+
+# =========================================================
+# LOINC (Loinc.csv)
+# =========================================================
+
+def load_loinc_csv(writer: VocabularyWriter, loinc_path: str) -> Stats:
+    """
+    Load ACTIVE LOINC terms from the release Loinc.csv.
+
+    Long common name is the display; long name, short name and
+    component are lookup keys in that order of preference.
+    """
+    started = time.perf_counter()
+    read = kept = 0
+
+    with open(loinc_path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            read += 1
+            if row.get("STATUS") != "ACTIVE":
+                continue
+
+            code = row["LOINC_NUM"]
+            display = row.get("LONG_COMMON_NAME") or row.get("COMPONENT") or code
+
+            writer.add_concept("loinc", code, display)
+            writer.add_term("loinc", normalize_lab_term(row.get("LONG_COMMON_NAME")), 0, code)
+            writer.add_term("loinc", normalize_lab_term(row.get("SHORTNAME")), 1, code)
+            writer.add_term("loinc", normalize_lab_term(row.get("COMPONENT")), 2, code)
+            kept += 1
+
+    writer.flush()
+    return {"read": read, "kept": kept, "seconds": time.perf_counter() - started}
+
+
+# =========================================================
+# Demo CSVs (data/*.csv)
+# =========================================================
+
+def load_demo_csvs(writer: VocabularyWriter) -> Stats:
+    """
+    Copy the in-memory CSV indexes into the store.
+
+    Keys are written at a single rank in index order, so the store
+    resolves exactly like the CSV lookups (first matching row wins).
+    """
+    from services import knowledge_service
+
+    started = time.perf_counter()
+    kept = 0
+
+    # Always the CSVs, even while a compiled backend is the live vocabulary
+    _rows, indexes, _codes = knowledge_service.load_csv_tables()
+    for system, index in indexes.items():
+        for key, coding in index.items():
+            writer.add_concept(system, coding["code"], coding["display"])
+            writer.add_term(system, key, 0, coding["code"])
+            kept += 1
+
+    writer.flush()
+    return {"read": kept, "kept": kept, "seconds": time.perf_counter() - started}
+
+
+# =========================================================
+# CLI
+# =========================================================
+
+def _report(name: str, stats: Stats, log: Callable[[str], None]) -> None:
+    log(
+        f"{name:<8} read={int(stats['read']):>9,} kept={int(stats['kept']):>9,} "
+        f"time={stats['seconds']:.1f}s peak_rss={peak_rss_mb():.0f}MB"
+    )
+
+
+def build_store(args: argparse.Namespace, log: Callable[[str], None] = print) -> None:
+    writer = VocabularyWriter(args.out)
+    started = time.perf_counter()
+
+    if args.demo_csv:
+        _report("demo", load_demo_csvs(writer), log)
+    if args.snomed_concepts and args.snomed_descriptions:
+        _report("snomed", load_snomed_rf2(writer, args.snomed_concepts, args.snomed_descriptions), log)
+    if args.icd10cm_order:
+        _report("icd10", load_icd10cm_order(writer, args.icd10cm_order), log)
+    if args.rxnconso:
+        _report("rxnorm", load_rxnorm_rrf(writer, args.rxnconso), log)
+    if args.loinc:
+        _report("loinc", load_loinc_csv(writer, args.loinc), log)
+
+    writer.set_meta("built_at", time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()))
+    writer.close()
+
+    log(f"Wrote {args.out} in {time.perf_counter() - started:.1f}s (peak RSS {peak_rss_mb():.0f}MB)")
+
+
+def parse_args(argv: Optional[list] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build the terminology store from release files.")
+    parser.add_argument("--out", required=True, help="Output SQLite path")
+    parser.add_argument("--snomed-concepts", help="RF2 sct2_Concept_Snapshot file")
+    parser.add_argument("--snomed-descriptions", help="RF2 sct2_Description_Snapshot file")
+    parser.add_argument("--icd10cm-order", help="CMS icd10cm_order_<year>.txt")
+    parser.add_argument("--rxnconso", help="RxNorm RXNCONSO.RRF")
+    parser.add_argument("--loinc", help="LOINC Loinc.csv")
+    parser.add_argument("--demo-csv", action="store_true", help="Include data/*.csv")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    build_store(parse_args(sys.argv[1:]))
@@ -2,7 +2,8 @@
 
 import re
 import unicodedata
-from typing import Optional
+from functools import lru_cache
+from typing import Iterable, List, Optional
 
 # -----------------------
 # Shared utilities
@@ -18,6 +19,20 @@ ROMAN_NUMERAL_MAP = {
 
 DOSAGE_PATTERN = re.compile(r"\b\d+\s*(mg|ml|mcg|g|iu|units|%)\b")
 
+# Parentheticals and punctuation (except separators) in one scan.
+# Alternation order matters: "(...)" is tried first, so its contents,
+# separators included, go with it exactly as in a separate pass.
+CLEANUP_PATTERN = re.compile(r"\([^)]*\)|[^a-z0-9\s\-_/]")
+SEPARATOR_TABLE = str.maketrans("-_/", "   ")
+
+ROMAN_NUMERAL_PATTERN = re.compile(
+    r"\b(" + "|".join(sorted(ROMAN_NUMERAL_MAP, key=len, reverse=True)) + r")\b"
+)
+
+# Distinct terms seen per process is small (the same conditions, drugs
+# and labs recur across notes), so a bounded memo absorbs most calls.
+NORMALIZATION_CACHE_SIZE = 65536
+
 
 def _shared_normalize(text: str) -> str:
     """
@@ -27,37 +42,39 @@ def _shared_normalize(text: str) -> str:
     if not text:
         return ""
 
-    # Unicode normalization (smart quotes, accents)
-    text = unicodedata.normalize("NFKD", text)
-
-    # Lowercase
-    text = text.lower()
+    # Unicode normalization (smart quotes, accents) + lowercase
+    text = unicodedata.normalize("NFKD", text).lower()
 
-    # Remove parentheticals: (adult), (left), (%)
-    text = re.sub(r"\([^)]*\)", "", text)
-
-    # Normalize separators
-    text = re.sub(r"[-_/]", " ", text)
-
-    # Remove remaining punctuation
-    text = re.sub(r"[^a-z0-9\s]", "", text)
+    # Remove parentheticals + punctuation, then separators → spaces
+    text = CLEANUP_PATTERN.sub("", text).translate(SEPARATOR_TABLE)
 
     # Normalize whitespace
-    text = re.sub(r"\s+", " ", text).strip()
-
-    return text
+    return " ".join(text.split())
 
 
 def _normalize_roman_numerals(text: str) -> str:
-    for roman, arabic in ROMAN_NUMERAL_MAP.items():
-        text = re.sub(rf"\b{roman}\b", arabic, text)
-    return text
+    return ROMAN_NUMERAL_PATTERN.sub(lambda m: ROMAN_NUMERAL_MAP[m.group(1)], text)
 
 
 def _remove_dosage(text: str) -> str:
     return DOSAGE_PATTERN.sub("", text)
 
 
+@lru_cache(maxsize=NORMALIZATION_CACHE_SIZE)
+def _medication_key(text: str) -> str:
+    return _remove_dosage(_shared_normalize(text)).strip()
+
+
+@lru_cache(maxsize=NORMALIZATION_CACHE_SIZE)
+def _condition_key(text: str) -> str:
+    return _normalize_roman_numerals(_shared_normalize(text)).strip()
+
+
+@lru_cache(maxsize=NORMALIZATION_CACHE_SIZE)
+def _lab_key(text: str) -> str:
+    return _shared_normalize(text)
+
+
 # -----------------------
 # Domain-specific entry points
 # -----------------------
@@ -73,12 +90,8 @@ def normalize_medication_term(text: Optional[str]) -> str:
     if not text:
         return ""
 
-    text = _shared_normalize(text)
-
-    # Medication-specific rules
-    text = _remove_dosage(text)
-
-    return text.strip()
+    # Shared rules + medication-specific dosage stripping
+    return _medication_key(text)
 
 
 def normalize_condition_term(text: Optional[str]) -> str:
@@ -92,12 +105,8 @@ def normalize_condition_term(text: Optional[str]) -> str:
     if not text:
         return ""
 
-    text = _shared_normalize(text)
-
-    # Condition-specific rules
-    text = _normalize_roman_numerals(text)
-
-    return text.strip()
+    # Shared rules + condition-specific roman numerals
+    return _condition_key(text)
 
 
 def normalize_lab_term(text: Optional[str]) -> str:
@@ -114,4 +123,23 @@ def normalize_lab_term(text: Optional[str]) -> str:
     # Labs get ONLY shared normalization
     # No dosage stripping
     # No roman numeral replacement
-    return _shared_normalize(text)
+    return _lab_key(text)
+
+
+# -----------------------
+# Batch entry points
+# -----------------------
+
+def normalize_medication_terms(texts: Iterable[Optional[str]]) -> List[str]:
+    """Normalize many medication names; output order matches input."""
+    return [normalize_medication_term(t) for t in texts]
+
+
+def normalize_condition_terms(texts: Iterable[Optional[str]]) -> List[str]:
+    """Normalize many condition names; output order matches input."""
+    return [normalize_condition_term(t) for t in texts]
+
+
+def normalize_lab_terms(texts: Iterable[Optional[str]]) -> List[str]:
+    """Normalize many lab test names; output order matches input."""
+    return [normalize_lab_term(t) for t in texts]
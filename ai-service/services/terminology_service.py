@@ -1,10 +1,44 @@
 # ai-service/services/terminology_service.py
 
-from typing import Dict, Any, Optional
-
-from services.knowledge_service import lookup_snomed, lookup_icd10, lookup_rxnorm, lookup_loinc
+from typing import Dict, Any, List, Optional
+
+from config import RESOLUTION_CACHE_SIZE, RESOLUTION_CACHE_PATH
+from services.knowledge_service import (
+    lookup_snomed,
+    lookup_icd10,
+    lookup_rxnorm,
+    lookup_loinc,
+    lookup_code,
+    fuzzy_lookup_snomed,
+    fuzzy_lookup_icd10,
+    vocabulary_version,
+    SNOMED_SYSTEM,
+    ICD10_SYSTEM,
+)
+from services.resolution_cache import MISS, ResolutionCache
+from services.terminology_normalization import (
+    normalize_condition_term,
+    normalize_condition_terms,
+    normalize_medication_terms,
+    normalize_lab_terms,
+)
 from services.validation_service import validate_rag_coding_shape
-from rag.rag_search import rag_lookup
+from rag.rag_search import rag_lookup, rag_lookup_batch, index_version
+
+# Conditions recur across notes (hypertension, T2DM, ...) and their RAG
+# fallback is the expensive path, so resolved codings, including
+# "genuinely uncoded", are cached per vocabulary + index version.
+RESOLUTION_CACHE = ResolutionCache(RESOLUTION_CACHE_SIZE, RESOLUTION_CACHE_PATH)
+
+
+# Conditions may only be coded in these systems
+CONDITION_SYSTEMS = (SNOMED_SYSTEM, ICD10_SYSTEM)
+# ...so RAG only searches their passages (short names, as in the index metadata)
+CONDITION_RAG_SYSTEMS = ["snomed", "icd10"]
+
+
+def _cache_version() -> str:
+    return f"{vocabulary_version()}:{index_version()}"
 
 
 def verify_coding_against_vocab(
@@ -13,57 +47,131 @@ def verify_coding_against_vocab(
 ) -> Optional[Dict[str, str]]:
     """
     Verify a RAG-returned coding against authoritative vocabularies.
+
+    Direct (system, code) membership check. Returns the vocabulary's own
+    coding, so the display is authoritative rather than whatever the
+    index metadata said.
     """
+    if coding.get("system") not in CONDITION_SYSTEMS:
+        return None
 
-    display = coding.get("display") or term
+    return lookup_code(coding["system"], coding.get("code"))
 
-    snomed = lookup_snomed(display)
-    if snomed and snomed["code"] == coding["code"]:
-        return coding
 
-    icd10 = lookup_icd10(display)
-    if icd10 and icd10["code"] == coding["code"]:
-        return coding
+def _lookup_condition(term: str) -> Optional[Dict[str, str]]:
+    """
+    Deterministic tiers: exact, then fuzzy (typos), SNOMED before ICD-10.
+    """
+    return (
+        lookup_snomed(term)
+        or lookup_icd10(term)
+        or fuzzy_lookup_snomed(term)
+        or fuzzy_lookup_icd10(term)
+    )
+
+
+def _first_verified(term: str, candidates: List[Dict[str, Any]]) -> Optional[Dict[str, str]]:
+    """
+    First RAG candidate that passes shape validation and vocabulary verification.
+    """
+    for candidate in candidates or []:
+        if not validate_rag_coding_shape(candidate):
+            continue
+
+        verified = verify_coding_against_vocab(term, candidate)
+        if verified:
+            return verified
 
     return None
 
 
+def _as_concept(term: str, coding: Optional[Dict[str, str]]) -> Dict[str, Any]:
+    result: Dict[str, Any] = {"text": term}
+    if coding:
+        # Duplicated terms share a lookup, not a dict
+        result["coding"] = [dict(coding)]
+    return result
+
+
 def resolve_condition(term: str) -> Dict[str, Any]:
     """
     Resolve a condition term into a CodeableConcept-like dict.
     """
 
-    result: Dict[str, Any] = {"text": term}
+    # --------------------------------------------------
+    # 0. Cross-request cache
+    # --------------------------------------------------
+    key = normalize_condition_term(term)
+    version = _cache_version()
+
+    coding = RESOLUTION_CACHE.get("condition", key, version)
+    if coding is not MISS:
+        return _as_concept(term, coding)
+
+    # --------------------------------------------------
+    # 1. Deterministic lookup (authoritative, then fuzzy)
+    # --------------------------------------------------
+    coding = _lookup_condition(term)
 
     # --------------------------------------------------
-    # 1. Deterministic lookup (authoritative)
+    # 2. RAG fallback (paraphrases, candidate generation)
     # --------------------------------------------------
-    snomed = lookup_snomed(term)
-    if snomed:
-        result["coding"] = [snomed]
-        return result
+    if coding is None:
+        coding = _first_verified(term, rag_lookup(term, systems=CONDITION_RAG_SYSTEMS))
 
-    icd10 = lookup_icd10(term)
-    if icd10:
-        result["coding"] = [icd10]
-        return result
+    RESOLUTION_CACHE.put("condition", key, version, coding)
 
     # --------------------------------------------------
-    # 2. RAG fallback (candidate generation)
+    # 3. Honest uncoded fallback (no "coding" key)
     # --------------------------------------------------
-    for candidate in rag_lookup(term) or []:
-        if not validate_rag_coding_shape(candidate):
-            continue
+    return _as_concept(term, coding)
 
-        verified = verify_coding_against_vocab(term, candidate)
-        if verified:
-            result["coding"] = [verified]
-            return result
+
+def resolve_conditions(terms: List[str]) -> List[Dict[str, Any]]:
+    """
+    Batch form of resolve_condition; results follow input order.
+
+    Terms are deduplicated by normalized form, the deterministic tiers
+    run once per distinct term, and every remaining miss goes to RAG in
+    a single rag_lookup_batch call (one embedding request, one search).
+    """
 
     # --------------------------------------------------
-    # 3. Honest uncoded fallback
+    # 1. Deduplicate (first spelling of each key represents it)
     # --------------------------------------------------
-    return result
+    representatives: Dict[str, str] = {}
+    keys = normalize_condition_terms(terms)
+    for term, key in zip(terms, keys):
+        representatives.setdefault(key, term)
+
+    # --------------------------------------------------
+    # 2. Cache, then deterministic lookup for the rest
+    # --------------------------------------------------
+    version = _cache_version()
+    codings: Dict[str, Optional[Dict[str, str]]] = {}
+    computed: List[str] = []
+
+    for key, term in representatives.items():
+        cached = RESOLUTION_CACHE.get("condition", key, version)
+        if cached is not MISS:
+            codings[key] = cached
+        else:
+            codings[key] = _lookup_condition(term)
+            computed.append(key)
+
+    # --------------------------------------------------
+    # 3. One RAG round trip for all remaining misses
+    # --------------------------------------------------
+    misses = [key for key in computed if codings[key] is None and key]
+    if misses:
+        queries = [representatives[key] for key in misses]
+        for key, query, candidates in zip(misses, queries, rag_lookup_batch(queries, systems=CONDITION_RAG_SYSTEMS)):
+            codings[key] = _first_verified(query, candidates)
+
+    for key in computed:
+        RESOLUTION_CACHE.put("condition", key, version, codings[key])
+
+    return [_as_concept(term, codings[key]) for term, key in zip(terms, keys)]
 
 
 def resolve_medication(name: str) -> Optional[Dict[str, str]]:
@@ -73,8 +181,32 @@ def resolve_medication(name: str) -> Optional[Dict[str, str]]:
     return lookup_rxnorm(name)
 
 
+def resolve_medications(names: List[str]) -> List[Optional[Dict[str, str]]]:
+    """
+    Batch form of resolve_medication; one lookup per distinct name.
+    """
+    codings: Dict[str, Optional[Dict[str, str]]] = {}
+    keys = normalize_medication_terms(names)
+    for name, key in zip(names, keys):
+        if key not in codings:
+            codings[key] = lookup_rxnorm(name)
+    return [dict(codings[key]) if codings[key] else None for key in keys]
+
+
 def resolve_lab(test: str) -> Optional[Dict[str, str]]:
     """
     Resolve lab test via LOINC.
     """
     return lookup_loinc(test)
+
+
+def resolve_labs(tests: List[str]) -> List[Optional[Dict[str, str]]]:
+    """
+    Batch form of resolve_lab; one lookup per distinct test name.
+    """
+    codings: Dict[str, Optional[Dict[str, str]]] = {}
+    keys = normalize_lab_terms(tests)
+    for test, key in zip(tests, keys):
+        if key not in codings:
+            codings[key] = lookup_loinc(test)
+    return [dict(codings[key]) if codings[key] else None for key in keys]
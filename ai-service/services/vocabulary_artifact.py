@@ -0,0 +1,327 @@
+# ai-service/services/vocabulary_artifact.py
+"""
+Read-only, memory-mapped vocabulary artifact.
+
+Compiles the vocabularies into one flat file that every worker maps
+with mmap. The OS page cache holds a single copy shared by all
+uvicorn/gunicorn workers, and opening it costs a header read instead
+of parsing CSVs or warming SQLite.
+
+Layout (little-endian, every section 8-byte aligned):
+
+    header    magic, counts, section offsets
+    strings   UTF-8 blob referenced by (offset, length)
+    concepts  system, code ref, display ref         (one per concept)
+    keys      hash, key ref, concept index          (one per normalized key)
+    table     open-addressing slots → key index, -1 when empty
+    codes     open-addressing slots → concept index, keyed on (system, code)
+
+Usage (from ai-service/):
+
+    python -m services.vocabulary_artifact --out data/vocab.bin [--from-store data/vocab.sqlite]
+
+Set VOCAB_ARTIFACT_PATH to the output file to make knowledge_service use it.
+"""
+
+import argparse
+import hashlib
+import mmap
+import sqlite3
+import struct
+import sys
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b"VOCABv02"
+# magic, n_concepts, n_keys, n_slots, n_code_slots, 5 offsets
+HEADER = struct.Struct("<8sQQQQQQQQQ")
+
+SYSTEMS = ["snomed", "icd10", "rxnorm", "loinc"]
+SYSTEM_IDS = {name: i for i, name in enumerate(SYSTEMS)}
+
+CONCEPT_DTYPE = np.dtype([
+    ("system", "<u4"),
+    ("code_len", "<u4"),
+    ("code_off", "<u8"),
+    ("display_len", "<u4"),
+    ("pad", "<u4"),
+    ("display_off", "<u8"),
+])
+
+KEY_DTYPE = np.dtype([
+    ("hash", "<u8"),
+    ("key_off", "<u8"),
+    ("key_len", "<u4"),
+    ("concept", "<u4"),
+])
+
+# (system, normalized key, code, display), highest priority first
+Entry = Tuple[str, str, str, str]
+
+
+def key_hash(system: str, key: str) -> int:
+    """Stable across processes, unlike hash()."""
+    digest = hashlib.blake2b(
+        f"{system}\0{key}".encode("utf-8"), digest_size=8
+    ).digest()
+    return int.from_bytes(digest, "little")
+
+
+def code_hash(system: str, code: str) -> int:
+    """Hash for the (system, code) table; a separate domain from key_hash."""
+    return key_hash(system, f"\1{code}")
+
+
+def _hash_table(hashes: List[int]) -> np.ndarray:
+    """Open-addressing table of row indexes, load factor <= 0.5 for short probe chains."""
+    n_slots = 1
+    while n_slots < 2 * max(len(hashes), 1):
+        n_slots <<= 1
+    table = np.full(n_slots, -1, dtype="<i4")
+    mask = n_slots - 1
+    for i, h in enumerate(hashes):
+        slot = h & mask
+        while table[slot] != -1:
+            slot = (slot + 1) & mask
+        table[slot] = i
+    return table
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+# =========================================================
+# Compile
+# =========================================================
+
+def compile_artifact(path: str, entries: Iterable[Entry]) -> Dict[str, int]:
+    """
+    Write an artifact from entries. The first entry for a (system, key)
+    wins, matching the first-match semantics of the CSV lookups.
+    """
+    strings = bytearray()
+    string_refs: Dict[str, Tuple[int, int]] = {}
+
+    def intern(value: str) -> Tuple[int, int]:
+        ref = string_refs.get(value)
+        if ref is None:
+            raw = value.encode("utf-8")
+            ref = (len(strings), len(raw))
+            strings.extend(raw)
+            string_refs[value] = ref
+        return ref
+
+    concept_ids: Dict[Tuple[str, str], int] = {}
+    concepts: List[tuple] = []
+    code_hashes: List[int] = []
+    keys: List[tuple] = []
+    seen_keys = set()
+
+    for system, key, code, display in entries:
+        if not key or (system, key) in seen_keys:
+            continue
+        seen_keys.add((system, key))
+
+        concept = concept_ids.get((system, code))
+        if concept is None:
+            concept = len(concepts)
+            concept_ids[(system, code)] = concept
+            code_off, code_len = intern(code)
+            display_off, display_len = intern(display)
+            concepts.append((SYSTEM_IDS[system], code_len, code_off, display_len, 0, display_off))
+            code_hashes.append(code_hash(system, code))
+
+        key_off, key_len = intern(key)
+        keys.append((key_hash(system, key), key_off, key_len, concept))
+
+    concept_arr = np.array(concepts, dtype=CONCEPT_DTYPE)
+    key_arr = np.array(keys, dtype=KEY_DTYPE)
+
+    table = _hash_table(key_arr["hash"].tolist())
+    code_table = _hash_table(code_hashes)
+
+    strings_off = _align(HEADER.size)
+    concepts_off = _align(strings_off + len(strings))
+    keys_off = _align(concepts_off + concept_arr.nbytes)
+    table_off = _align(keys_off + key_arr.nbytes)
+    code_table_off = _align(table_off + table.nbytes)
+
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(
+            MAGIC, len(concepts), len(keys), len(table), len(code_table),
+            strings_off, concepts_off, keys_off, table_off, code_table_off,
+        ))
+        for offset, payload in (
+            (strings_off, bytes(strings)),
+            (concepts_off, concept_arr.tobytes()),
+            (keys_off, key_arr.tobytes()),
+            (table_off, table.tobytes()),
+            (code_table_off, code_table.tobytes()),
+        ):
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(payload)
+
+    return {
+        "concepts": len(concepts),
+        "keys": len(keys),
+        "bytes": code_table_off + code_table.nbytes,
+    }
+
+
+def entries_from_indexes() -> Iterator[Entry]:
+    """Entries from the demo CSV indexes (knowledge_service.load_csv_tables)."""
+    from services import knowledge_service
+
+    _rows, indexes, _codes = knowledge_service.load_csv_tables()
+    for system, index in indexes.items():
+        for key, coding in index.items():
+            yield system, key, coding["code"], coding["display"]
+
+
+def entries_from_store(store_path: str) -> Iterator[Entry]:
+    """Entries from a SQLite store built by terminology_loaders."""
+    conn = sqlite3.connect(f"file:{store_path}?mode=ro", uri=True)
+    try:
+        yield from conn.execute("""
+            SELECT t.system, t.key, t.code, c.display
+            FROM terms t
+            JOIN concepts c ON c.system = t.system AND c.code = t.code
+        """)
+    finally:
+        conn.close()
+
+
+# =========================================================
+# Read
+# =========================================================
+
+class VocabularyArtifact:
+    """
+    Zero-copy reader. All arrays are NumPy views over the shared mapping;
+    nothing is decoded until a lookup hits.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, n_concepts, n_keys, n_slots, n_code_slots,
+         self._strings_off, concepts_off, keys_off, table_off, code_table_off) = HEADER.unpack_from(self._mm, 0)
+
+        if magic != MAGIC:
+            raise ValueError(f"Not a vocabulary artifact: {path}")
+
+        self.path = path
+        self._concepts = np.frombuffer(self._mm, CONCEPT_DTYPE, n_concepts, concepts_off)
+        self._keys = np.frombuffer(self._mm, KEY_DTYPE, n_keys, keys_off)
+        self._table = np.frombuffer(self._mm, "<i4", n_slots, table_off)
+        self._mask = n_slots - 1
+        self._code_table = np.frombuffer(self._mm, "<i4", n_code_slots, code_table_off)
+        self._code_mask = n_code_slots - 1
+
+    def _string(self, offset: int, length: int) -> str:
+        start = self._strings_off + offset
+        return self._mm[start:start + length].decode("utf-8")
+
+    def _concept(self, index: int) -> Tuple[str, str]:
+        c = self._concepts[index]
+        return (
+            self._string(int(c["code_off"]), int(c["code_len"])),
+            self._string(int(c["display_off"]), int(c["display_len"])),
+        )
+
+    def lookup(self, system: str, key: str) -> Optional[Tuple[str, str]]:
+        """Return (code, display) for a normalized key, or None."""
+        if not key or system not in SYSTEM_IDS:
+            return None
+
+        h = key_hash(system, key)
+        raw = key.encode("utf-8")
+        slot = h & self._mask
+
+        while True:
+            i = int(self._table[slot])
+            if i == -1:
+                return None
+
+            k = self._keys[i]
+            if int(k["hash"]) == h and int(k["key_len"]) == len(raw):
+                start = self._strings_off + int(k["key_off"])
+                if self._mm[start:start + len(raw)] == raw:
+                    return self._concept(int(k["concept"]))
+
+            slot = (slot + 1) & self._mask
+
+    def concept(self, system: str, code: str) -> Optional[Tuple[str, str]]:
+        """Return (code, display) if the code exists in the system, else None."""
+        if not code or system not in SYSTEM_IDS:
+            return None
+
+        system_id = SYSTEM_IDS[system]
+        raw = code.encode("utf-8")
+        slot = code_hash(system, code) & self._code_mask
+
+        while True:
+            i = int(self._code_table[slot])
+            if i == -1:
+                return None
+
+            c = self._concepts[i]
+            if int(c["system"]) == system_id and int(c["code_len"]) == len(raw):
+                start = self._strings_off + int(c["code_off"])
+                if self._mm[start:start + len(raw)] == raw:
+                    return self._concept(i)
+
+            slot = (slot + 1) & self._code_mask
+
+    def keys(self, system: str) -> Iterator[str]:
+        """Every normalized key of a system, in compile order."""
+        in_system = self._concepts["system"][self._keys["concept"]] == SYSTEM_IDS[system]
+        selected = self._keys[in_system]
+        for offset, length in zip(selected["key_off"].tolist(), selected["key_len"].tolist()):
+            yield self._string(offset, length)
+
+    def concepts(self, system: str) -> Iterator[Tuple[str, str, List[str]]]:
+        """(code, display, keys) for every concept of a system, in compile order."""
+        by_concept = np.argsort(self._keys["concept"], kind="stable")
+        owners = self._keys["concept"][by_concept]
+        selected = np.flatnonzero(self._concepts["system"] == SYSTEM_IDS[system])
+        starts = np.searchsorted(owners, selected, "left").tolist()
+        ends = np.searchsorted(owners, selected, "right").tolist()
+
+        for index, start, end in zip(selected.tolist(), starts, ends):
+            code, display = self._concept(index)
+            keys = [
+                self._string(int(self._keys[k]["key_off"]), int(self._keys[k]["key_len"]))
+                for k in by_concept[start:end].tolist()
+            ]
+            yield code, display, keys
+
+    def counts(self) -> Dict[str, int]:
+        ids, totals = np.unique(self._concepts["system"], return_counts=True)
+        return {SYSTEMS[int(i)]: int(n) for i, n in zip(ids, totals)}
+
+
+# =========================================================
+# CLI
+# =========================================================
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Compile the memory-mapped vocabulary artifact.")
+    parser.add_argument("--out", required=True, help="Output artifact path")
+    parser.add_argument("--from-store", help="SQLite store from terminology_loaders (default: data/*.csv)")
+    args = parser.parse_args(argv)
+
+    entries = entries_from_store(args.from_store) if args.from_store else entries_from_indexes()
+    stats = compile_artifact(args.out, entries)
+
+    print(
+        f"Wrote {args.out}: {stats['concepts']:,} concepts, "
+        f"{stats['keys']:,} keys, {stats['bytes'] / 1e6:.1f} MB"
+    )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,180 @@
+# ai-service/services/vocabulary_store.py
+
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# ---------------------------------------------------------
+# Compact on-disk vocabulary store (SQLite)
+#
+# terms:    (system, key) -> code      one row per normalized surface form
+# concepts: (system, code) -> display
+#
+# Both tables are WITHOUT ROWID, so the primary key *is* the
+# clustered index and every lookup is a covering index probe.
+# ---------------------------------------------------------
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS concepts (
+    system  TEXT NOT NULL,
+    code    TEXT NOT NULL,
+    display TEXT NOT NULL,
+    PRIMARY KEY (system, code)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS terms (
+    system TEXT NOT NULL,
+    key    TEXT NOT NULL,
+    rank   INTEGER NOT NULL,
+    code   TEXT NOT NULL,
+    PRIMARY KEY (system, key)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# Lower rank wins; among equal ranks the first row written wins.
+UPSERT_TERM_SQL = """
+INSERT INTO terms (system, key, rank, code) VALUES (?, ?, ?, ?)
+ON CONFLICT (system, key) DO UPDATE
+    SET rank = excluded.rank, code = excluded.code
+    WHERE excluded.rank < terms.rank
+"""
+
+UPSERT_CONCEPT_SQL = """
+INSERT INTO concepts (system, code, display) VALUES (?, ?, ?)
+ON CONFLICT (system, code) DO NOTHING
+"""
+
+LOOKUP_SQL = """
+SELECT t.code, c.display
+FROM terms t
+JOIN concepts c ON c.system = t.system AND c.code = t.code
+WHERE t.system = ? AND t.key = ?
+"""
+
+BATCH_SIZE = 10_000
+
+
+class VocabularyWriter:
+    """
+    Batched writer used by the release loaders.
+
+    Rows are buffered and flushed with executemany so memory stays
+    bounded by BATCH_SIZE regardless of release size.
+    """
+
+    def __init__(self, path: str):
+        if os.path.exists(path):
+            os.remove(path)
+
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(
+            "PRAGMA journal_mode = OFF; PRAGMA synchronous = OFF;" + SCHEMA
+        )
+        self._concepts = []
+        self._terms = []
+
+    def add_concept(self, system: str, code: str, display: str) -> None:
+        self._concepts.append((system, code, display))
+        if len(self._concepts) >= BATCH_SIZE:
+            self.flush()
+
+    def add_term(self, system: str, key: str, rank: int, code: str) -> None:
+        if not key:
+            return
+        self._terms.append((system, key, rank, code))
+        if len(self._terms) >= BATCH_SIZE:
+            self.flush()
+
+    def set_meta(self, key: str, value: str) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+        )
+
+    def flush(self) -> None:
+        if self._concepts:
+            self.conn.executemany(UPSERT_CONCEPT_SQL, self._concepts)
+            self._concepts = []
+        if self._terms:
+            self.conn.executemany(UPSERT_TERM_SQL, self._terms)
+            self._terms = []
+
+    def close(self) -> None:
+        self.flush()
+        self.conn.commit()
+        self.conn.execute("ANALYZE")
+        self.conn.execute("VACUUM")
+        self.conn.close()
+
+
+class VocabularyStore:
+    """
+    Read-only view over a store written by VocabularyWriter.
+
+    SQLite connections can't be shared across threads, and FastAPI runs
+    sync routes in a threadpool, so each thread opens its own read-only
+    connection on first use.
+    """
+
+    def __init__(self, path: str):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Vocabulary store not found: {path}")
+
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            self._local.conn = conn
+        return conn
+
+    def lookup(self, system: str, key: str) -> Optional[Tuple[str, str]]:
+        """Return (code, display) for a normalized key, or None."""
+        if not key:
+            return None
+        return self._conn().execute(LOOKUP_SQL, (system, key)).fetchone()
+
+    def concept(self, system: str, code: str) -> Optional[Tuple[str, str]]:
+        """Return (code, display) if the code exists in the system, else None."""
+        if not code:
+            return None
+        return self._conn().execute(
+            "SELECT code, display FROM concepts WHERE system = ? AND code = ?",
+            (system, code),
+        ).fetchone()
+
+    def keys(self, system: str) -> Iterator[str]:
+        """Every normalized key of a system (used to build fuzzy indexes)."""
+        for (key,) in self._conn().execute(
+            "SELECT key FROM terms WHERE system = ?", (system,)
+        ):
+            yield key
+
+    def concepts(self, system: str) -> Iterator[Tuple[str, str, List[str]]]:
+        """(code, display, keys) for every concept of a system, streamed."""
+        rows = self._conn().execute("""
+            SELECT c.code, c.display, group_concat(t.key, char(31))
+            FROM concepts c
+            LEFT JOIN terms t ON t.system = c.system AND t.code = c.code
+            WHERE c.system = ?
+            GROUP BY c.code
+        """, (system,))
+        for code, display, keys in rows:
+            yield code, display, keys.split("\x1f") if keys else []
+
+    def counts(self) -> Dict[str, int]:
+        rows: Iterable[Tuple[str, int]] = self._conn().execute(
+            "SELECT system, COUNT(*) FROM concepts GROUP BY system"
+        )
+        return dict(rows)
+
+    def meta(self) -> Dict[str, str]:
+        return dict(self._conn().execute("SELECT key, value FROM meta"))
@@ -0,0 +1,35 @@
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from rag import build_index, index_updates, rag_search
+from rag.rag_search import RagIndex
+
+
+def fake_embed(texts, backend=None):
+    # Same text, same vector: a passage's own text is its nearest neighbour
+    return np.array([
+        np.random.default_rng(sum(map(ord, t)) * 31 + len(t)).standard_normal(16) for t in texts
+    ], dtype=np.float32)
+
+
+@pytest.fixture
+def offline_embeddings():
+    """Send the RAG modules' embedding calls to fake_embed; yields the query-side mock."""
+    with patch.object(build_index, "embed_text", fake_embed), \
+            patch.object(index_updates, "embed_text", fake_embed), \
+            patch.object(rag_search, "embed_text", side_effect=fake_embed) as embed:
+        yield embed
+
+
+@pytest.fixture
+def make_index(tmp_path, offline_embeddings):
+    """make(index_type, params) builds the demo vocabulary into tmp_path and returns its RagIndex."""
+    def make(index_type="flat", params=None):
+        work_dir = str(tmp_path / "build")
+        stats = build_index.embed_shards(build_index.iter_passages(), work_dir)
+        index_path, meta_path = str(tmp_path / "faiss.index"), str(tmp_path / "meta.bin")
+        build_index.assemble_index(stats["shards"], work_dir, index_path, meta_path, index_type, params)
+        return RagIndex(index_path, meta_path)
+    return make
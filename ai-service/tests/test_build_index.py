@@ -0,0 +1,90 @@
+from unittest.mock import patch
+
+import faiss
+import numpy as np
+import pytest
+
+from rag import build_index
+from rag.index_types import concept_id
+from rag.metadata_store import open_metadata
+from services import knowledge_service
+from services.knowledge_service import VocabularySnapshot
+from services.terminology_loaders import load_demo_csvs
+from services.vocabulary_artifact import VocabularyArtifact, compile_artifact, entries_from_store
+from services.vocabulary_store import VocabularyStore, VocabularyWriter
+
+
+def fake_embed(texts, backend=None):
+    return np.array([[len(t), i] for i, t in enumerate(texts)], dtype=np.float32)
+
+
+def test_interrupted_build_resumes_from_checkpoints(tmp_path):
+    work_dir = str(tmp_path / "build")
+    calls = []
+
+    def flaky_embed(texts, backend=None):
+        calls.append(len(texts))
+        if len(calls) == 4:
+            raise RuntimeError("provider outage")
+        return fake_embed(texts)
+
+    with patch.object(build_index, "embed_text", flaky_embed), \
+            patch.object(build_index._embed_batch.retry, "stop", lambda _: True):
+        with pytest.raises(RuntimeError):
+            build_index.embed_shards(build_index.iter_passages(), work_dir, batch_size=4, workers=1, shard_size=8)
+
+    # First shard (two batches) was checkpointed before the failure
+    with patch.object(build_index, "embed_text", fake_embed):
+        stats = build_index.embed_shards(build_index.iter_passages(), work_dir, batch_size=4, workers=2, shard_size=8)
+
+    assert stats["resumed"] == 8
+    assert stats["embedded"] == len(build_index.build_passages()) - 8
+
+    index_path, meta_path = str(tmp_path / "faiss.index"), str(tmp_path / "meta.bin")
+    total = build_index.assemble_index(stats["shards"], work_dir, index_path, meta_path)
+
+    assert list(open_metadata(meta_path)) == [
+        {**passage, "id": concept_id(passage["system"], passage["code"])}
+        for passage in build_index.build_passages()
+    ]
+    assert faiss.read_index(index_path).ntotal == total
+
+
+@pytest.mark.parametrize("index_type, params, check", [
+    ("hnsw", {"M": 8, "efSearch": 16}, lambda index: faiss.downcast_index(index.index).hnsw.efSearch == 16),
+    ("ivf_flat", {"nprobe": 4}, lambda index: faiss.extract_index_ivf(index).nprobe == 1),
+    ("flat", {"storage": "sq8"}, lambda index: faiss.downcast_index(index.index).code_size == index.d),
+    ("hnsw", {"M": 8, "storage": "fp16"}, lambda index: isinstance(faiss.downcast_index(index.index), faiss.IndexHNSWSQ)),
+])
+def test_index_type_is_recorded_and_applied_on_load(make_index, index_type, params, check):
+    rag_index = make_index(index_type, params)
+    assert rag_index.info["type"] == index_type
+    assert check(rag_index.index)
+
+    # 20 passages can only train one centroid; nprobe is capped to match
+    if index_type == "ivf_flat":
+        assert rag_index.info["params"] == {"nlist": 1, "nprobe": 1, "storage": "float32"}
+
+
+def test_passages_come_from_the_configured_backend(tmp_path):
+    store_path = str(tmp_path / "vocab.sqlite")
+    writer = VocabularyWriter(store_path)
+    load_demo_csvs(writer)
+    writer.add_concept("snomed", "999001", "store-only condition")
+    writer.add_term("snomed", "store-only condition", 0, "999001")
+    writer.close()
+    artifact_path = str(tmp_path / "vocab.bin")
+    compile_artifact(artifact_path, entries_from_store(store_path))
+
+    found = {}
+    for backend in (VocabularyStore(store_path), VocabularyArtifact(artifact_path)):
+        with knowledge_service.pinned_vocabulary(VocabularySnapshot(backend)):
+            passages = {(p["system"], p["code"]): p for p in build_index.iter_passages()}
+        found[type(backend).__name__] = passages
+
+        assert ("snomed", "999001") in passages
+        htn = passages[("snomed", "271327008")]
+        assert htn["display"] == "essential hypertension"
+        assert "htn" in htn["text"] and htn["text"].startswith("SNOMED term: essential hypertension")
+
+    assert found["VocabularyStore"] == found["VocabularyArtifact"]
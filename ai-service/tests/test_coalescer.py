@@ -0,0 +1,154 @@
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from rag import rag_search
+from rag.coalescer import BatchCoalescer
+from rag.rag_search import pinned_index
+
+
+def run_concurrently(n, target):
+    barrier = threading.Barrier(n)
+    results = [None] * n
+
+    def worker(i):
+        barrier.wait()
+        results[i] = target(i)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def hold_first_call(fn):
+    """fn whose first call sets started, then blocks until release is set."""
+    started, release = threading.Event(), threading.Event()
+
+    def held(*args):
+        if not started.is_set():
+            started.set()
+            assert release.wait(5)
+        return fn(*args)
+
+    return held, started, release
+
+
+def busy_caller(coalescer, key, items, started):
+    """
+    A caller whose batch is still running, so the next ones expect
+    company and wait out the window (a lone caller would run at once).
+    """
+    thread = threading.Thread(target=coalescer.submit, args=(key, items))
+    thread.start()
+    assert started.wait(5)
+    return thread
+
+
+def test_concurrent_callers_share_one_call():
+    calls = []
+
+    def double(factor, items):
+        calls.append(list(items))
+        return [x * factor for x in items]
+
+    held, started, release = hold_first_call(double)
+    coalescer = BatchCoalescer(held, window_ms=200, max_batch=100)
+    busy = busy_caller(coalescer, (2,), [-1], started)
+    results = run_concurrently(8, lambda i: coalescer.submit((2,), [i, i + 100]))
+    release.set()
+    busy.join()
+
+    assert results == [[2 * i, 2 * (i + 100)] for i in range(8)]
+    # The held batch finishes last
+    assert len(calls) == 2 and calls[1] == [-1]
+    assert sorted(calls[0]) == sorted(x for i in range(8) for x in (i, i + 100))
+    assert coalescer.stats()["callers"] == 9
+
+
+def test_lone_caller_does_not_wait_the_window():
+    coalescer = BatchCoalescer(lambda items: list(items), window_ms=60_000)
+    started = time.perf_counter()
+    assert coalescer.submit((), [1, 2]) == [1, 2]
+    assert time.perf_counter() - started < 5
+
+
+def test_full_batch_flushes_before_the_window():
+    held, started, release = hold_first_call(lambda items: list(items))
+    coalescer = BatchCoalescer(held, window_ms=60_000, max_batch=4)
+    busy = busy_caller(coalescer, (), [-1], started)
+    results = run_concurrently(4, lambda i: coalescer.submit((), [i]))
+    release.set()
+    busy.join()
+    assert results == [[0], [1], [2], [3]]
+
+
+def test_large_submissions_are_split_into_full_batches():
+    calls = []
+
+    def echo(items):
+        calls.append(list(items))
+        return list(items)
+
+    coalescer = BatchCoalescer(echo, window_ms=60_000, max_batch=4)
+    assert coalescer.submit((), list(range(10))) == list(range(10))
+    assert calls == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+
+    # An open batch without room for the next chunk is sent as it is
+    calls.clear()
+    held, started, release = hold_first_call(echo)
+    coalescer = BatchCoalescer(held, window_ms=300, max_batch=4)
+    busy = busy_caller(coalescer, (), [-1], started)
+    partial = threading.Thread(target=coalescer.submit, args=((), [100, 101]))
+    partial.start()
+    time.sleep(0.05)
+    assert coalescer.submit((), list(range(6))) == list(range(6))
+    release.set()
+    busy.join()
+    partial.join()
+
+    assert [100, 101] in calls and all(len(c) <= 4 for c in calls)
+    assert sorted(x for c in calls for x in c) == [-1, *range(6), 100, 101]
+
+
+def test_errors_reach_every_caller():
+    def fail(items):
+        raise RuntimeError("embeddings down")
+
+    coalescer = BatchCoalescer(fail, window_ms=100)
+
+    def call(i):
+        with pytest.raises(RuntimeError, match="embeddings down"):
+            coalescer.submit((), [i])
+        return True
+
+    assert all(run_concurrently(4, call))
+
+
+def test_concurrent_rag_lookups_embed_once(make_index, offline_embeddings):
+    rag_index = make_index("flat")
+
+    held, started, release = hold_first_call(rag_search._vector_rankings)
+    coalescer = BatchCoalescer(held, window_ms=200)
+    queries = [f"sugar disease {i}" for i in range(7)]
+
+    def lookup(i):
+        with pinned_index(rag_index):
+            return rag_search.rag_lookup(queries[i], systems=["snomed", "icd10"])
+
+    with patch.object(rag_search, "COALESCER", coalescer):
+        busy = threading.Thread(target=lookup, args=(0,))
+        busy.start()
+        assert started.wait(5)
+        results = run_concurrently(6, lambda i: lookup(i + 1))
+        release.set()
+        busy.join()
+
+    # One embedding request for the six concurrent lookups, one for the busy one
+    batches = sorted(sorted(c.args[0]) for c in offline_embeddings.call_args_list)
+    assert batches == [[queries[0]], sorted(queries[1:])]
+    assert all(len(r) == 3 for r in results)
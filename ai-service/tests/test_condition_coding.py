@@ -1,7 +1,23 @@
 from unittest.mock import patch
 
-from services.terminology_service import resolve_condition
+import pytest
+
+from services.terminology_service import (
+    RESOLUTION_CACHE,
+    resolve_condition,
+    resolve_conditions,
+    verify_coding_against_vocab,
+)
 from services.knowledge_service import lookup_snomed
+from services.resolution_cache import MISS, ResolutionCache
+
+
+@pytest.fixture(autouse=True)
+def clear_resolution_cache():
+    """Each test mocks RAG differently; never serve another test's result."""
+    RESOLUTION_CACHE.clear()
+    yield
+    RESOLUTION_CACHE.clear()
 
 
 def extract_codes(result):
@@ -30,14 +46,42 @@ def test_authoritative_lookup_short_circuits_rag():
     mock_rag.assert_not_called()
 
 
+def test_fuzzy_lookup_catches_typos_without_rag():
+    """
+    GIVEN a misspelled condition within the edit budget
+    WHEN resolve_condition is called
+    THEN the fuzzy tier returns the SNOMED code
+    AND RAG is never invoked
+    """
+    term = "typ 2 diabtes"  # intentionally malformed
+
+    with patch("services.terminology_service.rag_lookup") as mock_rag:
+        result = resolve_condition(term)
+
+    assert "44054006" in extract_codes(result)
+    mock_rag.assert_not_called()
+
+
+def test_fuzzy_lookup_never_crosses_numbers():
+    """
+    GIVEN a condition one edit away from a coded one but with a different number
+    WHEN resolve_condition is called
+    THEN the fuzzy tier does not match it
+    """
+    with patch("services.terminology_service.rag_lookup", return_value=[]):
+        result = resolve_condition("type 1 diabetes")
+
+    assert "coding" not in result
+
+
 def test_rag_used_only_when_csv_lookup_fails():
     """
-    GIVEN a malformed condition that does NOT exist in CSV
+    GIVEN a paraphrased condition that neither exact nor fuzzy lookup can match
     WHEN resolve_condition is called
     THEN RAG is used as a fallback
     AND the verified SNOMED code is returned
     """
-    term = "typ 2 diabtes"  # intentionally malformed
+    term = "sugar disease"  # paraphrase, not a typo
 
     fake_rag_result = [{
         "system": "http://snomed.info/sct",
@@ -58,13 +102,13 @@ def test_rag_used_only_when_csv_lookup_fails():
 
 def test_invalid_rag_code_is_rejected():
     """
-    GIVEN a malformed condition
+    GIVEN a paraphrased condition
     AND RAG returns a coding with an invalid SNOMED code
     WHEN resolve_condition is called
     THEN the invalid RAG code is rejected
     AND the condition remains uncoded
     """
-    term = "typ 2 diabtes"
+    term = "sugar disease"
 
     invalid_rag_result = [{
         "system": "http://snomed.info/sct",
@@ -79,3 +123,115 @@ def test_invalid_rag_code_is_rejected():
         result = resolve_condition(term)
 
     assert "coding" not in result
+
+
+def test_rag_codes_verified_by_system_and_code():
+    """
+    GIVEN RAG candidates
+    WHEN they are verified
+    THEN membership is checked by (system, code), not by display text
+    AND the vocabulary's own display is returned
+    """
+    verified = verify_coding_against_vocab("sugar disease", {
+        "system": "http://hl7.org/fhir/sid/icd-10-cm",
+        "code": "E11.9",
+        "display": "some other wording",
+    })
+    assert verified == {
+        "system": "http://hl7.org/fhir/sid/icd-10-cm",
+        "code": "E11.9",
+        "display": "type 2 diabetes mellitus without complications",
+    }
+
+    # Real code, wrong system
+    assert verify_coding_against_vocab("sugar disease", {
+        "system": "http://snomed.info/sct",
+        "code": "E11.9",
+        "display": "type 2 diabetes mellitus",
+    }) is None
+
+    # Conditions are never coded as medications
+    assert verify_coding_against_vocab("metformin", {
+        "system": "http://www.nlm.nih.gov/research/umls/rxnorm",
+        "code": "860975",
+        "display": "metformin",
+    }) is None
+
+
+def test_batch_resolution_dedupes_and_makes_one_rag_call():
+    """
+    GIVEN a batch with exact, typo, duplicate and paraphrased conditions
+    WHEN resolve_conditions is called
+    THEN results follow input order
+    AND all distinct RAG misses go out in a single batched call
+    """
+    terms = ["HTN", "typ 2 diabtes", "sugar disease", "Sugar disease!", "chest tightness"]
+
+    fake_batch = [
+        [{"system": "http://snomed.info/sct", "code": "44054006", "display": "Type 2 diabetes"}],
+        [],
+    ]
+
+    with patch(
+        "services.terminology_service.rag_lookup_batch",
+        return_value=fake_batch,
+    ) as mock_batch:
+        results = resolve_conditions(terms)
+
+    mock_batch.assert_called_once_with(
+        ["sugar disease", "chest tightness"], systems=["snomed", "icd10"]
+    )
+
+    assert [r["text"] for r in results] == terms
+    assert extract_codes(results[0]) == ["271327008"]
+    assert extract_codes(results[1]) == ["44054006"]
+    assert extract_codes(results[2]) == ["44054006"]
+    assert extract_codes(results[3]) == ["44054006"]
+    assert "coding" not in results[4]
+
+
+def test_repeated_conditions_are_served_from_cache():
+    """
+    GIVEN a paraphrase resolved once through RAG
+    WHEN the same condition (any spelling variant) is resolved again
+    THEN RAG is not called a second time
+    AND uncoded results are cached too
+    """
+    fake_rag_result = [{
+        "system": "http://snomed.info/sct",
+        "code": "44054006",
+        "display": "Type 2 diabetes",
+    }]
+
+    with patch(
+        "services.terminology_service.rag_lookup",
+        return_value=fake_rag_result,
+    ) as mock_rag:
+        first = resolve_condition("sugar disease")
+        second = resolve_condition("Sugar Disease")
+
+    assert mock_rag.call_count == 1
+    assert extract_codes(first) == extract_codes(second) == ["44054006"]
+    assert second["text"] == "Sugar Disease"
+
+    with patch("services.terminology_service.rag_lookup", return_value=[]) as mock_rag:
+        resolve_condition("chest tightness")
+        resolve_conditions(["chest tightness"])
+
+    assert mock_rag.call_count == 1
+    assert RESOLUTION_CACHE.stats()["hits"] == 2
+
+
+def test_resolution_cache_versioning_and_persistence(tmp_path):
+    path = str(tmp_path / "resolutions.sqlite")
+    cache = ResolutionCache(max_entries=1, persist_path=path)
+
+    cache.put("condition", "htn", "v1", {"code": "271327008"})
+    cache.put("condition", "gibberish", "v1", None)
+
+    assert cache.get("condition", "htn", "v2") is MISS
+    assert cache.get("condition", "gibberish", "v1") is None
+
+    restarted = ResolutionCache(persist_path=path)
+    assert restarted.get("condition", "htn", "v1") == {"code": "271327008"}
+    assert restarted.stats()["disk_hits"] == 1
@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import numpy as np
+
+from config import client
+from utils import embeddings
+from utils.embedding_cache import EmbeddingCache
+
+
+def fake_response(texts):
+    return SimpleNamespace(data=[
+        SimpleNamespace(embedding=[float(len(t)), float(i)]) for i, t in enumerate(texts)
+    ])
+
+
+def test_only_misses_are_embedded_in_one_call(tmp_path):
+    cache = EmbeddingCache(persist_path=str(tmp_path / "emb.sqlite"))
+
+    with patch.object(embeddings, "EMBEDDING_CACHE", cache), patch.object(
+        client.embeddings, "create",
+        side_effect=lambda model, input: fake_response(input),
+    ) as create:
+        first = embeddings.embed_text(["asthma", "gout", "asthma"])
+        assert create.call_count == 1
+        assert create.call_args.kwargs["input"] == ["asthma", "gout"]
+        assert np.array_equal(first[0], first[2])
+
+        again = embeddings.embed_text(["gout", "asthma", "anemia"])
+        assert create.call_count == 2
+        assert create.call_args.kwargs["input"] == ["anemia"]
+        assert np.array_equal(again[0], first[1])
+
+        embeddings.embed_text("asthma")
+        assert create.call_count == 2
+
+
+def test_disk_tier_survives_restart_and_is_keyed_by_model(tmp_path):
+    path = str(tmp_path / "emb.sqlite")
+    EmbeddingCache(persist_path=path).put_many("m1", ["asthma"], np.ones((1, 4)))
+
+    restarted = EmbeddingCache(persist_path=path)
+    vector, = restarted.get_many("m1", ["asthma"])
+    assert vector.dtype == np.float32 and vector.tolist() == [1.0] * 4
+    assert restarted.stats()["disk_hits"] == 1
+
+    assert restarted.get_many("m2", ["asthma"]) == [None]
+
+
+def test_shortened_openai_embeddings_are_a_separate_space():
+    from utils.embedding_backends import OpenAIEmbeddings
+
+    backend = OpenAIEmbeddings("text-embedding-3-small", dimensions=512)
+    assert backend.name == "text-embedding-3-small-512d"
+
+    with patch.object(
+        client.embeddings, "create",
+        side_effect=lambda model, input, **kwargs: fake_response(input),
+    ) as create:
+        backend.embed(["asthma"])
+    assert create.call_args.kwargs["dimensions"] == 512
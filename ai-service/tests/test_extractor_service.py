@@ -28,4 +28,16 @@ def test_extractor_valid_json():
     assert result["patient"]["name"] == "John"
     assert result["conditions"] == ["diabetes"]
 
-    
\ No newline at end of file
+
+def test_async_extractor_repairs_invalid_json():
+    import asyncio
+    from unittest.mock import AsyncMock
+    from services.extractor_service import extract_entities_async
+
+    replies = AsyncMock(side_effect=["not json", '{"conditions": ["asthma"]}'])
+    with patch("services.extractor_service.call_llm_async", replies):
+        result = asyncio.run(extract_entities_async("test clinical note"))
+
+    assert replies.await_count == 2
+    assert result["conditions"] == ["asthma"]
+    assert result["medications"] == [] and result["plan"] is None
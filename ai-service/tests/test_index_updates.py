@@ -0,0 +1,103 @@
+import os
+from unittest.mock import patch
+
+import pytest
+
+from rag import build_index, index_updates
+from rag.delta_log import delta_paths
+from rag.rag_search import RagIndex, pinned_index, rag_lookup
+
+
+@pytest.fixture
+def build(make_index):
+    def build(index_type):
+        rag_index = make_index(index_type, {"M": 8} if index_type == "hnsw" else None)
+        return rag_index.index_path, rag_index.meta_path
+    return build
+
+
+def top(paths, text, systems=None):
+    with pinned_index(RagIndex(*paths)):
+        return rag_lookup(text, k=3, systems=systems)
+
+
+HTN_TEXT = "SNOMED term: hypertension | synonyms: high blood pressure;HTN | code: 271327008"
+
+
+@pytest.mark.parametrize("index_type", ["flat", "hnsw"])
+def test_upsert_retire_and_compact(build, tmp_path, index_type):
+    paths = build(index_type)
+    assert top(paths, HTN_TEXT)[0]["code"] == "271327008"
+
+    index_updates.upsert_concepts([
+        {"system": "snomed", "code": "999001", "display": "clinic-local condition"},
+        {"system": "snomed", "code": "44054006", "display": "diabetes mellitus type 2 (local)"},
+    ], paths[0])
+    index_updates.retire_concepts([{"system": "snomed", "code": "271327008"}], paths[0])
+
+    local_text = index_updates.concept_passage("snomed", "999001", "clinic-local condition")["text"]
+    assert local_text == "SNOMED term: clinic-local condition | synonyms: None | code: 999001"
+
+    def check():
+        assert top(paths, local_text)[0]["code"] == "999001"
+        assert "271327008" not in {r["code"] for r in top(paths, HTN_TEXT)}
+        assert "271327008" not in {r["code"] for r in top(paths, "HTN", systems=["snomed"])}
+        diabetes = [r for r in top(paths, "diabetes mellitus type 2 (local)") if r["code"] == "44054006"]
+        assert [r["display"] for r in diabetes] == ["diabetes mellitus type 2 (local)"]
+
+    # Base files untouched; the log carries the changes
+    check()
+    assert RagIndex(*paths).index.ntotal == 20
+
+    stats = index_updates.compact(*paths)
+    assert stats == {"passages": 20, "removed": 2, "added": 2}
+    assert not os.path.exists(delta_paths(str(tmp_path))[0])
+    assert RagIndex(*paths).index.ntotal == 20
+    check()
+
+
+def test_updates_change_the_index_version(build, tmp_path):
+    paths = build("flat")
+    before = RagIndex(*paths).version
+    index_updates.retire_concepts([{"system": "icd10", "code": "I10"}], paths[0])
+    assert RagIndex(*paths).version != before
+
+
+def test_row_numbered_indexes_refuse_updates(build, tmp_path):
+    paths = build("flat")
+    os.remove(os.path.join(str(tmp_path), "index_info.json"))
+
+    with pytest.raises(RuntimeError, match="rebuild"):
+        index_updates.retire_concepts([{"system": "icd10", "code": "I10"}], paths[0])
+
+
+def test_interrupted_compaction_is_finished_before_the_next_read(build, tmp_path):
+    paths = build("flat")
+    index_updates.upsert_concepts([{"system": "snomed", "code": "999001", "display": "clinic-local condition"}], paths[0])
+    local_text = index_updates.concept_passage("snomed", "999001", "clinic-local condition")["text"]
+
+    real_replace = os.replace
+    committed = []
+
+    def crash_after_one_file(src, dst):
+        if src.endswith(".new"):
+            if committed:
+                raise OSError("simulated crash")
+            committed.append(dst)
+        real_replace(src, dst)
+
+    with patch("rag.index_files.os.replace", crash_after_one_file), pytest.raises(OSError):
+        index_updates.compact(*paths)
+
+    # One file swapped, the rest staged: the reader rolls the commit forward
+    assert os.path.exists(tmp_path / "commit.json")
+    rag_index = RagIndex(*paths).load()
+    assert not os.path.exists(tmp_path / "commit.json")
+    assert rag_index.index.ntotal == 21
+    assert top(paths, local_text)[0]["code"] == "999001"
+
+
+def test_concept_passage_matches_the_build_wording():
+    built = next(p for p in build_index.iter_passages() if p["code"] == "271327008")
+    passage = index_updates.concept_passage("snomed", "271327008", "hypertension", ["high blood pressure", "HTN"])
+    assert passage["text"] == built["text"]
@@ -0,0 +1,129 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from config import async_client, client
+from utils import llm_cache, llm_client
+from utils.llm_cache import LLMCache, bypass_llm_cache, llm_cache_key
+
+MESSAGES = [
+    {"role": "system", "content": "Summarize."},
+    {"role": "user", "content": "Pt with HTN, on lisinopril."},
+]
+
+
+def fake_completion(**kwargs):
+    text = f"summary of {kwargs['messages'][-1]['content']}"
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+
+def test_key_covers_model_messages_and_params():
+    key = llm_cache_key("gpt-4o-mini", MESSAGES)
+    assert key == llm_cache_key("gpt-4o-mini", [dict(m) for m in MESSAGES])
+    assert key != llm_cache_key("gpt-4o", MESSAGES)
+    assert key != llm_cache_key("gpt-4o-mini", MESSAGES[1:])
+    assert key != llm_cache_key("gpt-4o-mini", MESSAGES, temperature=0)
+
+
+def test_repeated_note_is_answered_from_cache():
+    with patch.object(llm_client, "LLM_CACHE", LLMCache()), patch.object(
+        client.chat.completions, "create", side_effect=fake_completion,
+    ) as create:
+        first = llm_client.call_llm(MESSAGES, "gpt-4o-mini")
+        assert llm_client.call_llm(MESSAGES, "gpt-4o-mini") == first
+        assert create.call_count == 1
+
+        llm_client.call_llm(MESSAGES, "gpt-4o")
+        assert create.call_count == 2
+
+        # Bypass re-asks the model but refreshes the entry
+        with bypass_llm_cache():
+            llm_client.call_llm(MESSAGES, "gpt-4o-mini")
+        assert create.call_count == 3
+        llm_client.call_llm(MESSAGES, "gpt-4o-mini")
+        assert create.call_count == 3
+
+        llm_client.call_llm(MESSAGES, "gpt-4o-mini", use_cache=False)
+        assert create.call_count == 4
+        assert llm_client.LLM_CACHE.stats()["hits"] == 2
+
+
+def test_disk_tier_ttl_and_invalidation(tmp_path):
+    path = str(tmp_path / "llm.sqlite")
+    key_a = llm_cache_key("m1", MESSAGES)
+    key_b = llm_cache_key("m2", MESSAGES)
+
+    with patch.object(llm_cache.time, "time", return_value=1000.0):
+        cache = LLMCache(persist_path=path, ttl_seconds=60)
+        cache.put(key_a, "m1", "a")
+        cache.put(key_b, "m2", "b")
+
+        restarted = LLMCache(persist_path=path, ttl_seconds=60)
+        assert restarted.get(key_a) == "a"
+        assert restarted.stats()["disk_hits"] == 1
+
+    with patch.object(llm_cache.time, "time", return_value=1061.0):
+        assert restarted.get(key_a) is None
+
+    assert restarted.invalidate("m2") == 1
+    assert LLMCache(persist_path=path).get(key_b) is None
+    assert LLMCache(persist_path=path).get(key_a) == "a"
+
+
+def test_async_calls_use_the_cache_off_the_event_loop():
+    cache = LLMCache()
+    threads = []
+    real_get = cache.get
+
+    def get(key):
+        threads.append(threading.get_ident())
+        return real_get(key)
+
+    async def complete(messages, model, response_format=None):
+        return "async summary"
+
+    async def run():
+        loop_thread = threading.get_ident()
+        first = await llm_client.call_llm_async(MESSAGES, "gpt-4o-mini")
+        second = await llm_client.call_llm_async(MESSAGES, "gpt-4o-mini")
+        return loop_thread, first, second
+
+    with patch.object(llm_client, "LLM_CACHE", cache), patch.object(cache, "get", get), \
+            patch.object(llm_client, "_complete_async", side_effect=complete) as completions:
+        loop_thread, first, second = asyncio.run(run())
+
+    assert first == second == "async summary" and completions.call_count == 1
+    assert threads and loop_thread not in threads
+
+
+def test_unparseable_replies_are_not_cached():
+    replies = iter(["not json", '{"summary": "ok"}'])
+
+    def completion(**kwargs):
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=next(replies)))])
+
+    def chunk(text):
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+    async def stream(**kwargs):
+        async def reply():
+            yield chunk('{"conditions": [')
+            yield chunk("truncated")
+        return reply()
+
+    async def streamed():
+        chunks = llm_client.stream_llm_async(MESSAGES, "gpt-4o", accept=llm_client.parses_as_object)
+        return "".join([part async for part in chunks])
+
+    accept = llm_client.parses_as_object
+    with patch.object(llm_client, "LLM_CACHE", LLMCache()), \
+            patch.object(client.chat.completions, "create", side_effect=completion) as create:
+        assert llm_client.call_llm(MESSAGES, "gpt-4o-mini", accept=accept) == "not json"
+        assert llm_client.call_llm(MESSAGES, "gpt-4o-mini", accept=accept) == '{"summary": "ok"}'
+        assert llm_client.call_llm(MESSAGES, "gpt-4o-mini", accept=accept) == '{"summary": "ok"}'
+        assert create.call_count == 2
+
+        with patch.object(async_client.chat.completions, "create", side_effect=stream):
+            assert asyncio.run(streamed()) == '{"conditions": [truncated'
+        assert llm_client.LLM_CACHE.get(llm_cache_key("gpt-4o", MESSAGES)) is None
@@ -0,0 +1,175 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from config import async_client
+from models.pipeline_models import PipelineRequest
+from services import extractor_service, pipeline_service
+from utils import llm_client
+from utils.llm_cache import LLMCache
+from utils.rate_limiter import RateLimiter
+
+BUNDLE = {"resourceType": "Bundle", "type": "collection", "entry": []}
+
+
+def test_async_pipeline_runs_llm_calls_concurrently():
+    async def run():
+        summary_started, extract_started = asyncio.Event(), asyncio.Event()
+
+        # Each call waits for the other to start: this only finishes if
+        # both are in flight at once
+        async def fake_summarize(text):
+            summary_started.set()
+            await extract_started.wait()
+            return {"summary": "Patient with asthma.", "diagnoses": [], "symptoms": [], "medications": []}
+
+        async def fake_extract(text):
+            extract_started.set()
+            await summary_started.wait()
+            return {"conditions": ["asthma"], "medications": [{"name": "albuterol"}]}
+
+        with patch.object(pipeline_service, "summarize_async", fake_summarize), \
+                patch.object(pipeline_service, "extract_entities_async", fake_extract), \
+                patch.object(pipeline_service, "LLM_STREAM_EXTRACTION", False):
+            return await asyncio.wait_for(
+                pipeline_service.run_pipeline_async(PipelineRequest(text="asthma, on albuterol")), 5
+            )
+
+    response = asyncio.run(run())
+
+    assert response.summary == "Patient with asthma."
+    assert response.entities.conditions == ["asthma"]
+    resource_types = {entry["resource"]["resourceType"] for entry in response.fhir.entry}
+    assert {"Condition", "MedicationStatement"} <= resource_types
+
+
+def test_streamed_conditions_are_resolved_before_the_reply_ends():
+    prefetched = threading.Event()
+    resolved = []
+
+    def fake_resolve(terms):
+        resolved.extend(terms)
+        prefetched.set()
+
+    def chunk(text):
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+    async def reply():
+        yield chunk('{"conditions": ["asthma", ')
+        yield chunk('"hypertension"], "medications": [')
+        # The rest of the reply only arrives once a prefetch has run
+        assert await asyncio.to_thread(prefetched.wait, 5)
+        yield chunk('{"name": "albuterol"}]}')
+
+    async def fake_create(**kwargs):
+        assert kwargs["stream"] is True
+        return reply()
+
+    async def fake_summarize(text):
+        return {"summary": "Asthma and hypertension.", "diagnoses": [], "symptoms": [], "medications": []}
+
+    with patch.object(async_client.chat.completions, "create", side_effect=fake_create), \
+            patch.object(llm_client, "LLM_CACHE", LLMCache()), \
+            patch.object(pipeline_service, "summarize_async", fake_summarize), \
+            patch.object(pipeline_service, "resolve_conditions", fake_resolve), \
+            patch.object(pipeline_service, "LLM_STREAM_EXTRACTION", True):
+        response = asyncio.run(pipeline_service.run_pipeline_async(PipelineRequest(text="asthma, hypertension")))
+
+    assert sorted(resolved) == ["asthma", "hypertension"]
+    assert response.entities.conditions == ["asthma", "hypertension"]
+    assert response.entities.medications[0].name == "albuterol"
+
+
+def test_conditions_streamed_during_a_prefetch_share_the_next_one():
+    started, finished = threading.Event(), threading.Event()
+    calls = []
+
+    def fake_resolve(terms):
+        calls.append(list(terms))
+        started.set()
+        # Hold the first batch until the whole reply has been parsed
+        assert finished.wait(5)
+
+    def chunk(text):
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+    async def reply():
+        yield chunk('{"conditions": ["asthma", ')
+        assert await asyncio.to_thread(started.wait, 5)
+        yield chunk('"hypertension", "gout", "copd"]}')
+        finished.set()
+
+    async def fake_create(**kwargs):
+        return reply()
+
+    async def fake_summarize(text):
+        return {"summary": "", "diagnoses": [], "symptoms": [], "medications": []}
+
+    with patch.object(async_client.chat.completions, "create", side_effect=fake_create), \
+            patch.object(llm_client, "LLM_CACHE", LLMCache()), \
+            patch.object(pipeline_service, "summarize_async", fake_summarize), \
+            patch.object(pipeline_service, "resolve_conditions", fake_resolve), \
+            patch.object(pipeline_service, "generate_fhir_resource", lambda entities: BUNDLE), \
+            patch.object(pipeline_service, "LLM_STREAM_EXTRACTION", True):
+        asyncio.run(pipeline_service.run_pipeline_async(PipelineRequest(text="asthma, hypertension, gout, copd")))
+
+    assert calls == [["asthma"], ["hypertension", "gout", "copd"]]
+
+
+def test_abandoned_stream_releases_its_limiter_slot():
+    def chunk(text):
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+    async def reply():
+        yield chunk('{"conditions": ["asthma", ')
+        yield chunk('"gout"]}')
+
+    async def fake_create(**kwargs):
+        return reply()
+
+    def on_item(field, item):
+        raise RuntimeError("consumer failed")
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            await extractor_service.extract_entities_streaming("asthma", on_item)
+        # Released before the event loop gets to finalize the generator
+        return limiter.stats()["in_flight"]
+
+    limiter = RateLimiter("test", max_concurrency=1)
+    with patch.object(async_client.chat.completions, "create", side_effect=fake_create), \
+            patch.object(llm_client, "LLM_CACHE", LLMCache()), \
+            patch.object(llm_client, "LLM_LIMITER", limiter):
+        assert asyncio.run(run()) == 0
+
+
+def test_failed_llm_call_leaves_no_tasks_behind():
+    def chunk(text):
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+    async def reply():
+        yield chunk('{"conditions": ["asthma", ')
+        await asyncio.sleep(1)
+        yield chunk('"gout"]}')
+
+    async def fake_create(**kwargs):
+        return reply()
+
+    async def failing_summarize(text):
+        await asyncio.sleep(0.05)  # after the first condition is prefetching
+        raise RuntimeError("summary failed")
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            await pipeline_service.run_pipeline_async(PipelineRequest(text="asthma"))
+        return asyncio.all_tasks() - {asyncio.current_task()}
+
+    with patch.object(async_client.chat.completions, "create", side_effect=fake_create), \
+            patch.object(llm_client, "LLM_CACHE", LLMCache()), \
+            patch.object(pipeline_service, "summarize_async", failing_summarize), \
+            patch.object(pipeline_service, "resolve_conditions", lambda terms: None), \
+            patch.object(pipeline_service, "LLM_STREAM_EXTRACTION", True):
+        assert asyncio.run(run()) == set()
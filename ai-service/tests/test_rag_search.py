@@ -0,0 +1,148 @@
+import os
+import subprocess
+import sys
+import textwrap
+from unittest.mock import patch
+
+import pytest
+
+from rag import build_index, rag_search
+from rag.rag_search import RagIndex, pinned_index, rag_lookup
+from services.knowledge_service import SYSTEM_URLS
+
+
+@pytest.mark.parametrize("index_type, params", [
+    ("flat", None),
+    ("hnsw", {"M": 8}),
+    ("ivf_flat", None),
+])
+@pytest.mark.parametrize("systems", [["loinc"], ["snomed", "icd10"], ["snomed", "rxnorm"]])
+def test_filtered_search_only_returns_requested_systems(make_index, index_type, params, systems):
+    rag_index = make_index(index_type, params)
+
+    # Vector filtering only; decisive lexical matches would return fewer than k
+    with pinned_index(rag_index), patch.object(rag_search, "RAG_HYBRID_SEARCH", False):
+        results = rag_lookup("high blood pressure", k=5, systems=systems)
+        unfiltered = rag_lookup("high blood pressure", k=5)
+
+    assert len(results) == 5
+    assert {r["system"] for r in results} <= {SYSTEM_URLS[s] for s in systems}
+    assert len(unfiltered) == 5
+
+
+def test_decisive_lexical_matches_skip_embedding(make_index, offline_embeddings):
+    rag_index = make_index("flat")
+
+    with pinned_index(rag_index):
+        results = rag_search.rag_lookup_batch(["HTN", "T2DM"], systems=["snomed", "icd10"])
+
+    offline_embeddings.assert_not_called()
+    assert [r[0]["code"] for r in results] == ["271327008", "44054006"]
+
+    # Only one passage mentions HTN, so the lexical answer is short
+    htn = results[0]
+    assert len(htn) == 1 and htn[0]["rrf_score"] == pytest.approx(1 / 61)
+
+
+def test_hybrid_search_embeds_only_ambiguous_queries(make_index, offline_embeddings):
+    rag_index = make_index("flat")
+    query = "congestive failure of the heart"
+
+    with pinned_index(rag_index):
+        htn, heart = rag_search.rag_lookup_batch(["HTN", query], k=3, systems=["snomed", "icd10"])
+
+    assert offline_embeddings.call_args.args[0] == [query]
+    assert htn[0]["code"] == "271327008"
+    # The lexical ranking is fused in even though vectors are random here
+    assert "49727002" in {r["code"] for r in heart}
+    assert len(heart) == 3
+
+
+def test_search_params_cover_whole_index_as_no_filter(make_index):
+    rag_index = make_index("flat")
+
+    assert rag_index.search_params(None) is None
+    assert rag_index.search_params(["snomed", "icd10", "rxnorm", "loinc"]) is None
+    # Selectors are shared; the parameters object is per call (see below)
+    first, second = rag_index.search_params(["snomed"]), rag_index.search_params(["snomed"])
+    assert first is not second and first.sel.this == second.sel.this
+
+
+def test_concurrent_filtered_searches(make_index):
+    rag_index = make_index("flat")
+    # A shared SearchParameters object crashes the process, so search in a child
+    script = textwrap.dedent(f"""
+        import sys, threading
+        import numpy as np
+        sys.path.insert(0, {os.getcwd()!r})
+        from rag.rag_search import RagIndex
+
+        rag_index = RagIndex({rag_index.index_path!r}, {rag_index.meta_path!r}).load()
+        queries = np.random.default_rng(0).standard_normal((64, rag_index.index.d)).astype("float32")
+
+        def search():
+            for _ in range(500):
+                rag_index.search_vectors(queries, 12, ["snomed", "icd10"])
+
+        threads = [threading.Thread(target=search) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    """)
+    child = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, timeout=120)
+    assert child.returncode == 0, child.stderr
+
+
+def test_index_is_not_loaded_until_first_search():
+    from services import terminology_service  # noqa: F401 (imports rag_search)
+
+    rag_index = RagIndex()
+    assert rag_index._index is None and rag_index.version
+
+    assert rag_index.index.ntotal == len(rag_index.metadata) == 20
+    assert rag_index.metadata[0]["system"] == "snomed"
+
+
+def test_metadata_store_round_trip_and_legacy_json(tmp_path):
+    import json
+
+    from rag.metadata_store import MetadataStore, open_metadata, write_metadata
+
+    rows = build_index.build_passages()
+    write_metadata(str(tmp_path / "meta.bin"), iter(rows))
+
+    store = open_metadata(str(tmp_path / "meta.bin"))
+    assert isinstance(store, MetadataStore)
+    assert len(store) == len(rows)
+    assert store[7] == rows[7] and store[-1] == rows[-1]
+    assert store.category_rows("system")["rxnorm"].tolist() == [10, 11, 12, 13, 14]
+
+    with open(tmp_path / "meta.json", "w") as f:
+        json.dump(rows, f, indent=2)
+    legacy = open_metadata(str(tmp_path / "meta.json"))
+    assert legacy[7] == rows[7]
+    assert legacy.category_rows("system")["rxnorm"].tolist() == [10, 11, 12, 13, 14]
+
+
+def test_local_backend_builds_and_searches_offline(tmp_path):
+    from utils.embedding_backends import HashedNgramEmbeddings, create_backend
+
+    backend = HashedNgramEmbeddings(dim=256).fit(p["text"] for p in build_index.iter_passages())
+    stats = build_index.embed_shards(build_index.iter_passages(), str(tmp_path / "build"), backend=backend)
+    index_path, meta_path = str(tmp_path / "faiss.index"), str(tmp_path / "meta.bin")
+    build_index.assemble_index(stats["shards"], str(tmp_path / "build"), index_path, meta_path, backend=backend)
+
+    def local_backend(index_dir=None):
+        return create_backend("local", local_dim=256, index_dir=index_dir)
+
+    with patch.object(rag_search, "configured_backend", local_backend):
+        rag_index = RagIndex(index_path, meta_path)
+    assert rag_index.embedder.name == backend.name  # IDF reloaded from the index dir
+
+    with pinned_index(rag_index):
+        assert rag_lookup("high blood presure", systems=["snomed"])[0]["code"] == "271327008"
+
+    # An OpenAI-configured process refuses to search a local-space index
+    with pytest.raises(RuntimeError, match="rebuild"):
+        RagIndex(index_path, meta_path).load()
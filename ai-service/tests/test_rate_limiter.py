@@ -0,0 +1,76 @@
+import asyncio
+import threading
+import time
+
+from utils.rate_limiter import RateLimiter, estimate_tokens, priority_class
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_interactive_calls_jump_ahead_of_bulk():
+    limiter = RateLimiter("test", max_concurrency=1)
+    order = []
+
+    def call(label, priority):
+        with priority_class(priority), limiter.limit():
+            order.append(label)
+
+    with limiter.limit():  # hold the only slot
+        threads = []
+        for label, priority in [("bulk-1", "bulk"), ("bulk-2", "bulk"), ("interactive", "interactive")]:
+            thread = threading.Thread(target=call, args=(label, priority))
+            thread.start()
+            threads.append(thread)
+            wait_until(lambda: sum(c["queued"] for c in limiter.stats()["classes"].values()) == len(threads))
+
+        stats = limiter.stats()
+        assert stats["in_flight"] == 1
+        assert stats["classes"]["bulk"]["queued"] == 2 and stats["classes"]["interactive"]["queued"] == 1
+
+    for thread in threads:
+        thread.join(2)
+    assert order == ["interactive", "bulk-1", "bulk-2"]
+
+
+def test_empty_bucket_delays_the_next_call():
+    # 1200/min refills one request every 50 ms
+    limiter = RateLimiter("test", requests_per_minute=1200)
+    limiter._requests.level = 0
+
+    start = time.monotonic()
+    with limiter.limit():
+        pass
+    assert time.monotonic() - start >= 0.04
+    assert limiter.stats()["classes"]["interactive"]["max_wait_ms"] >= 40
+
+
+def test_async_waiters_share_slots_and_cancel_cleanly():
+    limiter = RateLimiter("test", tokens_per_minute=60_000, max_concurrency=2)
+
+    async def run():
+        active = peak = 0
+
+        async def call():
+            nonlocal active, peak
+            async with limiter.limit_async(estimate_tokens(["x" * 400])):
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(0.01)
+                active -= 1
+
+        await asyncio.gather(*(call() for _ in range(6)))
+
+        async with limiter.limit_async(), limiter.limit_async():
+            blocked = asyncio.create_task(call())
+            await asyncio.sleep(0.01)
+            blocked.cancel()
+        return peak
+
+    assert asyncio.run(run()) == 2
+    stats = limiter.stats()
+    assert stats["in_flight"] == 0 and stats["classes"]["interactive"]["queued"] == 0
@@ -0,0 +1,123 @@
+from unittest.mock import patch
+
+import pytest
+
+from services import knowledge_service
+from services.knowledge_service import current_vocabulary, pinned_vocabulary, swap_vocabulary
+from services.reload_service import reload_snapshots, pinned_snapshots
+from services.terminology_loaders import load_demo_csvs
+from services.vocabulary_store import VocabularyStore, VocabularyWriter
+from rag import rag_search
+
+
+@pytest.fixture
+def restore_snapshots():
+    vocab = current_vocabulary()
+    rag_index = rag_search.current_index()
+    yield
+    swap_vocabulary(vocab)
+    rag_search.swap_index(rag_index)
+
+
+def test_reload_swaps_while_pinned_requests_keep_old_snapshot(tmp_path, restore_snapshots):
+    store_path = str(tmp_path / "vocab.sqlite")
+    writer = VocabularyWriter(store_path)
+    load_demo_csvs(writer)
+    writer.close()
+
+    with pinned_snapshots():
+        old = current_vocabulary()
+
+        status = reload_snapshots(vocab_db_path=store_path)
+
+        # In-flight request: still the snapshot it started with
+        assert current_vocabulary() is old
+        assert knowledge_service.lookup_snomed("HTN")["code"] == "271327008"
+
+    # New requests see the reloaded store
+    assert status["status"] == "ok"
+    assert isinstance(current_vocabulary().store, VocabularyStore)
+    assert status["vocab_version"] == current_vocabulary().version != old.version
+    assert knowledge_service.lookup_snomed("HTN")["code"] == "271327008"
+
+
+def test_reload_builds_the_lexical_index_before_the_swap(restore_snapshots):
+    swapped = []
+
+    def swap_index(rag_index):
+        swapped.append(rag_index._lexical)
+
+    with patch.object(rag_search, "RAG_HYBRID_SEARCH", True), \
+            patch("services.reload_service.swap_index", side_effect=swap_index):
+        assert reload_snapshots()["status"] == "ok"
+
+    assert len(swapped) == 1 and swapped[0] is not None
+
+
+def test_failed_reload_keeps_live_snapshot(tmp_path, restore_snapshots):
+    live = current_vocabulary()
+
+    status = reload_snapshots(vocab_db_path=str(tmp_path / "missing.sqlite"))
+
+    assert status["status"] == "failed"
+    assert "missing.sqlite" in status["error"]
+    assert current_vocabulary() is live
+
+
+def test_pinned_vocabulary_nests():
+    outer = current_vocabulary()
+    with pinned_vocabulary() as pinned:
+        assert pinned is outer
+        with pinned_vocabulary() as inner:
+            assert inner is outer
+
+
+def test_admin_routes_require_the_admin_key():
+    from fastapi.testclient import TestClient
+    from unittest.mock import patch
+
+    from main import app
+    from routes import admin_routes
+
+    client = TestClient(app)
+
+    with patch.object(admin_routes, "ADMIN_API_KEY", None):
+        assert client.get("/admin/reload").status_code == 503
+
+    with patch.object(admin_routes, "ADMIN_API_KEY", "s3cret"):
+        assert client.get("/admin/reload").status_code == 401
+        assert client.get("/admin/reload", headers={"X-Admin-Key": "wrong"}).status_code == 401
+        assert client.get("/admin/reload", headers={"X-Admin-Key": "s3cret"}).status_code == 200
+
+
+def test_reload_requested_during_a_reload_runs_again():
+    import threading
+    import time
+    from unittest.mock import patch
+
+    from services import reload_service
+
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow_reload():
+        calls.append(len(calls))
+        started.set()
+        if len(calls) == 1:
+            release.wait(2)
+
+    with patch.object(reload_service, "reload_snapshots", slow_reload):
+        reload_service.start_reload()
+        assert started.wait(2)
+        # Arrives after the first reload has read its files
+        assert reload_service.start_reload()["pending"] is True
+        reload_service.start_reload()
+        release.set()
+
+        for _ in range(200):
+            if not reload_service._worker_running:
+                break
+            time.sleep(0.01)
+
+    assert calls == [0, 1]
+    assert reload_service.reload_status()["pending"] is False
@@ -0,0 +1,31 @@
+from utils.streaming_json import StreamingArrayParser
+
+REPLY = (
+    '```json\n{"patient": {"name": "A [B]"}, "conditions": ["asthma", "gout, \\"flare\\""], '
+    '"symptoms": ["cough"], "medications": [{"name": "albuterol", "dose": null}, {"name": "[x]"}], '
+    '"labs": [], "plan": null}\n```'
+)
+
+
+def test_elements_are_reported_once_complete():
+    parser = StreamingArrayParser(["conditions", "medications", "labs"])
+
+    seen = []
+    for i in range(0, len(REPLY), 3):
+        for field, item in parser.feed(REPLY[i:i + 3]):
+            seen.append((field, item, i))
+
+    assert [(field, item) for field, item, _ in seen] == [
+        ("conditions", "asthma"),
+        ("conditions", 'gout, "flare"'),
+        ("medications", {"name": "albuterol", "dose": None}),
+        ("medications", {"name": "[x]"}),
+    ]
+    # Reported right after the element's own comma, not at the end
+    assert seen[0][2] < REPLY.index('"gout')
+
+
+def test_unwatched_and_nested_arrays_are_ignored():
+    parser = StreamingArrayParser(["conditions"])
+    reply = '{"symptoms": ["a"], "plan": {"conditions": ["b"]}, "conditions": []}'
+    assert parser.feed(reply) == []
@@ -0,0 +1,83 @@
+import json
+from unittest.mock import patch
+
+from models.extract_models import ExtractResponse
+from services import extractor_service
+from utils import llm_client
+from utils.llm_client import JsonParseStats, repair_json, safe_json
+from utils.structured_output import json_schema_format, strict_json_schema
+
+
+def objects(schema):
+    if isinstance(schema, dict):
+        if schema.get("type") == "object":
+            yield schema
+        for value in schema.values():
+            yield from objects(value)
+    elif isinstance(schema, list):
+        for item in schema:
+            yield from objects(item)
+
+
+def test_schema_is_strict_mode_compatible():
+    schema = strict_json_schema(ExtractResponse)
+    found = list(objects(schema))
+    assert len(found) > 10
+
+    for obj in found:
+        assert obj["additionalProperties"] is False
+        assert obj["required"] == list(obj["properties"])
+    assert "default" not in json.dumps(schema)
+
+    # Optional fields stay nullable
+    assert {"type": "null"} in schema["properties"]["patient"]["anyOf"]
+
+    fmt = json_schema_format("clinical_extraction", ExtractResponse)
+    assert fmt["type"] == "json_schema" and fmt["json_schema"]["strict"] is True
+
+
+def test_local_repair_handles_fences_prose_and_trailing_commas():
+    raw = 'Here is the JSON:\n```json\n{"conditions": ["asthma", "a, }"], "labs": [],}\n```\nLet me know!'
+    assert json.loads(repair_json(raw)) == {"conditions": ["asthma", "a, }"], "labs": []}
+    assert json.loads(repair_json('Sure. {"plan": {"actions": ["rest",]}} Hope this helps.')) == {
+        "plan": {"actions": ["rest"]}
+    }
+
+
+def test_locally_repairable_output_skips_llm_repair_call():
+    fenced = '```json\n{"conditions": ["gout"],}\n```'
+    stats = JsonParseStats()
+
+    with patch.object(llm_client, "JSON_STATS", stats), \
+         patch.object(extractor_service, "JSON_STATS", stats), \
+         patch.object(extractor_service, "call_llm", return_value=fenced) as call:
+        result = extractor_service.extract_entities("note")
+
+    assert call.call_count == 1
+    assert call.call_args.kwargs["response_format"] == extractor_service.EXTRACT_RESPONSE_FORMAT
+    assert result["conditions"] == ["gout"]
+    assert stats.stats()["repaired"] == 1 and stats.stats()["llm_repairs"] == 0
+
+
+def test_unparseable_output_is_counted():
+    stats = JsonParseStats()
+    with patch.object(llm_client, "JSON_STATS", stats):
+        assert safe_json("no json here") is None
+        assert safe_json('{"ok": true}') == {"ok": True}
+    assert stats.stats()["failed"] == 1 and stats.stats()["valid"] == 1
+
+
+def test_llm_repair_rate_counts_only_extraction_replies():
+    stats = JsonParseStats()
+    with patch.object(llm_client, "JSON_STATS", stats), \
+         patch.object(extractor_service, "JSON_STATS", stats), \
+         patch.object(extractor_service, "call_llm", side_effect=["not json", '{"conditions": []}']):
+        extractor_service.extract_entities("note")
+        for _ in range(3):
+            safe_json('{"summary": "ok"}', "summary")
+
+    result = stats.stats()
+    assert result["llm_repairs"] == 1 and result["llm_repair_rate"] == 1.0
+    assert result["by_caller"]["extraction"]["failed"] == 1
+    assert result["by_caller"]["extraction_repair"]["valid"] == 1
+    assert result["by_caller"]["summary"]["valid"] == 3
@@ -0,0 +1,131 @@
+from services import knowledge_service
+from services.knowledge_service import VocabularySnapshot
+from services.terminology_loaders import (
+    load_demo_csvs,
+    load_icd10cm_order,
+    load_rxnorm_rrf,
+    load_snomed_rf2,
+)
+from services.vocabulary_artifact import (
+    VocabularyArtifact,
+    compile_artifact,
+    entries_from_indexes,
+    entries_from_store,
+)
+from services.vocabulary_store import VocabularyStore, VocabularyWriter
+
+FSN = "900000000000003001"
+SYN = "900000000000013009"
+
+
+def write_lines(path, lines):
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def test_snomed_rf2_keeps_only_active_content(tmp_path):
+    concepts = write_lines(tmp_path / "concepts.txt", [
+        "id\teffectiveTime\tactive\tmoduleId\tdefinitionStatusId",
+        "44054006\t20240101\t1\t0\t0",
+        "11111111\t20240101\t0\t0\t0",
+    ])
+    descriptions = write_lines(tmp_path / "descriptions.txt", [
+        "id\teffectiveTime\tactive\tmoduleId\tconceptId\tlanguageCode\ttypeId\tterm\tcaseSignificanceId",
+        f"1\t20240101\t1\t0\t44054006\ten\t{FSN}\tType 2 diabetes mellitus (disorder)\t0",
+        f"2\t20240101\t1\t0\t44054006\ten\t{SYN}\tT2DM\t0",
+        f"3\t20240101\t0\t0\t44054006\ten\t{SYN}\tretired synonym\t0",
+        f"4\t20240101\t1\t0\t11111111\ten\t{FSN}\tInactive concept (disorder)\t0",
+    ])
+
+    out = str(tmp_path / "vocab.sqlite")
+    writer = VocabularyWriter(out)
+    stats = load_snomed_rf2(writer, concepts, descriptions)
+    writer.close()
+
+    store = VocabularyStore(out)
+    assert stats["kept"] == 2
+    assert store.lookup("snomed", "t2dm") == ("44054006", "Type 2 diabetes mellitus")
+    assert store.lookup("snomed", "type 2 diabetes mellitus")[0] == "44054006"
+    assert store.lookup("snomed", "retired synonym") is None
+    assert store.lookup("snomed", "inactive concept") is None
+
+
+def test_icd10cm_and_rxnorm_loaders(tmp_path):
+    order = write_lines(tmp_path / "icd10cm_order.txt", [
+        "00001 E119    1 Type 2 diabetes mellitus without complications               Type 2 diabetes mellitus without complications",
+    ])
+    rrf = write_lines(tmp_path / "RXNCONSO.RRF", [
+        "6809|ENG||||||||||RXNORM|IN|6809|metformin||N||",
+        "6809|ENG||||||||||RXNORM|SY|6809|Glucophage||N||",
+        "6809|ENG||||||||||MTHSPL|SU|6809|should be skipped||N||",
+        "9999|ENG||||||||||RXNORM|IN|9999|suppressed||O||",
+    ])
+
+    out = str(tmp_path / "vocab.sqlite")
+    writer = VocabularyWriter(out)
+    load_icd10cm_order(writer, order)
+    load_rxnorm_rrf(writer, rrf)
+    writer.close()
+
+    store = VocabularyStore(out)
+    assert store.lookup("icd10", "type 2 diabetes mellitus without complications")[0] == "E11.9"
+    assert store.lookup("rxnorm", "glucophage") == ("6809", "metformin")
+    assert store.lookup("rxnorm", "should be skipped") is None
+    assert store.lookup("rxnorm", "suppressed") is None
+
+
+def test_lookups_served_from_store_match_csv(tmp_path):
+    out = str(tmp_path / "vocab.sqlite")
+    writer = VocabularyWriter(out)
+    load_demo_csvs(writer)
+    writer.close()
+
+    expected = knowledge_service.lookup_snomed("Type-II diabetes")
+
+    with knowledge_service.pinned_vocabulary(VocabularySnapshot(VocabularyStore(out))):
+        assert knowledge_service.lookup_snomed("Type-II diabetes") == expected
+        assert knowledge_service.lookup_loinc("HbA1c (%)")["code"] == "4548-4"
+        assert knowledge_service.lookup_icd10("not a real condition") is None
+        assert knowledge_service.lookup_code(knowledge_service.ICD10_SYSTEM, "I10")["display"] == "essential (primary) hypertension"
+        assert knowledge_service.lookup_code(knowledge_service.SNOMED_SYSTEM, "I10") is None
+
+
+def test_artifact_matches_csv_indexes(tmp_path):
+    out = str(tmp_path / "vocab.bin")
+    compile_artifact(out, entries_from_indexes())
+    artifact = VocabularyArtifact(out)
+
+    for key, coding in knowledge_service.current_vocabulary().indexes["snomed"].items():
+        assert artifact.lookup("snomed", key) == (coding["code"], coding["display"])
+
+    assert artifact.lookup("rxnorm", "metformin") == ("860975", "metformin")
+    assert artifact.lookup("snomed", "metformin") is None
+    assert artifact.concept("snomed", "44054006") == ("44054006", "type 2 diabetes mellitus")
+    assert artifact.concept("icd10", "44054006") is None
+    assert artifact.concept("loinc", "99999-9") is None
+    assert artifact.counts()["loinc"] == len(knowledge_service.current_vocabulary().rows["loinc"])
+
+
+def test_artifact_compiled_from_store(tmp_path):
+    store_path = str(tmp_path / "vocab.sqlite")
+    writer = VocabularyWriter(store_path)
+    load_demo_csvs(writer)
+    writer.close()
+
+    out = str(tmp_path / "vocab.bin")
+    compile_artifact(out, entries_from_store(store_path))
+
+    with knowledge_service.pinned_vocabulary(VocabularySnapshot(VocabularyArtifact(out))):
+        assert knowledge_service.lookup_snomed("HTN")["code"] == "271327008"
+        assert knowledge_service.lookup_rxnorm("Metformin 500mg")["display"] == "metformin"
+
+
+def test_compiled_backend_skips_the_csv_tables(tmp_path):
+    out = str(tmp_path / "vocab.bin")
+    compile_artifact(out, entries_from_indexes())
+
+    snapshot = VocabularySnapshot(VocabularyArtifact(out))
+    assert not any(snapshot.rows.values()) and not any(snapshot.indexes.values())
+    with knowledge_service.pinned_vocabulary(snapshot):
+        assert knowledge_service.lookup_snomed("HTN")["code"] == "271327008"
+        assert knowledge_service.lookup_code(knowledge_service.SNOMED_SYSTEM, "44054006")
@@ -32,3 +32,72 @@ def test_rxnorm_normalization_dosage():
 
 
 
+
+
+def test_snomed_synonym_lookup():
+    result = lookup_snomed("HTN")
+
+    assert result is not None
+    assert result["code"] == "271327008"
+    assert result["display"] == "essential hypertension"
+
+
+def test_lookup_returns_independent_copies():
+    first = lookup_snomed("asthma")
+    first["code"] = "mutated"
+
+    assert lookup_snomed("asthma")["code"] == "195967001"
+
+
+def test_fuzzy_matcher_edit_budget():
+    from services.fuzzy_matcher import TrigramMatcher
+
+    matcher = TrigramMatcher(["hypertension", "heart failure", "asthma"])
+
+    assert matcher.match("hypertensoin")[0] == "hypertension"  # transposition
+    assert matcher.match("hart failure")[0] == "heart failure"
+    assert matcher.match("hypotension") is None  # different disease, not a typo
+    assert matcher.match("asma") is None  # too short to absorb an edit
+
+
+def test_fuzzy_matcher_refuses_opposite_diagnoses():
+    from services.fuzzy_matcher import TrigramMatcher
+
+    # Two edits and 0.87 similarity, but the opposite condition
+    assert TrigramMatcher(["hyperthyroidism"]).match("hypothyroidism") is None
+    assert TrigramMatcher(["hypothyroidism"]).match("hyperthyroidism") is None
+    assert TrigramMatcher(["tachycardia"]).match("bradycardia") is None
+
+    # Genuine misspellings still match, one edit per short word
+    matcher = TrigramMatcher(["hyperthyroidism", "type 2 diabetes"])
+    assert matcher.match("hyperthyriodism")[0] == "hyperthyroidism"
+    assert matcher.match("typ 2 diabtes")[0] == "type 2 diabetes"
+    assert matcher.match("type 2 dibtes") is None
+
+
+def test_trigram_filter_keeps_transpositions():
+    from services.fuzzy_matcher import TrigramMatcher
+
+    # Swapping "ab" changes four of the eight trigrams
+    assert TrigramMatcher(["xxabyyzz"]).match("xxbayyzz")[0] == "xxabyyzz"
+
+
+def test_normalization_docstring_examples():
+    from services.terminology_normalization import (
+        normalize_condition_term,
+        normalize_medication_term,
+        normalize_lab_term,
+    )
+
+    assert normalize_condition_term("Type-II diabetes (adult)") == "type 2 diabetes"
+    assert normalize_condition_term("Stage III cancer") == "stage 3 cancer"
+    assert normalize_medication_term("Lisinopril-10 mg") == "lisinopril"
+    assert normalize_lab_term("HbA1c (%)") == "hba1c"
+
+
+def test_batch_normalization_preserves_order():
+    from services.terminology_normalization import normalize_condition_terms
+
+    assert normalize_condition_terms(["Stage IV", None, "HTN", "Stage IV"]) == [
+        "stage 4", "", "htn", "stage 4",
+    ]
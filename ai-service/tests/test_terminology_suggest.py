@@ -0,0 +1,67 @@
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from main import app
+from services.knowledge_service import SNOMED_SYSTEM, suggest_terms
+from services import prefix_index
+from services.prefix_index import PrefixIndex
+
+client = TestClient(app)
+
+
+def test_prefix_index_matches_word_starts_and_ranks_whole_keys_first():
+    index = PrefixIndex({
+        "snomed": ["type 2 diabetes", "diabetes mellitus", "diabetic foot", "asthma"],
+        "icd10": ["diabetes"],
+    })
+
+    assert index.search("diab", limit=3) == [
+        ("icd10", "diabetes"),
+        ("snomed", "diabetic foot"),
+        ("snomed", "diabetes mellitus"),
+    ]
+    assert ("snomed", "type 2 diabetes") in index.search("diab")
+    assert index.search("diab", {"icd10"}) == [("icd10", "diabetes")]
+    assert index.search("xyz") == []
+
+
+def test_wide_prefix_memo_is_bounded():
+    index = PrefixIndex({"snomed": [f"d{i:03d}" for i in range(40)]})
+
+    with patch.object(prefix_index, "LARGE_RANGE", 8), patch.object(prefix_index, "LARGE_RESULTS_MAX", 4):
+        for limit in range(1, 11):
+            assert len(index.search("d", limit=limit)) == limit
+        assert index.search("d", limit=10) == index.search("d", limit=10)
+
+    assert len(index._large_results) == 4
+
+
+def test_suggest_normalizes_prefix_and_dedupes_concepts():
+    suggestions = suggest_terms("Type II diab", k=5, systems=["snomed"])
+
+    assert [s["code"] for s in suggestions] == ["44054006"]
+    assert suggestions[0]["system"] == SNOMED_SYSTEM
+
+
+def test_suggest_returns_k_distinct_concepts():
+    # "diab" reaches several SNOMED keys of 44054006 before any ICD-10 key
+    for k in (2, 3):
+        suggestions = suggest_terms("diab", k=k)
+        assert {s["code"] for s in suggestions} == {"44054006", "E11.9"}
+
+
+def test_suggest_normalizes_rxnorm_prefixes_as_medications():
+    suggestions = suggest_terms("Metformin 500mg", k=3, systems=["rxnorm"])
+    assert [s["code"] for s in suggestions] == ["860975"]
+
+
+def test_suggest_endpoint():
+    response = client.get("/terminology/suggest", params={"q": "metf", "k": 3})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["query"] == "metf"
+    assert body["suggestions"][0]["code"] == "860975"
+
+    assert client.get("/terminology/suggest", params={"q": ""}).status_code == 422
@@ -0,0 +1,151 @@
+# ai-service/utils/embedding_backends.py
+"""
+Embedding backends behind utils.embeddings.embed_text.
+
+    openai  text-embedding-3-small over the network (default), optionally
+            shortened to `dimensions`
+    local   hashed character n-gram TF-IDF, computed in-process with NumPy;
+            no network, microseconds per query, works air-gapped
+
+Each backend has a `name` that identifies its vector space. The name
+keys the embedding cache and is recorded in index_info.json, so an index
+is never searched with vectors from a different backend. The local
+backend's name includes a digest of its IDF weights, since refitting
+them changes every vector; the weights are saved next to the index
+they were fitted for (LOCAL_IDF_FILENAME).
+"""
+
+import hashlib
+import os
+import zlib
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+from config import client, EMBEDDING_RPM, EMBEDDING_TPM, EMBEDDING_MAX_CONCURRENCY
+from utils.rate_limiter import RateLimiter, estimate_tokens
+
+LOCAL_IDF_FILENAME = "local_idf.npy"
+
+# Every OpenAI embeddings request is admitted here; the local backend
+# makes no provider calls and is not limited
+EMBEDDING_LIMITER = RateLimiter("embeddings", EMBEDDING_RPM, EMBEDDING_TPM, EMBEDDING_MAX_CONCURRENCY)
+
+
+class OpenAIEmbeddings:
+    """
+    text-embedding-3 models are trained so that a prefix of the vector
+    is itself a usable embedding; with `dimensions` the API returns that
+    prefix re-normalized. Shorter vectors mean a smaller, faster index
+    for a small recall cost (benchmarks/bench_embeddings.py measures it).
+    """
+
+    cacheable = True
+
+    def __init__(self, model: str = "text-embedding-3-small", dimensions: Optional[int] = None):
+        self.model = model
+        self.dimensions = dimensions
+        self.name = f"{model}-{dimensions}d" if dimensions else model
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        extra = {"dimensions": self.dimensions} if self.dimensions else {}
+        with EMBEDDING_LIMITER.limit(estimate_tokens(texts)):
+            response = client.embeddings.create(model=self.model, input=texts, **extra)
+        return np.array([item.embedding for item in response.data], dtype=np.float32)
+
+
+class HashedNgramEmbeddings:
+    """
+    Character n-grams of each lowercased word, padded with spaces, are
+    hashed into `dim` buckets. Sublinear term frequency (1 + log tf) is
+    weighted by per-bucket IDF and L2-normalized, so L2 distance in FAISS
+    ranks like cosine similarity.
+
+    Character n-grams survive typos, plurals and word-order changes
+    ("pressure high blood") that defeat exact lookup, at no network cost.
+    Paraphrases with no shared surface form ("sugar disease") stay out
+    of reach; that's what the OpenAI backend is for.
+    """
+
+    cacheable = False  # recomputing is cheaper than a cache probe
+
+    def __init__(
+        self,
+        dim: int = 1024,
+        ngram_range: tuple = (3, 5),
+        idf_path: Optional[str] = None,
+    ):
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self.idf_path = idf_path
+        self.idf = np.ones(dim, dtype=np.float32)
+
+        if idf_path and os.path.exists(idf_path):
+            idf = np.load(idf_path)
+            if idf.shape == (dim,):
+                self.idf = idf.astype(np.float32)
+
+    @property
+    def name(self) -> str:
+        digest = hashlib.sha1(self.idf.tobytes()).hexdigest()[:8]
+        low, high = self.ngram_range
+        return f"hashed-char-{low}-{high}gram-{self.dim}-idf{digest}"
+
+    def _buckets(self, text: str) -> List[int]:
+        low, high = self.ngram_range
+        buckets = []
+        for word in text.lower().split():
+            padded = f" {word} ".encode("utf-8")
+            for n in range(low, high + 1):
+                for i in range(max(1, len(padded) - n + 1)):
+                    buckets.append(zlib.crc32(padded[i:i + n]))
+        return buckets
+
+    def _term_frequencies(self, text: str) -> np.ndarray:
+        counts = np.bincount(
+            np.array(self._buckets(text), dtype=np.uint32) % self.dim,
+            minlength=self.dim,
+        ).astype(np.float32)
+        nonzero = counts > 0
+        counts[nonzero] = 1 + np.log(counts[nonzero])
+        return counts
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.empty((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            vector = self._term_frequencies(text) * self.idf
+            norm = np.linalg.norm(vector)
+            vectors[i] = vector / norm if norm else vector
+        return vectors
+
+    def fit(self, texts: Iterable[str]) -> "HashedNgramEmbeddings":
+        """Learn smoothed IDF over a corpus (the index passages)."""
+        document_frequency = np.zeros(self.dim, dtype=np.int64)
+        n_documents = 0
+        for text in texts:
+            document_frequency[np.unique(np.array(self._buckets(text), dtype=np.uint32) % self.dim)] += 1
+            n_documents += 1
+
+        self.idf = (np.log((1 + n_documents) / (1 + document_frequency)) + 1).astype(np.float32)
+        return self
+
+    def save(self, idf_path: str) -> None:
+        with open(idf_path + ".tmp", "wb") as f:
+            np.save(f, self.idf)
+        os.replace(idf_path + ".tmp", idf_path)
+
+
+def create_backend(
+    backend: str,
+    openai_model: str = "text-embedding-3-small",
+    local_dim: int = 1024,
+    index_dir: Optional[str] = None,
+    openai_dimensions: Optional[int] = None,
+):
+    """A backend by name; a local backend loads the IDF saved in index_dir."""
+    if backend == "openai":
+        return OpenAIEmbeddings(openai_model, openai_dimensions)
+    if backend == "local":
+        idf_path = os.path.join(index_dir, LOCAL_IDF_FILENAME) if index_dir else None
+        return HashedNgramEmbeddings(local_dim, idf_path=idf_path)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND {backend!r}; expected 'openai' or 'local'")
@@ -0,0 +1,84 @@
+# ai-service/utils/embedding_cache.py
+
+import hashlib
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from utils.tiered_cache import TieredCache
+
+# SQLite's default limit on bound parameters is 999 on older builds
+SQL_CHUNK = 900
+
+
+def text_digest(text: str) -> bytes:
+    """Content address of a text; identical strings share one embedding."""
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class EmbeddingCache(TieredCache):
+    """
+    Content-addressed cache of embedding vectors, stored as float32. The
+    disk tier is shared with build_index, so a rebuild only embeds
+    passages it hasn't seen before.
+
+    Entries are keyed on (model, sha256(text)); changing the embedding
+    model never returns a vector from another model's space.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS embeddings (
+            model  TEXT NOT NULL,
+            digest BLOB NOT NULL,
+            vector BLOB NOT NULL,
+            PRIMARY KEY (model, digest)
+        ) WITHOUT ROWID;
+    """
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Cached vector per text, None where it must be embedded."""
+        digests = [text_digest(text) for text in texts]
+        found: Dict[bytes, np.ndarray] = {}
+
+        with self._lock:
+            for digest in digests:
+                vector = self._entries.get((model, digest))
+                if vector is not None:
+                    self._entries.move_to_end((model, digest))
+                    found[digest] = vector
+
+            missing = [d for d in dict.fromkeys(digests) if d not in found]
+            if self._db is not None and missing:
+                for start in range(0, len(missing), SQL_CHUNK):
+                    chunk = missing[start:start + SQL_CHUNK]
+                    rows = self._db.execute(
+                        f"SELECT digest, vector FROM embeddings WHERE model = ? "
+                        f"AND digest IN ({','.join('?' * len(chunk))})",
+                        (model, *chunk),
+                    )
+                    for digest, blob in rows:
+                        vector = np.frombuffer(blob, dtype=np.float32)
+                        self._remember((model, digest), vector)
+                        found[digest] = vector
+                        self.disk_hits += 1
+
+            results = [found.get(digest) for digest in digests]
+            hits = sum(vector is not None for vector in results)
+            self.hits += hits
+            self.misses += len(results) - hits
+
+        return results
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: np.ndarray) -> None:
+        rows = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                vector = np.ascontiguousarray(vector, dtype=np.float32)
+                vector.flags.writeable = False
+                digest = text_digest(text)
+                self._remember((model, digest), vector)
+                rows.append((model, digest, vector.tobytes()))
+
+            if self._db is not None and rows:
+                self._db.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", rows)
+                self._db.commit()
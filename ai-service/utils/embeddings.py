@@ -1,24 +1,61 @@
 import numpy as np
-from typing import List
-from config import client
+from typing import List, Optional
+from config import (
+    EMBEDDING_BACKEND,
+    OPENAI_MODEL_EMBEDDING,
+    OPENAI_EMBEDDING_DIMENSIONS,
+    LOCAL_EMBEDDING_DIM,
+    EMBEDDING_CACHE_SIZE,
+    EMBEDDING_CACHE_PATH,
+)
+from utils.embedding_backends import create_backend
+from utils.embedding_cache import EmbeddingCache
 
 
-EMBEDDING_MODEL = "text-embedding-3-small"
+def configured_backend(index_dir: Optional[str] = None):
+    """
+    The backend selected by EMBEDDING_BACKEND. A local backend uses the
+    IDF weights saved with the index in index_dir.
+    """
+    return create_backend(
+        EMBEDDING_BACKEND, OPENAI_MODEL_EMBEDDING, LOCAL_EMBEDDING_DIM, index_dir,
+        openai_dimensions=OPENAI_EMBEDDING_DIMENSIONS,
+    )
+
+
+DEFAULT_BACKEND = configured_backend()
+EMBEDDING_MODEL = DEFAULT_BACKEND.name
+
+# Conditions and vocabulary passages are embedded over and over; only
+# texts never seen before (under this model) go to the API.
+EMBEDDING_CACHE = EmbeddingCache(EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_PATH)
 
 
-def embed_text(texts: List[str]) -> np.ndarray:
+def embed_text(texts: List[str], backend=None) -> np.ndarray:
     """
-    Embed a list of strings using OpenAI embeddings.
-    Returns a NumPy matrix of shape (N, 1536).
+    Embed a list of strings with the configured backend (or `backend`).
+    Returns a NumPy matrix of shape (N, dim): 1536 for OpenAI unless
+    OPENAI_EMBEDDING_DIMENSIONS shortens it.
+
+    For network backends, cached vectors are reused and all misses go
+    out in one batched call.
     """
 
     if isinstance(texts, str):
         texts = [texts]
 
-    response = client.embeddings.create(
-        model=EMBEDDING_MODEL,
-        input=texts
-    )
+    backend = backend or DEFAULT_BACKEND
+    if not backend.cacheable:
+        return backend.embed(texts)
+
+    vectors = EMBEDDING_CACHE.get_many(backend.name, texts)
+
+    misses = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+    if misses:
+        embedded = backend.embed(misses)
+        EMBEDDING_CACHE.put_many(backend.name, misses, embedded)
+
+        by_text = dict(zip(misses, embedded))
+        vectors = [v if v is not None else by_text[t] for t, v in zip(texts, vectors)]
 
-    vectors = [item.embedding for item in response.data]
-    return np.array(vectors, dtype=np.float32)
\ No newline at end of file
+    return np.array(vectors, dtype=np.float32)
@@ -0,0 +1,124 @@
+# ai-service/utils/llm_cache.py
+
+import hashlib
+import json
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from utils.tiered_cache import TieredCache
+
+# Set for the duration of bypass_llm_cache(): reads skip the cache
+_BYPASS: ContextVar[bool] = ContextVar("llm_cache_bypass", default=False)
+
+
+def llm_cache_key(model: str, messages: List[Dict[str, str]], **params: Any) -> bytes:
+    """
+    Content address of a completion request: model, every message
+    (system prompt and note) and any parameter that shapes the output.
+    """
+    payload = json.dumps({"model": model, "messages": messages, **params}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).digest()
+
+
+@contextmanager
+def bypass_llm_cache():
+    """Force fresh completions in this block; their results still refresh the cache."""
+    token = _BYPASS.set(True)
+    try:
+        yield
+    finally:
+        _BYPASS.reset(token)
+
+
+def llm_cache_bypassed() -> bool:
+    return _BYPASS.get()
+
+
+def honor_cache_control(header: Optional[str]):
+    """bypass_llm_cache() when a request sent Cache-Control: no-cache."""
+    if header and "no-cache" in header.lower():
+        return bypass_llm_cache()
+    return nullcontext()
+
+
+class LLMCache(TieredCache):
+    """
+    Content-addressed cache of raw LLM completions. Completions contain
+    note content, so the disk tier is off unless a path is configured.
+
+    Entries older than ttl_seconds (0 = never) count as misses, so
+    prompt or model behaviour changes age out even without invalidate().
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS completions (
+            key        BLOB PRIMARY KEY,
+            model      TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            completion TEXT NOT NULL
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        persist_path: Optional[str] = None,
+        ttl_seconds: float = 0,
+    ):
+        # Memory entries: key -> (model, created_at, completion)
+        super().__init__(max_entries, persist_path)
+        self.ttl_seconds = ttl_seconds
+
+    def _fresh(self, created_at: float) -> bool:
+        return not self.ttl_seconds or time.time() - created_at < self.ttl_seconds
+
+    def get(self, key: bytes) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._fresh(entry[1]):
+                del self._entries[key]
+                entry = None
+
+            if entry is None and self._db is not None:
+                row = self._db.execute(
+                    "SELECT model, created_at, completion FROM completions WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and self._fresh(row[1]):
+                    entry = row
+                    self._remember(key, entry)
+                    self.disk_hits += 1
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key: bytes, model: str, completion: str) -> None:
+        entry = (model, time.time(), completion)
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?)", (key, *entry))
+                self._db.commit()
+
+    def invalidate(self, model: Optional[str] = None) -> int:
+        """Drop every entry (or one model's) from both tiers; returns how many."""
+        with self._lock:
+            doomed = [k for k, entry in self._entries.items() if model is None or entry[0] == model]
+            for key in doomed:
+                del self._entries[key]
+            removed = len(doomed)
+
+            if self._db is not None:
+                if model is None:
+                    cursor = self._db.execute("DELETE FROM completions")
+                else:
+                    cursor = self._db.execute("DELETE FROM completions WHERE model = ?", (model,))
+                self._db.commit()
+                removed = max(removed, cursor.rowcount)
+            return removed
@@ -1,36 +1,293 @@
+import asyncio
 import json
+import logging
+import re
+import threading
 from openai import APIError, RateLimitError, APITimeoutError
 from tenacity import retry, wait_exponential, stop_after_attempt
-from config import client
+from config import (
+    client,
+    async_client,
+    LLM_CACHE_SIZE,
+    LLM_CACHE_PATH,
+    LLM_CACHE_TTL_SECONDS,
+    LLM_RPM,
+    LLM_TPM,
+    LLM_MAX_CONCURRENCY,
+)
+from utils.llm_cache import LLMCache, llm_cache_bypassed, llm_cache_key
+from utils.rate_limiter import RateLimiter, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Re-submitted notes (retries, refreshes, /pipeline after /summarize)
+# are answered from here instead of paying for the completion again.
+LLM_CACHE = LLMCache(LLM_CACHE_SIZE, LLM_CACHE_PATH, LLM_CACHE_TTL_SECONDS)
+
+# Every chat completion attempt (retries included) is admitted here
+LLM_LIMITER = RateLimiter("chat", LLM_RPM, LLM_TPM, LLM_MAX_CONCURRENCY)
+
+
+def _prompt_tokens(messages):
+    return estimate_tokens(m.get("content") or "" for m in messages)
+
+
+def _cached(key, use_cache):
+    if use_cache and not llm_cache_bypassed():
+        return LLM_CACHE.get(key)
+    return None
+
+
+def _cacheable(raw, use_cache, accept):
+    return use_cache and raw is not None and (accept is None or accept(raw))
+
+
+def call_llm(messages, model, use_cache=True, response_format=None, accept=None):
+    """
+    Safe LLM call with retry and backoff, behind LLM_CACHE.
+    Returns raw text or None if all retries fail.
+
+    response_format is passed to the provider (see
+    utils/structured_output.py) and is part of the cache key.
+    use_cache=False neither reads nor writes the cache; inside
+    bypass_llm_cache() the call is fresh but refreshes the entry.
+
+    accept, if given, is called with a fresh reply and the reply is
+    cached only if it returns true (e.g. parses_as_object), so a reply
+    the caller cannot use is asked for again rather than replayed.
+    """
+    key = llm_cache_key(model, messages, response_format=response_format)
+    raw = _cached(key, use_cache)
+    if raw is None:
+        raw = _complete(messages, model, response_format)
+        if _cacheable(raw, use_cache, accept):
+            LLM_CACHE.put(key, model, raw)
+    return raw
+
+
+async def call_llm_async(messages, model, use_cache=True, response_format=None, accept=None):
+    """
+    call_llm on the AsyncOpenAI client: same cache, retries and result,
+    but the event loop serves other requests while this one waits.
+    """
+    key = llm_cache_key(model, messages, response_format=response_format)
+    # The cache may hit SQLite: keep it off the event loop
+    raw = await asyncio.to_thread(_cached, key, use_cache)
+    if raw is None:
+        raw = await _complete_async(messages, model, response_format)
+        if _cacheable(raw, use_cache, accept):
+            await asyncio.to_thread(LLM_CACHE.put, key, model, raw)
+    return raw
+
+
+async def stream_llm_async(messages, model, use_cache=True, response_format=None, accept=None):
+    """
+    call_llm_async, yielding the completion in chunks as it is
+    generated. A cached completion is yielded whole.
+
+    If the stream cannot be opened, this falls back to call_llm_async's
+    retries and yields that result (nothing if they all fail). An error
+    after the first chunk is raised: the partial output is not cached,
+    and neither is a full one that accept refuses.
+    """
+    key = llm_cache_key(model, messages, response_format=response_format)
+    raw = await asyncio.to_thread(_cached, key, use_cache)
+    if raw is not None:
+        yield raw
+        return
+
+    parts = []
+    try:
+        # The slot is held until the stream ends
+        async with LLM_LIMITER.limit_async(_prompt_tokens(messages)):
+            stream = await async_client.chat.completions.create(
+                model=model,
+                messages=messages,
+                stream=True,
+                **_format_kwargs(response_format),
+            )
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    yield delta
+    except (RateLimitError, APITimeoutError, APIError) as e:
+        logger.warning("LLM API error: %s", e)
+        if parts:
+            raise
+        raw = await _complete_async(messages, model, response_format)
+        if raw is not None:
+            parts.append(raw)
+            yield raw
+
+    raw = "".join(parts).strip() if parts else None
+    if _cacheable(raw, use_cache, accept):
+        await asyncio.to_thread(LLM_CACHE.put, key, model, raw)
+
 
 @retry(
     wait=wait_exponential(min=1, max=8),
     stop=stop_after_attempt(3),
     retry_error_callback=lambda _: None
 )
-def call_llm(messages, model):
-    """
-    Safe LLM call with retry and backoff.
-    Returns raw text or None if all retries fail.
-    """
+def _complete(messages, model, response_format=None):
     try: 
-        response = client.chat.completions.create(
-            model=model,
-            messages=messages,
-        )
+        with LLM_LIMITER.limit(_prompt_tokens(messages)):
+            response = client.chat.completions.create(
+                model=model,
+                messages=messages,
+                **_format_kwargs(response_format),
+            )
         return response.choices[0].message.content.strip()
     
     except (RateLimitError, APITimeoutError, APIError) as e:
-        print(f"LLM API error: {str(e)}")
+        logger.warning("LLM API error: %s", e)
+        raise
+
+
+@retry(
+    wait=wait_exponential(min=1, max=8),
+    stop=stop_after_attempt(3),
+    retry_error_callback=lambda _: None
+)
+async def _complete_async(messages, model, response_format=None):
+    try:
+        async with LLM_LIMITER.limit_async(_prompt_tokens(messages)):
+            response = await async_client.chat.completions.create(
+                model=model,
+                messages=messages,
+                **_format_kwargs(response_format),
+            )
+        return response.choices[0].message.content.strip()
+
+    except (RateLimitError, APITimeoutError, APIError) as e:
+        logger.warning("LLM API error: %s", e)
         raise
 
-def safe_json(raw: str):
+
+def _format_kwargs(response_format):
+    return {"response_format": response_format} if response_format else {}
+
+
+# ---------------------------------------------------------
+# JSON parsing and local repair
+# ---------------------------------------------------------
+
+_CODE_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+_CLOSES_NEXT = re.compile(r"\s*[}\]]")
+
+
+class JsonParseStats:
+    """
+    How LLM replies parsed, per caller: as returned, after local repair,
+    or not at all. Extraction records its fallback LLM repair calls as
+    "llm_repairs" under "extraction", and parses their output under
+    "extraction_repair", so llm_repair_rate is the share of extraction
+    replies that needed one.
+    """
+
+    OUTCOMES = ("valid", "repaired", "failed", "llm_repairs")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self._counts = {}
+
+    def record(self, outcome: str, caller: str = "other") -> None:
+        with self._lock:
+            counts = self._counts.setdefault(caller, dict.fromkeys(self.OUTCOMES, 0))
+            counts[outcome] += 1
+
+    def stats(self):
+        with self._lock:
+            totals = {outcome: sum(c[outcome] for c in self._counts.values()) for outcome in self.OUTCOMES}
+            parsed = totals["valid"] + totals["repaired"] + totals["failed"]
+
+            extraction = self._counts.get("extraction", dict.fromkeys(self.OUTCOMES, 0))
+            extracted = extraction["valid"] + extraction["repaired"] + extraction["failed"]
+            return {
+                **totals,
+                "local_repair_rate": totals["repaired"] / parsed if parsed else 0.0,
+                "llm_repair_rate": extraction["llm_repairs"] / extracted if extracted else 0.0,
+                "by_caller": {caller: dict(counts) for caller, counts in self._counts.items()},
+            }
+
+
+JSON_STATS = JsonParseStats()
+
+
+def repair_json(raw: str) -> str:
+    """
+    Deterministic fixes for the usual ways a reply wraps or bends JSON:
+    markdown code fences, prose before or after the object, and
+    trailing commas before } or ].
+    """
+    text = raw.strip()
+
+    fenced = _CODE_FENCE.search(text)
+    if fenced:
+        text = fenced.group(1).strip()
+
+    start, end = text.find("{"), text.rfind("}")
+    if start != -1 and end > start:
+        text = text[start:end + 1]
+
+    return _drop_trailing_commas(text)
+
+
+def _drop_trailing_commas(text: str) -> str:
+    out = []
+    in_string = escaped = False
+    for i, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "," and _CLOSES_NEXT.match(text, i + 1):
+            continue
+        out.append(char)
+    return "".join(out)
+
+
+def parses_as_object(raw: str) -> bool:
+    """
+    Whether safe_json() would return a dict for raw, without counting
+    it in JSON_STATS. Used as call_llm's accept for JSON replies.
+    """
+    for text in (raw, repair_json(raw)):
+        try:
+            return isinstance(json.loads(text), dict)
+        except Exception:
+            continue
+    return False
+
+
+def safe_json(raw: str, caller: str = "other"):
     """
-    Safely parse JSON from LLM.
-    Returns dict or None.
+    Safely parse JSON from LLM, applying repair_json() if needed.
+    Returns dict or None. The outcome is counted in JSON_STATS under caller.
     """
     try:
-        return json.loads(raw)
+        data = json.loads(raw)
+        JSON_STATS.record("valid", caller)
+        return data
+    except Exception:
+        pass
+
+    try:
+        data = json.loads(repair_json(raw))
+        JSON_STATS.record("repaired", caller)
+        return data
     except Exception:
-        print(f"Could not parse LLM JSON:\n{raw}")
+        JSON_STATS.record("failed", caller)
+        # The reply may quote the note; keep it out of normal logs
+        logger.warning("Could not parse LLM JSON (%d chars)", len(raw or ""))
+        logger.debug("Unparseable LLM JSON:\n%s", raw)
         return None
\ No newline at end of file
@@ -0,0 +1,259 @@
+# ai-service/utils/rate_limiter.py
+"""
+Client-side rate limiting for provider calls (chat completions and
+OpenAI embeddings).
+
+tenacity's backoff reacts to 429s after they happen: under a burst every
+caller fails, backs off and retries together, and the burst repeats.
+RateLimiter keeps calls under the account's limits before they are sent:
+
+    requests/min   token bucket, one unit per call
+    tokens/min     token bucket, charged the estimated prompt tokens
+                   (characters / 4)
+    concurrency    at most max_concurrency calls in flight
+
+Waiting calls are admitted by priority class, then in arrival order.
+Interactive traffic (API requests, the default) goes ahead of bulk
+traffic (index builds, backfills), which runs inside priority_class("bulk").
+The class is a context variable, so it follows asyncio tasks and
+asyncio.to_thread. A limit of 0 is not enforced.
+"""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# Lower is served first
+PRIORITIES = {"interactive": 0, "bulk": 1}
+
+_PRIORITY: ContextVar[str] = ContextVar("provider_priority", default="interactive")
+
+
+@contextmanager
+def priority_class(name: str):
+    """Run provider calls in this block under priority class name."""
+    if name not in PRIORITIES:
+        raise ValueError(f"Unknown priority class {name!r}; expected one of {tuple(PRIORITIES)}")
+    token = _PRIORITY.set(name)
+    try:
+        yield
+    finally:
+        _PRIORITY.reset(token)
+
+
+def current_priority() -> str:
+    return _PRIORITY.get()
+
+
+def estimate_tokens(texts: Iterable[str]) -> int:
+    """Rough prompt size: ~4 characters per token for English text."""
+    return max(1, sum(len(text or "") for text in texts) // 4)
+
+
+class TokenBucket:
+    """Refills continuously at per_minute / 60 per second, up to per_minute."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount is available (0 if it is now)."""
+        self._refill(now)
+        # A call larger than the bucket waits for a full bucket
+        need = min(amount, self.capacity)
+        return 0.0 if self.level >= need else (need - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.level -= min(amount, self.capacity)
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "name", "tokens", "enqueued", "grant", "state")
+
+    def __init__(self, priority: str, seq: int, tokens: int, grant: Callable[[], None]):
+        self.priority = PRIORITIES[priority]
+        self.seq = seq
+        self.name = priority
+        self.tokens = tokens
+        self.enqueued = time.monotonic()
+        self.grant = grant
+        self.state = "waiting"  # -> granted | cancelled
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class RateLimiter:
+    """
+    Admission control for one provider endpoint. Wrap each call in
+    limit() (threads) or limit_async() (event loop); both share the
+    same buckets, slots and queue.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        max_concurrency: int = 0,
+    ):
+        self.name = name
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_concurrency = max_concurrency
+
+        self._requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self._tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+        self._queue: List[_Waiter] = []  # heap
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._timer_at = 0.0
+
+        self._granted = {name: 0 for name in PRIORITIES}
+        self._wait_total = {name: 0.0 for name in PRIORITIES}
+        self._wait_max = {name: 0.0 for name in PRIORITIES}
+
+    @contextmanager
+    def limit(self, tokens: int = 1):
+        admitted = threading.Event()
+        self._enqueue(tokens, admitted.set)
+        admitted.wait()
+        try:
+            yield
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def limit_async(self, tokens: int = 1):
+        loop = asyncio.get_running_loop()
+        admitted = loop.create_future()
+
+        def grant():
+            loop.call_soon_threadsafe(lambda: admitted.done() or admitted.set_result(None))
+
+        waiter = self._enqueue(tokens, grant)
+        try:
+            await admitted
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter.state == "granted":
+                    self._in_flight -= 1
+                    self._dispatch()
+                else:
+                    waiter.state = "cancelled"
+            raise
+
+        try:
+            yield
+        finally:
+            self._release()
+
+    # ---------------------------------------------------------
+    # Scheduling
+    # ---------------------------------------------------------
+
+    def _enqueue(self, tokens: int, grant: Callable[[], None]) -> _Waiter:
+        with self._lock:
+            waiter = _Waiter(current_priority(), next(self._seq), tokens, grant)
+            heapq.heappush(self._queue, waiter)
+            self._dispatch()
+            return waiter
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Admit waiters from the head of the queue while limits allow. Lock held."""
+        now = time.monotonic()
+        while self._queue:
+            waiter = self._queue[0]
+            if waiter.state == "cancelled":
+                heapq.heappop(self._queue)
+                continue
+
+            if self.max_concurrency and self._in_flight >= self.max_concurrency:
+                return  # the next release dispatches again
+
+            delay = max(
+                self._requests.wait_time(1, now) if self._requests else 0.0,
+                self._tokens.wait_time(waiter.tokens, now) if self._tokens else 0.0,
+            )
+            if delay > 0:
+                self._wake_in(delay, now)
+                return
+
+            heapq.heappop(self._queue)
+            if self._requests:
+                self._requests.take(1)
+            if self._tokens:
+                self._tokens.take(waiter.tokens)
+            self._in_flight += 1
+
+            waited = now - waiter.enqueued
+            self._granted[waiter.name] += 1
+            self._wait_total[waiter.name] += waited
+            self._wait_max[waiter.name] = max(self._wait_max[waiter.name], waited)
+
+            waiter.state = "granted"
+            try:
+                waiter.grant()
+            except RuntimeError:
+                self._in_flight -= 1  # its event loop has closed
+
+    def _wake_in(self, delay: float, now: float) -> None:
+        at = now + delay
+        if self._timer is not None and self._timer_at <= at:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(delay, self._on_timer)
+        self._timer.daemon = True
+        self._timer_at = at
+        self._timer.start()
+
+    def _on_timer(self) -> None:
+        with self._lock:
+            self._timer = None
+            self._dispatch()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            queued = {name: 0 for name in PRIORITIES}
+            for waiter in self._queue:
+                if waiter.state == "waiting":
+                    queued[waiter.name] += 1
+
+            return {
+                "name": self.name,
+                "requests_per_minute": self.requests_per_minute,
+                "tokens_per_minute": self.tokens_per_minute,
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self._in_flight,
+                "classes": {
+                    name: {
+                        "queued": queued[name],
+                        "granted": self._granted[name],
+                        "mean_wait_ms": round(1000 * self._wait_total[name] / self._granted[name], 2)
+                        if self._granted[name] else 0.0,
+                        "max_wait_ms": round(1000 * self._wait_max[name], 2),
+                    }
+                    for name in PRIORITIES
+                },
+            }
@@ -0,0 +1,100 @@
+# ai-service/utils/streaming_json.py
+"""
+Incremental parsing of a JSON object as it streams from the LLM.
+
+The extraction reply is one object whose interesting parts are
+top-level arrays ("conditions", "medications", "labs"). Each element is
+complete long before the closing brace, so StreamingArrayParser reports
+it as soon as the comma or bracket after it arrives, and the pipeline
+can start resolving it while the model is still writing the rest.
+
+Only the structure is tracked (nesting depth, strings, keys); elements
+are decoded with json.loads once complete. Text before the first "{"
+(a code fence, a sentence) is skipped. The full reply is still parsed
+normally at the end, so nothing here needs to handle malformed input:
+an element that does not decode is simply not reported early.
+"""
+
+import json
+from typing import Any, Iterable, List, Optional, Tuple
+
+
+class StreamingArrayParser:
+    """
+    feed() text chunks; get back (field, element) for every element of
+    the watched top-level arrays that completed within them.
+    """
+
+    def __init__(self, fields: Iterable[str]):
+        self.fields = set(fields)
+        self._text = ""
+
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+
+        self._expect_key = False
+        self._key: Optional[str] = None
+        self._array: Optional[str] = None  # watched field being read
+        self._element_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        start = len(self._text)
+        self._text += chunk
+
+        completed: List[Tuple[str, Any]] = []
+        for i in range(start, len(self._text)):
+            self._step(self._text, i, completed)
+        return completed
+
+    def _step(self, text: str, i: int, completed: List[Tuple[str, Any]]) -> None:
+        char = text[i]
+
+        if self._in_string:
+            if self._escaped:
+                self._escaped = False
+            elif char == "\\":
+                self._escaped = True
+            elif char == '"':
+                self._in_string = False
+                if self._depth == 1 and self._expect_key:
+                    self._key = json.loads(text[self._string_start:i + 1])
+            return
+
+        if self._depth == 0 and char != "{":
+            return  # preamble
+
+        if self._array is not None and self._depth == 2:
+            if char in ",]":
+                self._emit(text, i, completed)
+            elif self._element_start is None and not char.isspace():
+                self._element_start = i
+
+        if char == '"':
+            self._in_string = True
+            self._string_start = i
+        elif char in "{[":
+            self._depth += 1
+            if self._depth == 1:
+                self._expect_key = True
+            elif self._depth == 2 and char == "[" and self._key in self.fields:
+                self._array = self._key
+        elif char in "}]":
+            self._depth -= 1
+            if self._depth == 1:
+                self._array = None
+        elif self._depth == 1:
+            if char == ",":
+                self._expect_key = True
+            elif char == ":":
+                self._expect_key = False
+
+    def _emit(self, text: str, end: int, completed: List[Tuple[str, Any]]) -> None:
+        start, self._element_start = self._element_start, None
+        if start is None:
+            return  # empty array or trailing comma
+        try:
+            completed.append((self._array, json.loads(text[start:end])))
+        except json.JSONDecodeError:
+            pass
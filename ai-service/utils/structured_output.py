@@ -0,0 +1,54 @@
+# ai-service/utils/structured_output.py
+"""
+JSON Schemas for schema-constrained LLM output.
+
+With response_format type "json_schema" and strict mode, the provider
+decodes only tokens that keep the output valid against the schema, so
+extraction and summarization replies parse without a repair call.
+
+Strict mode accepts a subset of JSON Schema: every object must list all
+of its properties as required and forbid additional ones, and keywords
+such as "default" are rejected. Optional fields stay nullable (anyOf
+with null). Fields that default to [] become required arrays, which the
+prompts already ask for.
+"""
+
+from typing import Any, Dict, Type
+
+from pydantic import BaseModel
+
+# Accepted by pydantic's schema output, rejected (or ignored) in strict mode
+_DROPPED_KEYWORDS = ("default", "title")
+
+
+def strict_json_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    return _strict(model.model_json_schema())
+
+
+def _strict(node: Any) -> Any:
+    if isinstance(node, list):
+        return [_strict(item) for item in node]
+    if not isinstance(node, dict):
+        return node
+
+    out = {}
+    for key, value in node.items():
+        if key in _DROPPED_KEYWORDS:
+            continue
+        if key in ("properties", "$defs"):
+            out[key] = {name: _strict(schema) for name, schema in value.items()}
+        else:
+            out[key] = _strict(value)
+
+    if out.get("type") == "object" and "properties" in out:
+        out["required"] = list(out["properties"])
+        out["additionalProperties"] = False
+    return out
+
+
+def json_schema_format(name: str, model: Type[BaseModel]) -> Dict[str, Any]:
+    """The response_format argument requesting output valid against model."""
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": name, "strict": True, "schema": strict_json_schema(model)},
+    }
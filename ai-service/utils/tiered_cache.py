@@ -0,0 +1,61 @@
+# ai-service/utils/tiered_cache.py
+
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class TieredCache:
+    """
+    Base of the service's two-tier caches (resolutions, embeddings, LLM
+    completions).
+
+    - Memory tier: size-bounded LRU
+    - Optional disk tier: SQLite, survives restarts and is shared by
+      workers on the same host
+
+    Subclasses declare their table in SCHEMA and implement get/put on top
+    of _entries, _db and _remember(), holding _lock throughout.
+    """
+
+    SCHEMA = ""
+
+    def __init__(self, max_entries: int = 10_000, persist_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+        if persist_path:
+            self._db = sqlite3.connect(persist_path, check_same_thread=False)
+            self._db.executescript("PRAGMA journal_mode = WAL;\n" + self.SCHEMA)
+
+    def _remember(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop the memory tier and reset counters (disk tier is kept)."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.disk_hits = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "persistent": self._db is not None,
+            }